@@ -0,0 +1,78 @@
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+
+def worker(api_url, image_bytes, deadline, latencies, statuses, lock):
+    # 스레드마다 연결을 재사용 (HTTP keep-alive)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = session.post(api_url, files={"file": ("image.jpg", image_bytes, "image/jpeg")})
+            status = response.status_code
+        except requests.RequestException:
+            status = -1
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses.append(status)
+            if status == 200:
+                latencies.append(elapsed)
+        if status == 503:
+            time.sleep(float(response.headers.get("Retry-After", 1)) / 10)
+
+
+def run_level(api_url, image_bytes, concurrency, duration):
+    """
+    concurrency개의 클라이언트가 duration초 동안 계속 요청을 보냈을 때의 처리량/지연시간
+    """
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker, api_url, image_bytes, deadline, latencies, statuses, lock)
+    elapsed = time.perf_counter() - start
+
+    ok = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "rps": len(ok) / elapsed,
+        "p50_ms": float(np.percentile(ok, 50)) if len(ok) else float("nan"),
+        "p99_ms": float(np.percentile(ok, 99)) if len(ok) else float("nan"),
+        "ok": len(ok),
+        "rejected_503": statuses.count(503),
+        "errors": sum(1 for s in statuses if s not in (200, 503)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/predict 부하 테스트 (동시 접속 수별 초당 요청 수, 지연시간)")
+    parser.add_argument("image", help="요청에 사용할 이미지 파일")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", default="1,4,8,16,32", help="쉼표로 구분한 동시 접속 수 목록")
+    parser.add_argument("--duration", type=float, default=15.0, help="단계별 측정 시간(초)")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    api_url = args.url.rstrip("/") + "/predict"
+
+    # 같은 이미지는 탐지 결과 캐시에 걸리므로 서버는 DETECTION_CACHE=0으로 실행할 것
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'ok':>6} {'503':>6} {'err':>5}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        r = run_level(api_url, image_bytes, concurrency, args.duration)
+        print(f"{r['concurrency']:>5} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+              f"{r['ok']:>6} {r['rejected_503']:>6} {r['errors']:>5}")
+    try:
+        print("server queue stats:", requests.get(args.url.rstrip("/") + "/queue/stats").json())
+    except requests.RequestException:
+        pass
+
+
+if __name__ == "__main__":
+    main()
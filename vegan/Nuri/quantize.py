@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import cv2
+import numpy as np
+import pandas as pd
+from ultralytics import YOLO
+
+# 상위 폴더(vegan)의 공용 모듈 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference_backend import export_model, boxes_to_detections
+
+# 같은 폴더의 test.py (표준 라이브러리 test 패키지와 이름이 겹치므로 파일 경로로 로드)
+_spec = importlib.util.spec_from_file_location("nuri_test", Path(__file__).with_name("test.py"))
+_nuri_test = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_nuri_test)
+evaluate_model = _nuri_test.evaluate_model
+
+QUANT_MODES = ('dynamic', 'static', 'openvino')
+
+
+def letterbox(img, imgsz=640):
+    """YOLO 입력과 같은 방식으로 비율 유지 리사이즈 + 회색(114) 패딩"""
+    h, w = img.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    resized = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+    return canvas
+
+
+def calibration_images(images_dir, limit=100):
+    images = sorted(p for p in Path(images_dir).iterdir()
+                    if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    return [str(p) for p in images[:limit]]
+
+
+class ValImageReader:
+    """
+    onnxruntime 정적 양자화용 캘리브레이션 데이터 (yolo_dataset/val/images에서 추출)
+    """
+
+    def __init__(self, onnx_path, images, imgsz=640):
+        import onnxruntime as ort
+        session = ort.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider'])
+        self.input_name = session.get_inputs()[0].name
+        self.images = iter(images)
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.images:
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            blob = letterbox(img, self.imgsz)[:, :, ::-1].transpose(2, 0, 1)  # BGR->RGB, HWC->CHW
+            blob = np.ascontiguousarray(blob, dtype=np.float32)[None] / 255.0
+            return {self.input_name: blob}
+        return None
+
+    def rewind(self):
+        pass
+
+
+def quantize(model_path, data_yaml, mode='dynamic', imgsz=640, calib_images=None):
+    """
+    학습된 .pt를 INT8 모델로 변환
+
+    Args:
+        model_path (str): 학습된 .pt 경로
+        data_yaml (str): 데이터셋 yaml (openvino 모드의 캘리브레이션에 사용)
+        mode (str): 'dynamic' (가중치만 INT8, onnxruntime),
+                    'static' (활성값까지 INT8, val 이미지로 캘리브레이션, onnxruntime),
+                    'openvino' (NNCF 정적 양자화, ultralytics export)
+        imgsz (int): 입력 크기
+        calib_images (list): 캘리브레이션 이미지 경로 목록
+
+    Returns:
+        tuple: (FP32 모델 경로, INT8 모델 경로)
+    """
+    if mode == 'openvino':
+        fp32_path = export_model(model_path, 'openvino', imgsz)
+        int8_path = YOLO(model_path).export(format='openvino', imgsz=imgsz, int8=True, data=data_yaml)
+        return fp32_path, str(int8_path)
+
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    fp32_path = export_model(model_path, 'onnx', imgsz)
+    int8_path = str(Path(fp32_path).with_name(Path(fp32_path).stem + f'_int8_{mode}.onnx'))
+    if mode == 'dynamic':
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    elif mode == 'static':
+        reader = ValImageReader(fp32_path, calib_images or [], imgsz)
+        quantize_static(fp32_path, int8_path, reader, quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        per_channel=True)
+    else:
+        raise ValueError(f"mode must be one of {QUANT_MODES}, got {mode!r}")
+    return fp32_path, int8_path
+
+
+def _rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        return float('nan')
+
+
+def _artifact_size_mb(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file()) / 1e6
+    return path.stat().st_size / 1e6
+
+
+def benchmark_model(model_path, images, imgsz=640):
+    """
+    이미지당 추론 지연시간과 모델 로드에 따른 메모리 증가량 측정
+    (같은 프로세스에서 여러 모델을 차례로 재면 앞 모델의 메모리가 남으므로 benchmark_isolated 사용)
+    """
+    rss_before = _rss_mb()
+    model = YOLO(str(model_path), task='detect')
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)  # 워밍업
+    rss_after = _rss_mb()
+
+    latencies = []
+    detections = 0
+    for path in images:
+        start = time.perf_counter()
+        results = model.predict(path, imgsz=imgsz, verbose=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections += sum(len(boxes_to_detections(r.boxes)) for r in results)
+
+    return {
+        'latency_ms': float(np.mean(latencies)) if latencies else float('nan'),
+        'p95_ms': float(np.percentile(latencies, 95)) if latencies else float('nan'),
+        'rss_mb': rss_after - rss_before,
+        'size_mb': _artifact_size_mb(model_path),
+        'detections': detections,
+    }
+
+
+def benchmark_isolated(model_path, images, imgsz=640):
+    """
+    새 프로세스(spawn)에서 benchmark_model 실행
+    -> 이 프로세스에서 양자화/이전 모델 로드로 늘어난 메모리가 RSS 증가량에 섞이지 않음
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(benchmark_model, str(model_path), list(images), imgsz).result()
+
+
+def publish(int8_path, publish_dir, fp32_map50, int8_map50, max_map50_drop=0.01):
+    """
+    mAP@50 하락폭이 기준 이하일 때만 INT8 모델을 배포 폴더로 복사
+
+    Returns:
+        str: 배포된 경로 (거부되면 None)
+    """
+    drop = fp32_map50 - int8_map50
+    if drop > max_map50_drop:
+        print(f"Refusing to publish {int8_path}: mAP@50 dropped by {drop:.4f} "
+              f"(limit {max_map50_drop:.4f})")
+        return None
+
+    publish_dir = Path(publish_dir)
+    publish_dir.mkdir(parents=True, exist_ok=True)
+    target = publish_dir / Path(int8_path).name
+    if Path(int8_path).is_dir():
+        shutil.copytree(int8_path, target, dirs_exist_ok=True)
+    else:
+        shutil.copy2(int8_path, target)
+    print(f"Published {target} (mAP@50 drop {drop:.4f})")
+    return str(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 양자화 + FP32 대비 속도/메모리/mAP 비교")
+    parser.add_argument("model", help="학습된 .pt 경로 (예: runs/detect/train/weights/best.pt)")
+    parser.add_argument("data_yaml", help="데이터셋 yaml (예: yolo_dataset/dataset.yaml)")
+    parser.add_argument("--mode", default="static", choices=QUANT_MODES)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--calib-size", type=int, default=100, help="캘리브레이션/벤치마크 이미지 수")
+    parser.add_argument("--max-map-drop", type=float, default=0.01, help="허용되는 mAP@50 하락폭")
+    parser.add_argument("--publish-dir", default="quantized")
+    args = parser.parse_args()
+
+    val_images = Path(args.data_yaml).parent / 'val' / 'images'
+    images = calibration_images(val_images, args.calib_size)
+
+    fp32_path, int8_path = quantize(args.model, args.data_yaml, args.mode, args.imgsz, images)
+
+    rows = {}
+    for name, path in (("fp32", fp32_path), ("int8", int8_path)):
+        print(f"\n=== Evaluating {name}: {path} ===")
+        row = benchmark_isolated(path, images, args.imgsz)
+        row.update(evaluate_model(path, args.data_yaml, str(val_images), imgsz=args.imgsz))
+        rows[name] = row
+
+    # 결과 비교
+    print("\n=== FP32 vs INT8 ===")
+    results_df = pd.DataFrame.from_dict(rows, orient='index')
+    print(results_df)
+
+    published = publish(int8_path, args.publish_dir, rows["fp32"]["mAP@50"], rows["int8"]["mAP@50"],
+                        args.max_map_drop)
+    if published is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
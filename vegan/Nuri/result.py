@@ -1,3 +1,6 @@
+import json
+import uuid
+from pathlib import Path
 import requests
 
 def detect_food(image_path, api_url="http://localhost:8000/predict"):
@@ -17,5 +20,46 @@ def detect_food(image_path, api_url="http://localhost:8000/predict"):
     else:
         print("Error:", response.status_code)
 
+def _multipart_body(image_paths, boundary):
+    # 파일을 한꺼번에 메모리에 올리지 않고 조각씩 전송
+    for image_path in image_paths:
+        name = Path(image_path).name.replace('"', "_")
+        yield (f"--{boundary}\r\n"
+               f'Content-Disposition: form-data; name="files"; filename="{name}"\r\n'
+               f"Content-Type: application/octet-stream\r\n\r\n").encode("utf-8")
+        with open(image_path, "rb") as f:
+            yield from iter(lambda: f.read(1 << 16), b"")
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("utf-8")
+
+def detect_foods_batch(image_paths, api_url="http://localhost:8000/predict/batch"):
+    """
+    여러 장의 사진을 한 요청으로 보내고 결과를 이미지마다 받는 대로 반환하는 제너레이터
+    (서버는 처리가 끝난 순서대로 보내므로 index로 원래 순서를 확인)
+    """
+    image_paths = list(image_paths)
+    boundary = uuid.uuid4().hex
+    response = requests.post(
+        api_url,
+        data=_multipart_body(image_paths, boundary),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        stream=True,
+    )
+    response.raise_for_status()
+    for line in response.iter_lines():
+        if line:
+            result = json.loads(line)
+            result["path"] = image_paths[result["index"]]
+            yield result
+
 # 사용 예시
-detect_food("test_meal.jpg")
\ No newline at end of file
+if __name__ == "__main__":
+    detect_food("test_meal.jpg")
+
+    # 하루치 사진을 한 번에 분석
+    for result in detect_foods_batch(sorted(Path("meals").glob("*.jpg"))):
+        if result["status"] != "success":
+            print(f"{result['path']}: {result['error']}")
+            continue
+        foods = ", ".join(f"{d['class_name']} {d['confidence']:.2f}" for d in result["detections"])
+        print(f"{result['path']}: {foods}")
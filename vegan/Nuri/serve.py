@@ -0,0 +1,283 @@
+"""
+pre-fork 멀티 워커 서버
+
+uvicorn --workers N은 워커마다 testapi를 새로 import해서 모델을 N번 올림
+여기서는 마스터 프로세스가 testapi를 한 번 import(모델 로드)하고 워밍업까지 끝낸 뒤
+gc.freeze()로 지금까지 만든 객체를 GC 대상에서 빼고 워커를 fork함
+-> 워커들은 가중치 페이지를 copy-on-write로 공유 (읽기만 하므로 복사되지 않음)
+-> listening 소켓도 마스터가 열고 모든 워커가 같은 소켓에서 accept
+
+CPU 스레드는 --threads를 워커 수로 나눠서 워커마다 지정
+(마스터는 스레드 1개로 워밍업: OpenMP 스레드 풀은 fork 뒤 자식에 복사되지 않아 멈출 수 있음)
+onnx/openvino 백엔드는 워커마다 런타임 세션을 다시 만들기 때문에 가중치 공유 효과는 torch에서만 있음
+
+실행 (Nuri 폴더에서):
+    python serve.py --workers 4 --threads 8
+    python serve.py --report --image test.jpg   # 1, 2, 4, 8 워커일 때 전체 RSS/PSS
+    python serve.py --report --compare          # uvicorn --workers N과 비교
+"""
+import os
+import sys
+import gc
+import time
+import signal
+import socket
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _listen(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+SHUTDOWN_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+
+def _run_worker(testapi, sock, threads, log_level):
+    import uvicorn
+
+    testapi.model.set_num_threads(threads)
+    config = uvicorn.Config(testapi.app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host="0.0.0.0", port=8000, workers=2, threads=None, log_level="info"):
+    """
+    모델 로드 + 워밍업은 한 번만 하고 workers개 프로세스를 fork해서 같은 포트로 서비스
+    워커가 비정상 종료되면 다시 fork (종료 신호를 받으면 워커에 전달하고 모두 끝날 때까지 대기)
+
+    워커 목록을 바꾸는 동안(fork, 재시작)에는 종료 신호를 막아 두고 os.wait에서 기다릴 때만 받음
+    -> fork 직후 아직 children에 없는 워커를 종료 처리에서 놓치거나
+       종료 중에 끝난 워커를 다시 fork하는 일이 없음
+    """
+    if os.environ.get("INFERENCE_WORKER_SOCKET"):
+        raise SystemExit("serve.py shares the model through fork; unset INFERENCE_WORKER_SOCKET")
+    threads = threads or os.cpu_count() or 1
+    threads_per_worker = max(1, threads // workers)
+
+    sock = _listen(host, port)
+    start = time.perf_counter()
+    os.environ["MODEL_THREADS"] = "1"
+    import testapi  # 모델 로드
+    testapi.warmup()  # 워커의 /ready는 바로 200
+    if not testapi.warmup_done.is_set():
+        raise SystemExit(f"warm-up inference failed: {testapi.warmup_info['error']}")
+    gc.collect()
+    gc.freeze()  # 이후 GC가 공유 객체의 헤더를 건드려 페이지가 복사되는 것을 막음
+    print(f"Model loaded and warmed up in {time.perf_counter() - start:.1f}s, "
+          f"forking {workers} workers x {threads_per_worker} threads on {host}:{port}")
+
+    children = {}
+    stopping = False
+
+    def spawn(worker_id):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # 마스터의 종료 처리와 신호 차단은 워커에 물려주지 않음 (핸들러를 먼저 바꾼 뒤 차단 해제)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.default_int_handler)
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, SHUTDOWN_SIGNALS)
+                _run_worker(testapi, sock, threads_per_worker, log_level)
+            except BaseException as e:
+                if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+                    print(f"Worker {worker_id} crashed: {e}")
+                    code = 1
+            finally:
+                os._exit(code)
+        children[pid] = worker_id
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.pthread_sigmask(signal.SIG_BLOCK, SHUTDOWN_SIGNALS)
+    for worker_id in range(workers):
+        spawn(worker_id)
+
+    while children:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, SHUTDOWN_SIGNALS)  # 이 사이에 온 신호는 여기서 처리됨
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        finally:
+            signal.pthread_sigmask(signal.SIG_BLOCK, SHUTDOWN_SIGNALS)
+        worker_id = children.pop(pid, None)
+        if worker_id is not None and not stopping:
+            print(f"Warning: worker {worker_id} (pid {pid}) exited with {os.waitstatus_to_exitcode(status)}, restarting")
+            spawn(worker_id)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, SHUTDOWN_SIGNALS)
+    sock.close()
+
+
+def _process_tree(root):
+    """root와 모든 자손 프로세스 pid"""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm에 공백/괄호가 있을 수 있으므로 마지막 ')' 뒤에서 ppid를 읽음
+        parents.setdefault(int(stat[stat.rfind(")") + 2:].split()[1]), []).append(int(entry))
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(parents.get(pid, []))
+    return pids
+
+
+def _memory_kb(pid):
+    """
+    (RSS, PSS) kB
+    PSS는 공유 페이지를 공유하는 프로세스 수로 나눠 계산하므로 프로세스끼리 더해도 중복되지 않음
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        return 0, 0
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+
+def tree_memory_mb(root):
+    pids = _process_tree(root)
+    rss = pss = 0
+    for pid in pids:
+        r, p = _memory_kb(pid)
+        rss += r
+        pss += p
+    return len(pids), rss / 1024, pss / 1024
+
+
+def _wait_ready(url, proc, timeout):
+    import requests
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if requests.get(url + "/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def _wait_stable(root, interval=1.0, tolerance=0.02, timeout=120):
+    # uvicorn --workers는 워커마다 모델을 따로 로드하므로 메모리가 더 늘지 않을 때까지 기다림
+    previous = None
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        current = tree_memory_mb(root)
+        if previous is not None and abs(current[2] - previous[2]) <= tolerance * max(previous[2], 1):
+            return current
+        previous = current
+        time.sleep(interval)
+    return previous
+
+
+def measure(workers, mode, port, image_bytes=None, threads=None, timeout=300):
+    """
+    mode: 'prefork' (이 스크립트) 또는 'uvicorn' (uvicorn --workers)
+    :return: (프로세스 수, RSS 합계 MB, PSS 합계 MB)
+    """
+    import requests
+
+    if mode == "prefork":
+        cmd = [sys.executable, os.path.abspath(__file__), "--workers", str(workers),
+               "--port", str(port), "--log-level", "warning"]
+        if threads:
+            cmd += ["--threads", str(threads)]
+        env = os.environ
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "testapi:app", "--workers", str(workers),
+               "--port", str(port), "--log-level", "warning"]
+        env = dict(os.environ)
+        if threads:
+            env["MODEL_THREADS"] = str(max(1, threads // workers))
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)), env=env, start_new_session=True)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url, proc, timeout)
+        if image_bytes is not None:
+            # 모든 워커가 실제로 추론하도록 워커 수의 4배만큼 동시에 요청
+            def post(_):
+                return requests.post(url + "/predict", files={"file": ("image.jpg", image_bytes, "image/jpeg")}).status_code
+            with ThreadPoolExecutor(workers * 4) as pool:
+                list(pool.map(post, range(workers * 4)))
+        return _wait_stable(proc.pid)
+    finally:
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(timeout=30)
+        except ProcessLookupError:
+            pass
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+
+
+def report(worker_counts, port, image=None, threads=None, compare=False):
+    image_bytes = None
+    if image:
+        with open(image, "rb") as f:
+            image_bytes = f.read()
+    modes = ["prefork", "uvicorn"] if compare else ["prefork"]
+    # 결과 캐시에 걸리면 추론을 안 하므로 측정 중에는 캐시를 끔
+    os.environ["DETECTION_CACHE"] = "0"
+
+    print(f"{'mode':<8} {'workers':>7} {'procs':>5} {'RSS MB':>9} {'PSS MB':>9} {'PSS/worker':>10}")
+    for mode in modes:
+        for workers in worker_counts:
+            procs, rss, pss = measure(workers, mode, port, image_bytes, threads)
+            print(f"{mode:<8} {workers:>7} {procs:>5} {rss:>9.0f} {pss:>9.0f} {pss / workers:>10.0f}")
+    print("RSS counts shared pages once per process; PSS splits them between the processes sharing them")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pre-fork 멀티 워커 서버 (모델은 마스터에서 한 번만 로드)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=None, help="전체 CPU 추론 스레드 수 (워커 수로 나눔, 기본: CPU 코어 수)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--report", action="store_true", help="워커 수별 전체 RSS/PSS 측정")
+    parser.add_argument("--report-workers", default="1,2,4,8")
+    parser.add_argument("--image", default=None, help="--report에서 워커마다 추론을 실행해 볼 이미지")
+    parser.add_argument("--compare", action="store_true", help="--report에서 uvicorn --workers도 측정")
+    args = parser.parse_args()
+
+    if args.report:
+        worker_counts = [int(n) for n in args.report_workers.split(",")]
+        report(worker_counts, args.port, args.image, args.threads, args.compare)
+    else:
+        serve(args.host, args.port, args.workers, args.threads, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
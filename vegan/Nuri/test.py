@@ -2,35 +2,36 @@ from ultralytics import YOLO
 import os
 import pandas as pd
 
-def evaluate_model(model_path, data_yaml, test_images):
+def evaluate_model(model_path, data_yaml, test_images, imgsz=640):
     """
     모델의 성능을 테스트 데이터셋에서 평가하는 함수
     
     Args:
-        model_path (str): 모델 가중치 파일 경로 (.pt 파일)
+        model_path (str): 모델 가중치 파일 경로 (.pt, .onnx, OpenVINO 폴더)
         data_yaml (str): 데이터셋 yaml 파일 경로
         test_images (str): 테스트 이미지가 포함된 디렉토리 경로
+        imgsz (int): 평가 시 사용할 입력 이미지 크기
 
     Returns:
         dict: 모델 평가 지표 (Precision, Recall, mAP 등)
     """
     print(f"Evaluating model: {model_path}")
-    model = YOLO(model_path)
+    model = YOLO(model_path, task='detect')
 
     # 모델 평가
     metrics = model.val(
         data=data_yaml,  # 데이터셋 정의 파일
-        imgsz=640,       # 평가 시 사용할 입력 이미지 크기
+        imgsz=imgsz,     # 평가 시 사용할 입력 이미지 크기
         save=False,      # 평가 결과 저장 여부
         batch=16         # 배치 크기
     )
     
     # 주요 성능 지표 출력
     results = {
-        'Precision': metrics.box.map_precision,
-        'Recall': metrics.box.map_recall,
-        'mAP@50': metrics.map50,
-        'mAP@50-95': metrics.map
+        'Precision': metrics.box.mp,
+        'Recall': metrics.box.mr,
+        'mAP@50': metrics.box.map50,
+        'mAP@50-95': metrics.box.map
     }
     
     return results
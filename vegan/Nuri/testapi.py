@@ -1,12 +1,29 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from ultralytics import YOLO
-import cv2
 import numpy as np
-from PIL import Image
-import io
+import os
+import sys
 import json
+import time
+import asyncio
+import threading
+from contextlib import nullcontext
+
+# 상위 폴더(vegan)의 공용 모듈 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference_backend import boxes_to_detections, load_model, set_num_threads, batch_capacity, predict_images
+from detection_cache import get_default_cache, model_checksum
+from inference_worker import InferenceClient
+from inference_queue import BoundedExecutor, MicroBatcher, QueueFullError
+from image_ingest import decode_image, scale_bbox
+from service_metrics import MetricsRegistry
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
 
 app = FastAPI()
 
@@ -19,52 +36,453 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 요청 단계별 소요 시간 (/metrics에서 Prometheus 형식으로 노출)
+# read: 업로드 수신 + multipart 파싱, queue_wait: 추론 대기열에서 기다린 시간,
+# inference/postprocess는 배치(model.predict 호출) 단위, 나머지는 이미지/응답 단위로 기록
+metrics = MetricsRegistry("food_api_")
+STAGES = metrics.histogram(
+    "stage_seconds", "Time spent per request stage (read, decode, queue_wait, inference, postprocess, serialize)")
+REQUESTS = metrics.counter("requests_total", "Finished /predict requests and /predict/batch images", label="status")
+
 # 모델 로드
 class FoodDetectionModel:
-    def __init__(self, model_path="best.pt"):
-        self.model = YOLO(model_path)
-        self.class_names = self.model.names  # 클래스 이름 로드
-        
-    def predict(self, image):
-        results = self.model.predict(image, conf=0.25)
+    def __init__(self, model_path="best.pt", backend="torch", num_threads=None, imgsz=640, worker_socket=None):
+        # backend: 'torch', 'onnx', 'openvino' (GPU 없는 서버는 onnx/openvino 권장)
+        # worker_socket: 공용 추론 워커 소켓. 지정하면 uvicorn 워커마다 가중치를 올리지 않음
+        if worker_socket:
+            self.model = None
+            self.client = InferenceClient(worker_socket)
+            self.class_names = self.client.names
+            self.model_id = self.client.model_id
+        else:
+            self.model = load_model(model_path, backend, num_threads, imgsz)
+            self.client = None
+            self.class_names = self.model.names  # 클래스 이름 로드
+            self.model_id = f"{model_checksum(model_path)}:{backend}"  # 탐지 결과 캐시 키
+        self.model_path = model_path
+        self.backend = backend
+        self.imgsz = imgsz  # 업로드 이미지를 이 크기에 맞춰 축소 디코딩
+        # /predict와 /predict/batch가 서로 다른 스레드에서 호출해도 모델은 한 번에 하나씩 사용
+        self._lock = threading.Lock()
         
-        detections = []
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                b = box.xyxy[0].cpu().numpy()
-                c = box.cls.cpu().numpy()
-                conf = box.conf.cpu().numpy()
-                
-                detections.append({
-                    "bbox": b.tolist(),
-                    "class": int(c.item()),
-                    "class_name": self.class_names[int(c.item())],
-                    "confidence": float(conf.item())
-                })
+    def batch_capacity(self, batch_size):
+        # 한 번의 추론에 넣을 수 있는 이미지 수 (워커 소켓 모드는 어차피 한 장씩 전송)
+        if self.model is None:
+            return batch_size
+        return batch_capacity(self.model, batch_size)
+
+    def set_num_threads(self, num_threads):
+        # serve.py: fork한 워커마다 CPU 스레드를 나눠 가짐 (워커 소켓 모드는 워커 프로세스가 결정)
+        if self.model is not None:
+            set_num_threads(self.model, self.model_path, self.backend, num_threads)
+
+    def predict(self, image, scale=(1.0, 1.0), record=True):
+        return self.predict_batch([image], [scale], record)[0]
+
+    def predict_batch(self, images, scales=None, record=True):
+        """
+        여러 이미지를 한 번의 model.predict로 추론
+
+        Args:
+            images (list): BGR 배열(decode_image 결과) 또는 PIL 이미지 리스트
+            scales (list): 이미지별 decode_image 배율 (bbox를 원본 사진 좌표로 되돌림)
+            record (bool): 단계별 시간을 STAGES에 기록할지 여부 (워밍업은 요청이 아니므로 False)
+
+        Returns:
+            list: 이미지별 탐지 결과 리스트 (predict와 같은 형식)
+        """
+        # PIL 이미지는 ultralytics와 같은 BGR 배열로 변환 (BGR 배열은 그대로 사용)
+        images = [image if isinstance(image, np.ndarray)
+                  else np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+                  for image in images]
+        scales = scales or [(1.0, 1.0)] * len(images)
+        stage = STAGES.time if record else (lambda name: nullcontext())
+        if self.client is not None:
+            # 공유 메모리로 전달 (워커는 요청을 순서대로 처리하므로 한 장씩 전송)
+            with stage("inference"):
+                results = [self.client.predict(image, conf=0.25) for image in images]
+        else:
+            # 내보낸 정적 모델(batch 1)은 predict_images가 한 장씩 나눠서 추론 (imgsz도 같이 전달)
+            with self._lock, stage("inference"):
+                results = predict_images(self.model, images, conf=0.25, verbose=False)
+
+        with stage("postprocess"):
+            if self.client is None:
+                results = [boxes_to_detections(r.boxes) for r in results]
+            batch_detections = []
+            for r, scale in zip(results, scales):
+                detections = []
+                for det in r:
+                    class_id = int(det["class"])
+                    detections.append({
+                        "bbox": scale_bbox(det["bbox"], scale),
+                        "class": class_id,
+                        "class_name": self.class_names[class_id],
+                        "confidence": det["confidence"]
+                    })
+                batch_detections.append(detections)
                 
-        return detections
+        return batch_detections
+
+# 모델 인스턴스 생성 (백엔드/스레드 수는 환경변수로 설정)
+_load_start = time.perf_counter()
+model = FoodDetectionModel(
+    "./best.pt",
+    backend=os.environ.get("MODEL_BACKEND", "torch"),
+    num_threads=int(os.environ["MODEL_THREADS"]) if os.environ.get("MODEL_THREADS") else None,
+    worker_socket=os.environ.get("INFERENCE_WORKER_SOCKET"),
+)
+MODEL_LOAD_SECONDS = time.perf_counter() - _load_start
+
+# 탐지 결과 캐시 (같은 사진 재업로드 시 추론 생략, DETECTION_CACHE=0이면 사용 안 함)
+cache = get_default_cache() if os.environ.get("DETECTION_CACHE", "1") != "0" else None
+PREDICT_PARAMS = {"conf": 0.25}
 
-# 모델 인스턴스 생성
-model = FoodDetectionModel("./best.pt")
+# 추론은 이벤트 루프 밖의 스레드에서 실행 (추론 중에도 /health 등이 바로 응답하도록)
+# PREDICT_CONCURRENCY: 동시에 실행할 추론 수, PREDICT_QUEUE_DEPTH: 대기 가능한 요청 수
+# 둘 다 차면 지연이 끝없이 늘어나지 않도록 503 + Retry-After로 거절
+executor = BoundedExecutor(
+    max_workers=int(os.environ.get("PREDICT_CONCURRENCY", "1")),
+    max_queue=int(os.environ.get("PREDICT_QUEUE_DEPTH", "8")),
+    thread_name_prefix="predict",
+    on_wait=lambda seconds: STAGES.observe("queue_wait", seconds),
+)
+RETRY_AFTER = os.environ.get("PREDICT_RETRY_AFTER", "1")
+# /predict/batch는 이미 받은 업로드라 바로 거절하지 않고 이 시간(초)까지 대기열 자리를 기다림
+BATCH_QUEUE_TIMEOUT = float(os.environ.get("PREDICT_BATCH_QUEUE_TIMEOUT", "30"))
+
+class InvalidImageError(ValueError):
+    # 업로드 내용을 이미지로 디코딩할 수 없음 (서버 오류가 아니라 요청 오류로 응답)
+    pass
+
+def decode_upload(contents):
+    with STAGES.time("decode"):
+        try:
+            return decode_image(contents, model.imgsz)
+        except Exception as e:
+            raise InvalidImageError(f"could not decode upload: {e}") from e
+
+# PREDICT_MAX_BATCH > 1이면 동시에 들어온 요청을 PREDICT_MAX_WAIT_MS 동안 모아 한 번에 추론
+# (대기 시간을 늘리면 처리량이, 줄이면 p99 지연이 좋아짐)
+def predict_contents_batch(contents_list):
+    # 디코딩에 실패한 이미지는 그 요청만 실패시키고 나머지는 한 번에 추론
+    results = [None] * len(contents_list)
+    images, scales, positions = [], [], []
+    for i, contents in enumerate(contents_list):
+        try:
+            image, scale = decode_upload(contents)
+        except InvalidImageError as e:
+            results[i] = e
+            continue
+        images.append(image)
+        scales.append(scale)
+        positions.append(i)
+    if images:
+        for i, detections in zip(positions, model.predict_batch(images, scales)):
+            results[i] = detections
+    return results
+
+# 정적 batch로 내보낸 onnx/openvino 모델은 배치로 모아도 한 장씩 추론하므로 마이크로 배치를 끔
+MAX_BATCH = model.batch_capacity(int(os.environ.get("PREDICT_MAX_BATCH", "1")))
+if MAX_BATCH < int(os.environ.get("PREDICT_MAX_BATCH", "1")):
+    print(f"Warning: {model.backend} model takes at most {MAX_BATCH} image(s) per predict, "
+          f"PREDICT_MAX_BATCH limited to {MAX_BATCH}")
+batcher = MicroBatcher(
+    predict_contents_batch,
+    max_batch_size=MAX_BATCH,
+    max_wait_ms=float(os.environ.get("PREDICT_MAX_WAIT_MS", "5")),
+    max_queue=int(os.environ.get("PREDICT_QUEUE_DEPTH", "8")),
+    on_wait=lambda seconds: STAGES.observe("queue_wait", seconds),
+) if MAX_BATCH > 1 else None
+
+def decode_and_predict(contents):
+    image, scale = decode_upload(contents)
+    return model.predict(image, scale)
+
+async def run_inference(contents):
+    # 마이크로 배치가 켜져 있으면 배치로, 아니면 실행기에서 한 장씩
+    if batcher is not None:
+        return await batcher.run(contents)
+    return await executor.run(decode_and_predict, contents)
+
+async def run_predict(contents):
+    # 캐시에 있으면 대기열(실행기/배치)을 거치지 않고 바로 반환 (꽉 차 있어도 503이 나지 않음)
+    if cache is None:
+        return await run_inference(contents)
+    key = cache.make_key(contents, model.model_id, PREDICT_PARAMS)
+    detections = await asyncio.to_thread(cache.get, key)  # 디스크 캐시 읽기/쓰기도 이벤트 루프 밖에서
+    if detections is None:
+        detections = await run_inference(contents)
+        await asyncio.to_thread(cache.put, key, detections)
+    return detections
+
+in_flight = {"predict": 0, "batch": 0}  # 처리 중인 요청 수 (이벤트 루프에서만 변경)
+
+async def _read_upload(request):
+    # 업로드 수신 시간까지 재기 위해 UploadFile 인자 대신 직접 폼을 읽음 (필드 이름은 그대로 "file")
+    form = await request.form()
+    try:
+        file = form.get("file")
+        if not hasattr(file, "read"):
+            raise HTTPException(status_code=422, detail="multipart field 'file' is required")
+        return await file.read()
+    finally:
+        await form.close()
 
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    # 이미지 읽기
-    contents = await file.read()
-    image = Image.open(io.BytesIO(contents))
-    
-    # 예측 수행
-    detections = model.predict(image)
-    
-    return {
-        "status": "success",
-        "detections": detections
-    }
+async def predict(request: Request):
+    in_flight["predict"] += 1
+    try:
+        # 이미지 읽기
+        with STAGES.time("read"):
+            contents = await _read_upload(request)
+
+        try:
+            detections = await run_predict(contents)
+        except QueueFullError:
+            REQUESTS.inc("busy")
+            raise HTTPException(status_code=503, detail="Server busy, retry later",
+                                headers={"Retry-After": RETRY_AFTER})
+        except InvalidImageError as e:
+            REQUESTS.inc("invalid")
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception:
+            REQUESTS.inc("error")
+            raise
+
+        with STAGES.time("serialize"):
+            response = JSONResponse({
+                "status": "success",
+                "detections": detections
+            })
+        REQUESTS.inc("success")
+        return response
+    finally:
+        in_flight["predict"] -= 1
+
+# 한 번에 추론할 묶음 크기도 백엔드가 받을 수 있는 만큼으로 제한 (정적 batch로 내보낸 모델은 한 장씩)
+BATCH_SIZE = model.batch_capacity(int(os.environ.get("PREDICT_BATCH_SIZE", str(max(MAX_BATCH, 8)))))
+BATCH_INFLIGHT = 2  # 요청 하나가 동시에 실행할 수 있는 배치 수 (초과하면 업로드 읽기를 멈춤)
+
+class _MultipartFiles:
+    """
+    multipart 본문을 조각 단위로 파싱하면서 파일 파트가 끝날 때마다 (파일명, bytes)를 꺼내줌
+    (요청 전체를 메모리나 임시 파일에 모으지 않음)
+    """
+
+    def __init__(self, boundary):
+        self.completed = []
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._data = None
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._data = bytearray()
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_part_data(self, data, start, end):
+        self._data += data[start:end]
+
+    def _on_part_end(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if filename is not None:  # 파일이 아닌 일반 폼 필드는 무시
+            # bytes로 다시 복사하지 않고 모은 버퍼를 그대로 디코딩에 사용
+            self.completed.append((filename.decode("utf-8", "replace"), self._data))
+        self._data = None
+
+    def write(self, chunk):
+        self.parser.write(chunk)
+        completed, self.completed = self.completed, []
+        return completed
+
+    def finalize(self):
+        self.parser.finalize()
+        completed, self.completed = self.completed, []
+        return completed
+
+class _UploadStreamingResponse(StreamingResponse):
+    # 기본 StreamingResponse는 연결 종료를 감지하려고 receive()를 계속 호출해서
+    # 응답을 보내는 동안 읽어야 할 요청 본문을 가로챔 -> 본문은 results()에서만 읽음
+    async def listen_for_disconnect(self, receive):
+        await asyncio.Event().wait()
+
+def _ndjson(obj):
+    REQUESTS.inc(obj["status"])
+    with STAGES.time("serialize"):
+        return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def _run_batch(batch):
+    # 대기열이 가득 차면 바로 거절하지 않고 BATCH_QUEUE_TIMEOUT까지 자리가 나기를 기다림
+    # (이미 받은 업로드이므로, 클라이언트 연결이 끊기면 이 작업은 취소되어 대기에서 빠짐)
+    try:
+        results = await executor.run(predict_contents_batch, [contents for _, _, contents in batch],
+                                     wait=BATCH_QUEUE_TIMEOUT)
+    except QueueFullError:
+        return [{"index": index, "filename": filename, "status": "busy", "error": "Server busy, retry later"}
+                for index, filename, _ in batch]
+    lines = []
+    for (index, filename, contents), detections in zip(batch, results):
+        if isinstance(detections, Exception):
+            lines.append({"index": index, "filename": filename, "status": "error",
+                          "error": f"{type(detections).__name__}: {detections}"})
+            continue
+        if cache is not None:
+            await asyncio.to_thread(cache.put, cache.make_key(contents, model.model_id, PREDICT_PARAMS), detections)
+        lines.append({"index": index, "filename": filename, "status": "success", "detections": detections})
+    return lines
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    여러 장의 사진을 multipart 한 요청으로 받아 PREDICT_BATCH_SIZE장씩 추론하고
+    끝나는 대로 이미지마다 NDJSON 한 줄을 바로 보냄
+    (한 줄: {"index", "filename", "status", "detections" 또는 "error"},
+     status는 success, error(디코딩/추론 실패), busy(BATCH_QUEUE_TIMEOUT 동안 자리가 나지 않음))
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="multipart/form-data with a boundary is required")
+    files = _MultipartFiles(boundary)
+
+    async def results():
+        pending = set()
+        batch = []
+        index = 0
+
+        async def add_files(completed):
+            nonlocal index, batch
+            for filename, contents in completed:
+                if cache is not None:
+                    key = cache.make_key(contents, model.model_id, PREDICT_PARAMS)
+                    cached = await asyncio.to_thread(cache.get, key)
+                    if cached is not None:
+                        yield {"index": index, "filename": filename, "status": "success", "detections": cached}
+                        index += 1
+                        continue
+                batch.append((index, filename, contents))
+                index += 1
+                if len(batch) >= BATCH_SIZE:
+                    pending.add(asyncio.ensure_future(_run_batch(batch)))
+                    batch = []
+
+        async def finished(wait):
+            # 끝난 배치 결과를 바로 내보냄 (wait이면 적어도 하나 끝날 때까지 대기)
+            if not pending:
+                return []
+            done, _ = await asyncio.wait(pending, timeout=None if wait else 0,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            return [line for task in done for line in task.result()]
+
+        in_flight["batch"] += 1
+        try:
+            async for chunk in request.stream():
+                async for line in add_files(files.write(chunk)):
+                    yield _ndjson(line)
+                for line in await finished(wait=len(pending) >= BATCH_INFLIGHT):
+                    yield _ndjson(line)
+            async for line in add_files(files.finalize()):
+                yield _ndjson(line)
+            if batch:
+                pending.add(asyncio.ensure_future(_run_batch(batch)))
+            while pending:
+                for line in await finished(wait=True):
+                    yield _ndjson(line)
+        finally:
+            in_flight["batch"] -= 1
+            for task in pending:
+                task.cancel()
+
+    return _UploadStreamingResponse(results(), media_type="application/x-ndjson")
 
 @app.get("/health")
 async def health_check():
+    # 프로세스가 살아있는지만 확인 (요청을 받아도 되는지는 /ready)
     return {"status": "healthy"}
 
+# 첫 추론은 그래프 최적화/메모리 할당 때문에 느리므로 시작할 때 더미 이미지로 한 번 실행하고
+# 끝날 때까지 /ready는 503 (로드 밸런서가 준비된 인스턴스에만 요청을 보내도록)
+warmup_done = threading.Event()
+warmup_info = {"seconds": None, "error": None}
+
+def warmup():
+    if warmup_done.is_set():
+        return
+    start = time.perf_counter()
+    try:
+        # 걸린 시간은 warmup_seconds에만 기록 (요청 단계 히스토그램에 섞이지 않게)
+        model.predict(np.zeros((model.imgsz, model.imgsz, 3), dtype=np.uint8), record=False)
+    except Exception as e:
+        warmup_info["error"] = f"{type(e).__name__}: {e}"
+        print(f"Warning: warm-up inference failed: {e}")
+        return
+    warmup_info["seconds"] = time.perf_counter() - start
+    warmup_done.set()
+
+@app.on_event("startup")
+def start_warmup():
+    # 서버는 바로 요청을 받기 시작하고 워밍업은 백그라운드에서 진행
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
+
+@app.get("/ready")
+async def readiness():
+    if not warmup_done.is_set():
+        status = "error" if warmup_info["error"] else "warming_up"
+        return JSONResponse({"status": status, "error": warmup_info["error"]}, status_code=503)
+    return {"status": "ready", "warmup_seconds": warmup_info["seconds"]}
+
+def _queue_depth():
+    depth = {"executor": executor.queued}
+    if batcher is not None:
+        depth["batcher"] = batcher.queued
+    return depth
+
+metrics.gauge("queue_depth", "Requests waiting for inference", _queue_depth, label="queue")
+metrics.gauge("inference_running", "Requests currently in model inference",
+              lambda: executor.stats()["running"] + (batcher.stats()["running"] if batcher is not None else 0))
+metrics.gauge("requests_in_flight", "Requests currently being handled", lambda: in_flight, label="endpoint")
+metrics.gauge("model_load_seconds", "Time taken to load the model at startup", lambda: MODEL_LOAD_SECONDS)
+metrics.gauge("warmup_seconds", "Duration of the warm-up inference", lambda: warmup_info["seconds"])
+metrics.gauge("ready", "1 after the warm-up inference has finished", lambda: int(warmup_done.is_set()))
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/queue/stats")
+async def queue_stats():
+    return executor.stats() if batcher is None else batcher.stats()
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    executor.shutdown(wait=False)
+    if batcher is not None:
+        batcher.shutdown(wait=False)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return cache.stats() if cache is not None else {"enabled": False}
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+import sys
 import streamlit as st
 import cv2
 import numpy as np
@@ -6,30 +8,76 @@ from ultralytics import YOLO
 from PIL import Image
 import io
 
+# 상위 폴더(vegan)의 공용 모듈 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference_worker import InferenceClient
+from resource_cache import load_cached, resource_lock, format_timings
+from nutrition_table import load_class_nutrients, names_by_id
+from image_ingest import decode_image
+
+
+def load_nutrition_df(nutrition_data_path):
+    df = pd.read_csv(nutrition_data_path).set_index("Food")
+    # 같은 식품명이 여러 줄이면 reindex가 실패하므로 첫 줄만 사용
+    return df[~df.index.duplicated(keep='first')]
+
+
 class Nutrient:
-    def __init__(self, model_path="yolov8x.pt", nutrition_data_path="nutrition_data.csv"):
+    NUTRIENTS = ["Calories", "Protein", "Carbs", "Fat"]
+
+    def __init__(self, model_path="yolov8x.pt", nutrition_data_path="nutrition_data.csv", worker_socket=None):
         """
         Nutrient 클래스 생성자
         :param model_path: YOLO 모델 경로
         :param nutrition_data_path: 영양소 데이터 CSV 파일 경로
+        :param worker_socket: 공용 추론 워커 소켓 경로 (기본값: INFERENCE_WORKER_SOCKET 환경변수)
         """
-        self.model = YOLO(model_path)
-        self.nutrition_df = pd.read_csv(nutrition_data_path).set_index("Food")
+        worker_socket = worker_socket or os.environ.get("INFERENCE_WORKER_SOCKET")
+        # 스트림릿 재실행마다 다시 로드하지 않도록 캐시 사용 (파일이 바뀌면 다시 로드)
+        self.load_timings = {}
+        self.model_lock = resource_lock("yolo", model_path)
+        if worker_socket:
+            # 얇은 클라이언트 모드: 가중치는 워커 프로세스에만 로드됨
+            self.model = None
+            self.client, *timing = load_cached("worker", worker_socket, InferenceClient)
+            self.load_timings["워커 연결"] = timing
+            self.class_names = self.client.names
+        else:
+            self.model, *timing = load_cached("yolo", model_path, YOLO)
+            self.load_timings["모델"] = timing
+            self.client = None
+            self.class_names = self.model.names
+        self.nutrition_df, *timing = load_cached("nutrition_csv", nutrition_data_path, load_nutrition_df)
+        self.load_timings["영양 데이터"] = timing
+        # 클래스 id -> 영양소 벡터 표 (이름이 다르면 유사 매칭 후 별칭 파일에 저장, 없는 클래스는 한 번만 경고)
+        self.nutrient_vectors, _ = load_class_nutrients(
+            nutrition_data_path, self.nutrition_df, self.class_names, self.NUTRIENTS)
+        self.food_rows = {name: i for i, name in enumerate(names_by_id(self.class_names))}
 
     def analyze_food(self, image):
         """
         업로드된 음식 이미지를 분석하여 탐지된 음식 항목 및 확률 반환
-        :param image: PIL 이미지 객체
+        :param image: 업로드 파일 내용(bytes) 또는 PIL 이미지 객체
         :return: 탐지된 음식 목록 [(음식명, 확률)]
         """
-        img_array = np.array(image)
-        results = self.model.predict(img_array)
+        if isinstance(image, Image.Image):
+            # YOLO는 numpy 입력을 BGR로 해석하므로 채널 순서를 맞춤
+            img_array = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+        else:
+            # 업로드 버퍼에서 바로 BGR로 디코딩 (큰 JPEG은 입력 크기에 맞춰 축소 디코딩)
+            img_array, _ = decode_image(image, 640)
+        if self.client is not None:
+            detections = self.client.predict(img_array)
+            return [(self.class_names[int(d['class'])], d['confidence']) for d in detections]
+
+        with self.model_lock:  # 캐시된 모델은 여러 세션이 함께 사용
+            results = self.model.predict(img_array)
 
         detected_items = []
         for r in results:
             for box in r.boxes:
                 class_id = int(box.cls)
-                class_name = self.model.names[class_id]
+                class_name = self.class_names[class_id]
                 confidence = box.conf.item()
                 detected_items.append((class_name, confidence))
 
@@ -41,31 +89,23 @@ class Nutrient:
         :param detected_items: 탐지된 음식 목록 [(음식명, 확률)]
         :return: 영양소 요약 데이터
         """
-        nutrient_summary = {
-            "Calories": 0,
-            "Protein": 0,
-            "Carbs": 0,
-            "Fat": 0
-        }
-
-        for food, _ in detected_items:
-            if food in self.nutrition_df.index:
-                nutrient_summary["Calories"] += self.nutrition_df.loc[food]["Calories"]
-                nutrient_summary["Protein"] += self.nutrition_df.loc[food]["Protein"]
-                nutrient_summary["Carbs"] += self.nutrition_df.loc[food]["Carbs"]
-                nutrient_summary["Fat"] += self.nutrition_df.loc[food]["Fat"]
+        # 미리 만든 표에서 행 번호로 바로 합산 (영양 데이터에 없는 음식은 0인 마지막 행)
+        rows = [self.food_rows.get(food, -1) for food, _ in detected_items]
+        totals = self.nutrient_vectors[rows].sum(axis=0)
 
+        nutrient_summary = {name: float(value) for name, value in zip(self.NUTRIENTS, totals)}
         return nutrient_summary
 
     def show(self):
         """스트림릿 페이지 UI 구성 및 음식 분석"""
         st.title("🥗 음식 영양소 분석기")
         st.subheader("사진을 업로드하면 음식의 영양소 정보를 분석합니다.")
+        st.caption(f"로드 시간: {format_timings(self.load_timings)}")
 
         uploaded_file = st.file_uploader("음식 사진을 업로드하세요", type=["jpg", "png", "jpeg"])
 
         if uploaded_file is not None:
-            image = Image.open(uploaded_file)
+            image = uploaded_file.getvalue()
             st.image(image, caption="업로드된 이미지", use_column_width=True)
 
             # 음식 분석
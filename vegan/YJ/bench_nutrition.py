@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# 상위 폴더(vegan)의 공용 모듈 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nutrition_table import NUTRIENT_COLUMNS, load_nutrition_table, class_nutrient_matrix, names_by_id
+
+
+def lookup_loc(nutrition_df, detected_items):
+    """기존 방식: 음식마다 .loc[food]로 행 Series를 만들어 컬럼별로 합산"""
+    totals = dict.fromkeys(NUTRIENT_COLUMNS, 0)
+    for food, _ in detected_items:
+        if food in nutrition_df.index:
+            for column in NUTRIENT_COLUMNS:
+                totals[column] += nutrition_df.loc[food][column]
+    return totals
+
+
+def lookup_vectors(nutrient_vectors, food_rows, detected_items):
+    """새 방식: 클래스 id -> 영양소 벡터 표에서 행 번호로 합산"""
+    rows = [food_rows.get(food, -1) for food, _ in detected_items]
+    totals = nutrient_vectors[rows].sum(axis=0)
+    return {column: float(value) for column, value in zip(NUTRIENT_COLUMNS, totals)}
+
+
+def synthetic_table(n_foods):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.uniform(0, 500, (n_foods, len(NUTRIENT_COLUMNS))), columns=NUTRIENT_COLUMNS)
+    df.index = pd.Index([f"food_{i}" for i in range(n_foods)], name='Food')
+    return df
+
+
+def time_per_call(fn, calls, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for items in calls:
+            fn(items)
+        best = min(best, time.perf_counter() - start)
+    return best / len(calls) * 1e6  # us/call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="get_nutritional_info 조회 방식별 호출당 시간 비교")
+    parser.add_argument("--nutrition", default=None, help="FDDB.xlsx 경로 (없으면 가상의 표 사용)")
+    parser.add_argument("--classes", type=int, default=100, help="탐지 모델 클래스 수")
+    parser.add_argument("--items", type=int, default=5, help="사진 한 장당 탐지된 음식 수")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.nutrition:
+        nutrition_df = load_nutrition_table(args.nutrition).reindex(columns=NUTRIENT_COLUMNS)
+    else:
+        nutrition_df = synthetic_table(5000)
+
+    # 클래스 중 일부는 영양 데이터에 없는 이름으로 섞음
+    rng = np.random.default_rng(1)
+    foods = list(nutrition_df.index[:args.classes - args.classes // 10])
+    class_names = {i: name for i, name in enumerate(foods + [f"unknown_{j}" for j in range(args.classes - len(foods))])}
+    calls = [
+        [(class_names[int(c)], 0.9) for c in rng.integers(0, len(class_names), args.items)]
+        for _ in range(args.calls)
+    ]
+
+    start = time.perf_counter()
+    nutrient_vectors, matched = class_nutrient_matrix(nutrition_df, class_names, NUTRIENT_COLUMNS)
+    food_rows = {name: i for i, name in enumerate(names_by_id(class_names))}
+    build_ms = (time.perf_counter() - start) * 1000
+
+    for items in calls[:50]:
+        old, new = lookup_loc(nutrition_df, items), lookup_vectors(nutrient_vectors, food_rows, items)
+        assert all(np.isclose(float(old[c]), new[c]) for c in NUTRIENT_COLUMNS), (old, new)
+
+    loc_us = time_per_call(lambda items: lookup_loc(nutrition_df, items), calls, args.repeat)
+    vec_us = time_per_call(lambda items: lookup_vectors(nutrient_vectors, food_rows, items), calls, args.repeat)
+
+    print(f"classes={len(class_names)} (matched {int(matched.sum())}), items/call={args.items}")
+    print(f"table build (once at startup): {build_ms:.2f} ms")
+    print(f".loc lookup:    {loc_us:9.1f} us/call")
+    print(f"vector lookup:  {vec_us:9.1f} us/call  ({loc_us / vec_us:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
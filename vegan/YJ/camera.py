@@ -1,3 +1,6 @@
+import os
+import sys
+import tempfile
 import streamlit as st
 import cv2
 import numpy as np
@@ -5,33 +8,75 @@ import pandas as pd
 from ultralytics import YOLO
 from PIL import Image
 
+# 상위 폴더(vegan)의 공용 모듈 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection_cache import get_default_cache, model_checksum
+from inference_worker import InferenceClient
+from resource_cache import load_cached, resource_lock, format_timings
+from nutrition_table import load_nutrition_table, load_class_nutrients, names_by_id
+from camera_stream import CameraStream
+from video_analysis import VideoAnalyzer
+from inference_backend import boxes_to_detections
+from image_ingest import decode_image
+
+
 class Nutrient:
-    def __init__(self, model_path="yolov8x.pt", nutrition_data_path="FDDB.xlsx"):
+    # (화면 표시 이름, 영양 데이터 컬럼, 단위)
+    NUTRIENTS = [
+        ("열량", "Calories", "kcal"),
+        ("단백질", "Protein", "g"),
+        ("탄수화물", "Carbs", "g"),
+        ("지방", "Fat", "g"),
+        ("칼슘", "Calcium", "mg"),
+        ("철분", "Iron", "mg")
+    ]
+    IMGSZ = 640  # YOLO 입력 크기 (업로드 사진은 이보다 크게 유지되는 선에서 축소 디코딩)
+    # 탐지 결과 캐시 키 파라미터: 같은 모델이라도 FoodDetector 등 다른 형식의 결과와 섞이지 않도록 구분
+    CACHE_PARAMS = {'view': 'items', 'imgsz': IMGSZ}
+
+    def __init__(self, model_path="yolov8x.pt", nutrition_data_path="FDDB.xlsx", worker_socket=None):
         """
         Nutrient 클래스 생성자
         :param model_path: YOLO 모델 경로
         :param nutrition_data_path: 영양소 데이터 Excel 파일 경로
+        :param worker_socket: 공용 추론 워커 소켓 경로 (기본값: INFERENCE_WORKER_SOCKET 환경변수)
         """
+        worker_socket = worker_socket or os.environ.get("INFERENCE_WORKER_SOCKET")
+        # 스트림릿은 클릭할 때마다 스크립트를 다시 실행하므로 모델/데이터는 캐시에서 가져옴
+        # (파일이 바뀌었을 때만 다시 로드, 세션 간 공유)
+        self.load_timings = {}
+        self.model_lock = resource_lock("yolo", model_path)
         try:
-            self.model = YOLO(model_path)
+            if worker_socket:
+                # 얇은 클라이언트 모드: 가중치는 워커 프로세스에만 로드됨
+                self.model = None
+                self.client, *timing = load_cached("worker", worker_socket, InferenceClient)
+                self.load_timings["워커 연결"] = timing
+                self.class_names = self.client.names
+                self.model_id = self.client.model_id
+            else:
+                self.model, *timing = load_cached("yolo", model_path, YOLO)
+                self.load_timings["모델"] = timing
+                self.client = None
+                self.class_names = self.model.names
+                self.model_id = model_checksum(model_path)
         except Exception as e:
             st.error(f"YOLO 모델 로드 실패: {e}")
             raise e
 
+        # 같은 사진을 다시 올리거나 재실행될 때 추론을 생략하기 위한 탐지 결과 캐시
+        self.cache = get_default_cache()
+
         try:
-            # [수정된 부분 시작] - 엑셀 파일 읽기 및 컬럼 매핑 수정
-            self.nutrition_df = pd.read_excel(nutrition_data_path)
-            self.nutrition_df = self.nutrition_df.rename(columns={
-                '식품명': 'Food',
-                '에너지(kcal)': 'Calories',
-                '단백질(g)': 'Protein',
-                '탄수화물(g)': 'Carbs',
-                '지방(g)': 'Fat',
-                '칼슘(mg)': 'Calcium',
-                '철분(mg)': 'Iron'
-            })
-            self.nutrition_df = self.nutrition_df.set_index('Food')
-            # [수정된 부분 끝]
+            # 엑셀은 처음 한 번만 변환되고(컬럼 이름 Food/Calories/... 변환 포함) 이후에는 변환된 표를 읽음
+            # 캐시된 DataFrame은 모든 세션이 함께 쓰므로 수정하지 않음
+            self.nutrition_df, *timing = load_cached("nutrition_xlsx", nutrition_data_path, load_nutrition_table)
+            self.load_timings["영양 데이터"] = timing
+            # 클래스 id -> 영양소 벡터 표 (클래스 이름이 식품명과 다르면 유사 매칭 후 별칭 파일에 저장,
+            # 그래도 없는 클래스는 여기서 한 번만 경고)
+            self.nutrient_vectors, _ = load_class_nutrients(
+                nutrition_data_path, self.nutrition_df, self.class_names, [column for _, column, _ in self.NUTRIENTS])
+            self.food_rows = {name: i for i, name in enumerate(names_by_id(self.class_names))}
         except FileNotFoundError:
             st.error(f"Excel 파일이 '{nutrition_data_path}' 경로에 없습니다.")
             raise
@@ -42,26 +87,64 @@ class Nutrient:
     def analyze_food(self, image):
         """
         업로드된 음식 이미지를 분석하여 탐지된 음식 항목 및 확률 반환
-        :param image: PIL 이미지 객체
+        :param image: 업로드 파일 내용(bytes) 또는 PIL 이미지 객체 (카메라 스냅샷)
         :return: 탐지된 음식 목록 [(음식명, 확률)]
         """
-        img_array = np.array(image)
         try:
-            results = self.model.predict(img_array)
-
-            detected_items = []
-            for r in results:
-                for box in r.boxes:
-                    class_id = int(box.cls)
-                    class_name = self.model.names[class_id]
-                    confidence = box.conf.item()
-                    detected_items.append((class_name, confidence))
-
-            return detected_items
+            if isinstance(image, Image.Image):
+                # YOLO는 numpy 입력을 BGR로 해석하므로 채널 순서를 맞춤
+                img_array = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+                detected_items = self.cache.get_or_compute(
+                    img_array, self.model_id, self.CACHE_PARAMS, lambda: self._predict_items(img_array))
+            else:
+                # 업로드 버퍼 그대로 캐시 키를 만들고, 캐시에 없을 때만 축소 디코딩
+                detected_items = self.cache.get_or_compute(
+                    image, self.model_id, self.CACHE_PARAMS, lambda: self._predict_items(decode_image(image, self.IMGSZ)[0]))
+            return [tuple(item) for item in detected_items]  # 캐시(JSON)에서는 리스트로 저장됨
         except Exception as e:
             st.error(f"YOLO 예측 실패: {e}")
             return []
 
+    def _predict_items(self, img_array):
+        if self.client is not None:
+            detections = self.client.predict(img_array)
+            return [(self.class_names[int(d['class'])], d['confidence']) for d in detections]
+
+        with self.model_lock:  # 캐시된 모델은 여러 세션이 함께 사용
+            results = self.model.predict(img_array)
+
+        detected_items = []
+        for r in results:
+            for box in r.boxes:
+                class_id = int(box.cls)
+                class_name = self.class_names[class_id]
+                confidence = box.conf.item()
+                detected_items.append((class_name, confidence))
+
+        return detected_items
+
+    def _predict_detections(self, frame):
+        """BGR 프레임 -> boxes_to_detections 형식의 탐지 결과 (동영상 분석용)"""
+        if self.client is not None:
+            return self.client.predict(frame)
+        with self.model_lock:
+            results = self.model.predict(frame, verbose=False)
+        return [d for r in results for d in boxes_to_detections(r.boxes)]
+
+    def analyze_video(self, source, detect_every=10, max_frames=None):
+        """
+        동영상(또는 카메라 스트림)을 분석하여 식사 전체의 음식 목록 반환
+        N 프레임마다/장면 전환 시에만 탐지하고 사이 프레임은 광류로 박스를 추적
+        :param source: 동영상 파일 경로, 카메라 번호 또는 CameraStream
+        :param detect_every: 전체 탐지 간격 (프레임)
+        :param max_frames: 처리할 최대 프레임 수
+        :return: (탐지된 음식 목록 [(음식명, 확률)], 처리 통계 dict)
+        """
+        analyzer = VideoAnalyzer(self._predict_detections, detect_every=detect_every)
+        result = analyzer.analyze(source, max_frames)
+        detected_items = [(self.class_names[item['class']], item['confidence']) for item in result['items']]
+        return detected_items, result['stats']
+
     # [수정된 부분 시작] - 영양소 정보 추출 함수 수정
     def get_nutritional_info(self, detected_items):
         """
@@ -69,86 +152,164 @@ class Nutrient:
         :param detected_items: 탐지된 음식 목록 [(음식명, 확률)]
         :return: 영양소 요약 데이터
         """
+        # 미리 만든 표에서 행 번호로 바로 합산 (영양 데이터에 없는 음식은 0인 마지막 행)
+        rows = [self.food_rows.get(food, -1) for food, _ in detected_items]
+        totals = self.nutrient_vectors[rows].sum(axis=0)
+
         nutrient_summary = {
-            "열량": {"value": 0, "unit": "kcal"},
-            "단백질": {"value": 0, "unit": "g"},
-            "탄수화물": {"value": 0, "unit": "g"},
-            "지방": {"value": 0, "unit": "g"},
-            "칼슘": {"value": 0, "unit": "mg"},
-            "철분": {"value": 0, "unit": "mg"}
+            label: {"value": float(value), "unit": unit}
+            for (label, _, unit), value in zip(self.NUTRIENTS, totals)
         }
-
-        for food, _ in detected_items:
-            if food in self.nutrition_df.index:
-                nutrient_summary["열량"]["value"] += self.nutrition_df.loc[food]["Calories"]
-                nutrient_summary["단백질"]["value"] += self.nutrition_df.loc[food]["Protein"]
-                nutrient_summary["탄수화물"]["value"] += self.nutrition_df.loc[food]["Carbs"]
-                nutrient_summary["지방"]["value"] += self.nutrition_df.loc[food]["Fat"]
-                nutrient_summary["칼슘"]["value"] += self.nutrition_df.loc[food]["Calcium"]
-                nutrient_summary["철분"]["value"] += self.nutrition_df.loc[food]["Iron"]
-
         return nutrient_summary
     # [수정된 부분 끝]
 
-    def capture_from_camera(self):
+    def _camera_stream(self, source):
+        """
+        세션별 백그라운드 캡처 스트림 (재실행되어도 st.session_state에 유지)
+        :param source: 카메라 번호 또는 동영상 파일 경로
+        """
+        stream = st.session_state.get("camera_stream")
+        if stream is not None and (stream.source != source or not stream.is_alive):
+            stream.stop()
+            stream = None
+        if stream is None:
+            stream = CameraStream(source, loop=True).start()
+            st.session_state["camera_stream"] = stream
+        return stream
+
+    def stop_camera(self):
+        stream = st.session_state.pop("camera_stream", None)
+        if stream is not None:
+            stream.stop()
+
+    def capture_from_camera(self, source=0, preview_fps=5):
         """
         카메라로부터 이미지를 캡처하는 함수
+        프레임은 백그라운드 스레드가 링 버퍼에 계속 받아두고, 미리보기는 preview_fps로만 갱신
+        :param source: 카메라 번호 또는 동영상 파일 경로
+        :param preview_fps: 미리보기 갱신 속도
         :return: 캡처된 이미지 (PIL Image 객체) 또는 None
         """
         try:
-            # 카메라 초기화
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                st.error("카메라를 열 수 없습니다.")
-                return None
-
-            # Streamlit에 카메라 미리보기 표시
-            camera_placeholder = st.empty()
-            capture_button = st.button("사진 촬영")
-
-            while not capture_button:
-                ret, frame = cap.read()
-                if ret:
-                    # BGR을 RGB로 변환
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    camera_placeholder.image(frame_rgb, channels="RGB", caption="카메라 미리보기")
-                else:
-                    st.error("프레임을 읽을 수 없습니다.")
-                    break
-
-            if capture_button:
-                ret, frame = cap.read()
-                if ret:
-                    # BGR을 RGB로 변환하고 PIL Image로 변환
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    image = Image.fromarray(frame_rgb)
-                    cap.release()
-                    return image
-                else:
-                    st.error("이미지 캡처에 실패했습니다.")
-
-            cap.release()
+            stream = self._camera_stream(source)
         except Exception as e:
-            st.error(f"카메라 캡처 중 오류 발생: {e}")
+            st.error(f"카메라를 열 수 없습니다: {e}")
             return None
-        
+
+        def preview():
+            item = stream.latest()
+            if item is not None:
+                st.image(item[2], channels="BGR",
+                         caption=f"카메라 미리보기 (캡처 {stream.fps:.0f} FPS)")
+
+        if hasattr(st, "fragment"):
+            # 미리보기 부분만 주기적으로 다시 실행 (페이지 전체 재실행/무한 루프 없음)
+            st.fragment(preview, run_every=1.0 / preview_fps)()
+        else:
+            preview()
+
+        if st.button("사진 촬영"):
+            image = stream.snapshot()  # 링 버퍼의 최신 프레임이라 기다리지 않음
+            if image is None:
+                st.error("이미지 캡처에 실패했습니다.")
+            return image
         return None
 
+    def show_results(self, detected_items):
+        """탐지된 음식 목록과 영양 성분 정보 표시"""
+        if detected_items:
+            st.write("**📋 탐지된 음식:**")
+            for food, confidence in detected_items:
+                st.write(f"- {food}: {confidence:.2f} 확률")
+
+            # [수정된 부분 시작] - 영양소 정보 출력 방식 변경
+            st.write("📊 **영양 성분 정보**")
+            st.write("기준량: 100ml/100g")
+
+            nutrient_info = self.get_nutritional_info(detected_items)
+
+            # 데이터프레임으로 변환하여 테이블 형식으로 표시
+            nutrient_df = pd.DataFrame([
+                {"영양성분": name, "함량": f"{info['value']:.1f} {info['unit']}"} 
+                for name, info in nutrient_info.items()
+            ])
+
+            st.table(nutrient_df)
+
+            # 영양소 분석 코멘트 추가
+            st.write("💡 **영양소 분석**")
+            comments = []
+            if nutrient_info["단백질"]["value"] > 15:
+                comments.append("단백질이 풍부한 식사입니다.")
+            if nutrient_info["칼슘"]["value"] > 200:
+                comments.append("칼슘이 풍부하게 포함되어 있습니다.")
+            if nutrient_info["철분"]["value"] > 2:
+                comments.append("철분이 풍부한 식사입니다.")
+
+            if comments:
+                for comment in comments:
+                    st.info(comment)
+            # [수정된 부분 끝]
+        else:
+            st.error("❌ 음식이 감지되지 않았습니다. 다시 시도해 주세요.")
+
+    def show_video(self):
+        """동영상 파일 전체를 분석해 식사 음식 목록과 영양 정보 표시"""
+        uploaded_video = st.file_uploader("식사 동영상을 업로드하세요", type=["mp4", "avi", "mov", "mkv"])
+        detect_every = st.slider("탐지 간격 (프레임)", 1, 30, 10,
+                                 help="이 간격마다 YOLO를 실행하고 사이 프레임은 광류로 추적합니다.")
+        if uploaded_video is None or not st.button("동영상 분석 시작"):
+            return
+
+        # OpenCV는 파일 경로로만 열 수 있으므로 임시 파일로 저장
+        suffix = os.path.splitext(uploaded_video.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            f.write(uploaded_video.getbuffer())
+            video_path = f.name
+        try:
+            with st.spinner("🔍 동영상 분석 중..."):
+                detected_items, stats = self.analyze_video(video_path, detect_every)
+        except Exception as e:
+            st.error(f"동영상 처리 중 오류 발생: {e}")
+            return
+        finally:
+            os.unlink(video_path)
+
+        st.caption(f"{stats['frames']} 프레임 / {stats['elapsed_s']:.1f}초 "
+                   f"({stats['effective_fps']:.1f} FPS), 탐지 {stats['detect_calls']}회 "
+                   f"(생략 {stats['calls_saved']}회, 장면 전환 {stats['scene_cuts']}회)")
+        self.show_results(detected_items)
+
     def show(self):
         """스트림릿 페이지 UI 구성 및 음식 분석"""
         st.title("🍗 음식 영양소 분석기")
         st.subheader("사진을 업로드하면 음식의 영양소 정보를 분석합니다.")
+        st.caption(f"로드 시간: {format_timings(self.load_timings)}")
 
-        input_method = st.radio("이미지 입력 방식 선택", ["파일 업로드", "카메라 촬영"])
+        input_method = st.radio("이미지 입력 방식 선택", ["파일 업로드", "카메라 촬영", "동영상 분석"])
         
         image = None
         if input_method == "파일 업로드":
+            self.stop_camera()
             uploaded_file = st.file_uploader("음식 사진을 업로드하세요", type=["jpg", "png", "jpeg"])
             if uploaded_file is not None:
-                image = Image.open(uploaded_file)
+                image = uploaded_file.getvalue()  # PIL로 전체 디코딩하지 않고 버퍼를 그대로 넘김
+        elif input_method == "동영상 분석":
+            self.stop_camera()
+            self.show_video()
         else:
-            if st.button("카메라 켜기"):
-                image = self.capture_from_camera()
+            source = st.text_input("카메라 번호 또는 동영상 파일 경로", "0")
+            source = int(source) if source.strip().isdigit() else source.strip()
+            preview_fps = st.slider("미리보기 FPS", 1, 15, 5)
+            # 버튼은 다음 재실행 때 꺼지므로 체크박스로 카메라 상태 유지
+            if st.checkbox("카메라 켜기"):
+                captured = self.capture_from_camera(source, preview_fps)
+                if captured is not None:
+                    st.session_state["captured_image"] = captured
+                image = st.session_state.get("captured_image")
+            else:
+                self.stop_camera()
+                st.session_state.pop("captured_image", None)
 
         if image is not None:
             try:
@@ -158,41 +319,7 @@ class Nutrient:
                 st.write("🔍 음식 분석 중...")
                 detected_items = self.analyze_food(image)
 
-                if detected_items:
-                    st.write("**📋 탐지된 음식:**")
-                    for food, confidence in detected_items:
-                        st.write(f"- {food}: {confidence:.2f} 확률")
-
-                    # [수정된 부분 시작] - 영양소 정보 출력 방식 변경
-                    st.write("📊 **영양 성분 정보**")
-                    st.write("기준량: 100ml/100g")
-                    
-                    nutrient_info = self.get_nutritional_info(detected_items)
-                    
-                    # 데이터프레임으로 변환하여 테이블 형식으로 표시
-                    nutrient_df = pd.DataFrame([
-                        {"영양성분": name, "함량": f"{info['value']:.1f} {info['unit']}"} 
-                        for name, info in nutrient_info.items()
-                    ])
-                    
-                    st.table(nutrient_df)
-                    
-                    # 영양소 분석 코멘트 추가
-                    st.write("💡 **영양소 분석**")
-                    comments = []
-                    if nutrient_info["단백질"]["value"] > 15:
-                        comments.append("단백질이 풍부한 식사입니다.")
-                    if nutrient_info["칼슘"]["value"] > 200:
-                        comments.append("칼슘이 풍부하게 포함되어 있습니다.")
-                    if nutrient_info["철분"]["value"] > 2:
-                        comments.append("철분이 풍부한 식사입니다.")
-                    
-                    if comments:
-                        for comment in comments:
-                            st.info(comment)
-                    # [수정된 부분 끝]
-                else:
-                    st.error("❌ 음식이 감지되지 않았습니다. 다시 시도해 주세요.")
+                self.show_results(detected_items)
             except Exception as e:
                 st.error(f"이미지 처리 중 오류 발생: {e}")
 
@@ -0,0 +1,162 @@
+"""
+백그라운드 카메라 캡처
+
+cv2.VideoCapture를 별도 스레드에서 계속 읽어 고정 크기 링 버퍼에 최근 프레임만 보관
+UI 쪽은 필요할 때 최신 프레임을 가져가기만 하므로 미리보기 속도와 캡처 속도가 분리되고
+촬영 버튼을 누르면 기다림 없이 바로 스냅샷을 얻을 수 있음
+카메라 대신 동영상 파일을 소스로 넣으면 같은 방식으로 테스트 가능 (파일 FPS에 맞춰 재생)
+"""
+import time
+import threading
+from collections import deque
+import cv2
+from PIL import Image
+
+
+class CameraStream:
+    MAX_READ_FAILURES = 5  # loop 모드에서 처음으로 되돌려도 프레임을 못 읽으면 이만큼 재시도 후 종료
+
+    def __init__(self, source=0, buffer_size=4, realtime=True, loop=False):
+        """
+        :param source: 카메라 번호(int) 또는 동영상 파일 경로
+        :param buffer_size: 링 버퍼에 보관할 최근 프레임 수
+        :param realtime: 동영상 파일을 원래 FPS 속도로 읽을지 여부 (False면 최대한 빠르게 전부 읽음)
+        :param loop: 동영상 파일이 끝나면 처음부터 다시 읽을지 여부
+        """
+        self.source = source
+        self.realtime = realtime
+        self.loop = loop
+        self._frames = deque(maxlen=buffer_size)  # (번호, 시각, BGR 프레임)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._cap = None
+        self.frames_read = 0
+        self.fps = 0.0  # 실제 캡처 속도
+        self.finished = False  # 동영상 파일 끝 또는 카메라 오류
+
+    @property
+    def is_file(self):
+        return not isinstance(self.source, int)
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            self._cap.release()
+            raise RuntimeError(f"could not open video source {self.source!r}")
+        self._thread = threading.Thread(target=self._run, name="CameraStream", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        file_fps = self._cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        frame_interval = 1.0 / file_fps if self.realtime and file_fps and file_fps > 0 else 0.0
+        next_time = time.perf_counter()
+        window_start, window_frames = time.perf_counter(), 0
+        failures = 0  # 프레임을 하나도 읽지 못한 채 연속으로 실패한 횟수
+        try:
+            while not self._stop.is_set():
+                ret, frame = self._cap.read()
+                if not ret:
+                    failures += 1
+                    if self.is_file and self.loop and failures <= self.MAX_READ_FAILURES:
+                        # 정상적인 파일 끝이면 바로 다시 읽고, 계속 실패하면(손상된 파일 등) 점점 길게 쉼
+                        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        if failures > 1:
+                            self._stop.wait(min(0.05 * 2 ** failures, 1.0))
+                        continue
+                    if failures > 1:
+                        print(f"Warning: could not read frames from {self.source!r}, stopping")
+                    break
+                failures = 0
+
+                now = time.perf_counter()
+                with self._cond:
+                    self.frames_read += 1
+                    self._frames.append((self.frames_read, now, frame))
+                    self._cond.notify_all()
+
+                window_frames += 1
+                if now - window_start >= 1.0:
+                    self.fps = window_frames / (now - window_start)
+                    window_start, window_frames = now, 0
+
+                if frame_interval:
+                    # 동영상 파일은 카메라처럼 원래 속도로 흘려보냄
+                    next_time += frame_interval
+                    delay = next_time - time.perf_counter()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    else:
+                        next_time = time.perf_counter()
+        finally:
+            self._cap.release()
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def latest(self):
+        """
+        가장 최근 프레임 (복사하지 않음, 프레임은 버퍼에 들어간 뒤 수정되지 않음)
+        :return: (프레임 번호, 캡처 시각, BGR 프레임) 또는 None
+        """
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(self, after=0, timeout=None):
+        """
+        프레임 번호가 after보다 큰 프레임이 들어올 때까지 대기
+        :return: (프레임 번호, 캡처 시각, BGR 프레임) 또는 None (시간 초과/스트림 종료)
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (self._frames and self._frames[-1][0] > after) or self.finished, timeout)
+            if self._frames and self._frames[-1][0] > after:
+                return self._frames[-1]
+            return None
+
+    def frames(self, timeout=5.0):
+        """
+        새 프레임을 차례로 반환하는 제너레이터 (처리가 느리면 밀린 프레임은 건너뜀)
+        """
+        seq = 0
+        while True:
+            item = self.wait_for_frame(seq, timeout)
+            if item is None:
+                return
+            seq = item[0]
+            yield item
+
+    def snapshot(self):
+        """
+        최신 프레임을 RGB PIL 이미지로 반환 (없으면 잠깐 기다림)
+        :return: PIL Image 또는 None
+        """
+        item = self.latest() or self.wait_for_frame(timeout=2.0)
+        if item is None:
+            return None
+        return Image.fromarray(cv2.cvtColor(item[2], cv2.COLOR_BGR2RGB))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    @property
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __del__(self):
+        try:
+            self.stop()
+        except Exception:
+            pass
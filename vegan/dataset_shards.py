@@ -0,0 +1,285 @@
+import io
+import json
+import mmap
+import shutil
+import hashlib
+import tarfile
+import tempfile
+from pathlib import Path
+import yaml
+from PIL import Image
+
+SHARD_INDEX_NAME = 'shards.json'
+SHARD_VERSION = 1
+SPLITS = ('train', 'val')
+
+
+def write_shards(dataset_dir, shard_dir, max_shard_bytes=1 << 30):
+    """
+    YOLO 데이터셋(train/val 폴더)을 큰 tar 샤드 몇 개로 묶음
+    이미지와 레이블을 같은 샤드에 나란히 저장하고, 샤드별 오프셋 인덱스를 함께 기록
+
+    Args:
+        dataset_dir (str): dataset.yaml이 있는 YOLO 데이터셋 디렉토리
+        shard_dir (str): 샤드를 저장할 디렉토리
+        max_shard_bytes (int): 샤드 하나의 최대 크기 (대략)
+
+    Returns:
+        str: 샤드 인덱스(shards.json) 경로
+    """
+    dataset_dir = Path(dataset_dir)
+    shard_dir = Path(shard_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    with open(dataset_dir / 'dataset.yaml', 'r', encoding='utf-8') as f:
+        names = yaml.safe_load(f)['names']
+
+    shards = []
+    for split in SPLITS:
+        shard_count = 0
+        images_dir = dataset_dir / split / 'images'
+        labels_dir = dataset_dir / split / 'labels'
+        if not images_dir.exists():
+            continue
+
+        tar = None
+        shard_bytes = 0
+        for img_path in sorted(images_dir.iterdir(), key=lambda p: p.name):
+            label_path = labels_dir / (img_path.stem + '.txt')
+            if not label_path.exists():
+                print(f"Warning: No label for {img_path}, skipped")
+                continue
+
+            img_size = img_path.stat().st_size
+            if tar is None or shard_bytes + img_size > max_shard_bytes:
+                if tar is not None:
+                    tar.close()
+                shard_path = shard_dir / f"{split}-{shard_count:05d}.tar"
+                shard_count += 1
+                tar = tarfile.open(shard_path, 'w', format=tarfile.PAX_FORMAT)
+                shards.append({'file': shard_path.name, 'split': split})
+                shard_bytes = 0
+
+            # 이미지와 레이블을 연속으로 기록 (순차 읽기에 유리)
+            # 링크 모드로 만든 데이터셋이어도 실제 파일 내용을 담도록 tar.add 대신 addfile 사용
+            for src, arcname in ((img_path, f"{split}/images/{img_path.name}"),
+                                 (label_path, f"{split}/labels/{label_path.name}")):
+                with open(src, 'rb') as f:
+                    info = tar.gettarinfo(fileobj=f, arcname=arcname)
+                    tar.addfile(info, f)
+                shard_bytes += info.size
+        if tar is not None:
+            tar.close()
+
+    # 샤드별 오프셋 인덱스 (헤더만 순차로 읽으므로 빠름)
+    for shard in shards:
+        shard_path = shard_dir / shard['file']
+        members = {}
+        with open(shard_path, 'rb') as raw, tarfile.open(fileobj=raw, mode='r:') as tar:
+            for info in tar:
+                if not info.isfile():
+                    continue
+                raw.seek(info.offset_data)
+                digest = hashlib.sha1(raw.read(info.size)).hexdigest()
+                members[info.name] = [info.offset_data, info.size, digest]
+        shard['size'] = shard_path.stat().st_size
+        shard['members'] = members
+
+    index_path = shard_dir / SHARD_INDEX_NAME
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': SHARD_VERSION, 'names': names, 'shards': shards}, f, ensure_ascii=False)
+
+    # 이전 실행에서 샤드가 더 많았으면 남은 샤드 파일 삭제 (새 인덱스에 없는 샘플이 섞이지 않도록)
+    current = {shard['file'] for shard in shards}
+    for split in SPLITS:
+        for old_path in shard_dir.glob(f"{split}-*.tar"):
+            if old_path.name not in current:
+                old_path.unlink()
+
+    total = sum(len(s['members']) // 2 for s in shards)
+    print(f"Wrote {total} samples into {len(shards)} shards at {shard_dir}")
+    return str(index_path)
+
+
+def _valid_label_line(line, n_classes):
+    parts = line.split()
+    if len(parts) != 5 or not parts[0].isdigit() or int(parts[0]) >= n_classes:
+        return False
+    try:
+        return all(0.0 <= float(v) <= 1.0 for v in parts[1:])
+    except ValueError:
+        return False
+
+
+class ShardDataset:
+    """
+    write_shards로 만든 샤드를 읽는 클래스
+    - iter_samples: tar 스트림을 처음부터 끝까지 순차로 읽음
+    - read: 오프셋 인덱스와 mmap으로 임의 접근 (복사 없이 memoryview 반환,
+      close() 뒤에도 남아 있는 memoryview는 유효하고 그 mmap은 뷰가 모두 해제될 때 닫힘)
+    - validate: 해시/이미지 헤더/레이블 형식 검증
+    - materialize: 학습 노드의 로컬 디스크에 풀어서 FoodDetector.train에 넘길 yaml 생성
+    """
+
+    def __init__(self, shard_path):
+        shard_path = Path(shard_path)
+        self.shard_dir = shard_path if shard_path.is_dir() else shard_path.parent
+        with open(self.shard_dir / SHARD_INDEX_NAME, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get('version') != SHARD_VERSION:
+            raise ValueError(f"Unsupported shard version in {self.shard_dir}")
+        self.names = {int(k): v for k, v in self.index['names'].items()}
+        self._maps = {}
+
+    def __len__(self):
+        return sum(len(s['members']) // 2 for s in self.index['shards'])
+
+    def close(self):
+        for f, mm in self._maps.values():
+            try:
+                mm.close()
+            except BufferError:
+                # read()로 넘겨준 memoryview가 아직 살아 있음 -> 참조만 버리고 뷰가 해제될 때 닫히게 함
+                pass
+            f.close()
+        self._maps = {}
+
+    def _mmap(self, shard_file):
+        if shard_file not in self._maps:
+            f = open(self.shard_dir / shard_file, 'rb')
+            self._maps[shard_file] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return self._maps[shard_file][1]
+
+    def read(self, member_name):
+        """샤드 안의 파일 하나를 memoryview로 반환"""
+        for shard in self.index['shards']:
+            entry = shard['members'].get(member_name)
+            if entry is not None:
+                offset, size, _ = entry
+                return memoryview(self._mmap(shard['file']))[offset:offset + size]
+        raise KeyError(member_name)
+
+    def iter_samples(self, split=None):
+        """
+        (멤버 경로, 이미지 bytes, 레이블 문자열)을 샤드 순서대로 반환
+        """
+        for shard in self.index['shards']:
+            if split is not None and shard['split'] != split:
+                continue
+            image = None
+            with tarfile.open(self.shard_dir / shard['file'], mode='r|') as tar:
+                for info in tar:
+                    data = tar.extractfile(info).read()
+                    if '/images/' in info.name:
+                        image = (info.name, data)
+                    elif image is not None:
+                        yield image[0], image[1], data.decode('utf-8')
+                        image = None
+
+    def validate(self, check_images=True):
+        """
+        샤드 전체를 검증
+
+        Returns:
+            dict: 샘플 수와 오류 목록
+        """
+        errors = []
+        samples = 0
+        n_classes = len(self.names)
+        for shard in self.index['shards']:
+            shard_path = self.shard_dir / shard['file']
+            if not shard_path.exists() or shard_path.stat().st_size != shard['size']:
+                errors.append(f"{shard['file']}: missing or size mismatch")
+                continue
+
+            mm = self._mmap(shard['file'])
+            members = shard['members']
+            for name, (offset, size, digest) in members.items():
+                if offset + size > len(mm):
+                    errors.append(f"{name}: out of bounds")
+                    continue
+                data = mm[offset:offset + size]
+                if hashlib.sha1(data).hexdigest() != digest:
+                    errors.append(f"{name}: checksum mismatch")
+                    continue
+
+                if '/images/' in name:
+                    samples += 1
+                    split, _, file_name = name.split('/', 2)
+                    label_name = f"{split}/labels/{Path(file_name).stem}.txt"
+                    if label_name not in members:
+                        errors.append(f"{name}: label missing")
+                    if check_images:
+                        try:
+                            with Image.open(io.BytesIO(data)) as img:
+                                img.size  # 헤더만 읽음
+                        except Exception as e:
+                            errors.append(f"{name}: unreadable image ({e})")
+                else:
+                    for line in data.decode('utf-8').splitlines():
+                        if not _valid_label_line(line, n_classes):
+                            errors.append(f"{name}: invalid label line {line!r}")
+
+        return {'samples': samples, 'shards': len(self.index['shards']), 'errors': errors}
+
+    def materialize(self, dest_dir=None):
+        """
+        샤드를 로컬 디렉토리에 순차로 풀고 dataset.yaml 경로를 반환
+        (같은 샤드 인덱스로 이미 풀어둔 디렉토리가 있으면 재사용)
+        """
+        index_bytes = (self.shard_dir / SHARD_INDEX_NAME).read_bytes()
+        index_digest = hashlib.sha1(index_bytes).hexdigest()
+        if dest_dir is None:
+            dest_dir = Path(tempfile.gettempdir()) / 'vegan_shards' / index_digest[:16]
+        dest_dir = Path(dest_dir)
+        yaml_path = dest_dir / 'dataset.yaml'
+        marker = dest_dir / '.materialized'
+
+        if marker.exists() and marker.read_text() == index_digest:
+            return str(yaml_path)
+
+        # 다른 인덱스로 풀어둔 파일이 남아 있으면 학습에 섞이므로 먼저 삭제
+        if marker.exists():
+            marker.unlink()
+        for split in SPLITS:
+            shutil.rmtree(dest_dir / split, ignore_errors=True)
+        for split in SPLITS:
+            (dest_dir / split / 'images').mkdir(parents=True, exist_ok=True)
+            (dest_dir / split / 'labels').mkdir(parents=True, exist_ok=True)
+        for shard in self.index['shards']:
+            with tarfile.open(self.shard_dir / shard['file'], mode='r|') as tar:
+                for info in tar:
+                    if not info.isfile():
+                        continue
+                    target = dest_dir / info.name
+                    # 인덱스에 없는 경로(../ 등)는 무시
+                    if info.name not in shard['members']:
+                        continue
+                    with open(target, 'wb') as f:
+                        f.write(tar.extractfile(info).read())
+
+        yaml_content = {
+            'path': str(dest_dir.absolute()),
+            'train': str(dest_dir.absolute() / 'train' / 'images'),
+            'val': str(dest_dir.absolute() / 'val' / 'images'),
+            'names': self.names,
+        }
+        with open(yaml_path, 'w') as f:
+            yaml.dump(yaml_content, f, default_flow_style=False)
+        marker.write_text(index_digest)
+        return str(yaml_path)
+
+
+def resolve_data_yaml(data, shard_cache_dir=None):
+    """
+    FoodDetector.train에 넘긴 경로가 샤드(디렉토리 또는 shards.json)면
+    로컬에 풀어서 dataset.yaml 경로로 바꿔줌. 일반 yaml이면 그대로 반환
+    """
+    data = Path(data)
+    if data.name == SHARD_INDEX_NAME or (data.is_dir() and (data / SHARD_INDEX_NAME).exists()):
+        shards = ShardDataset(data)
+        try:
+            return shards.materialize(shard_cache_dir)
+        finally:
+            shards.close()
+    return str(data)
@@ -0,0 +1,414 @@
+import os
+import json
+import shutil
+import hashlib
+import time
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageOps
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 2
+PHASH_CACHE_NAME = 'phash_cache.json'
+
+# 원본 이미지를 데이터셋 폴더에 만드는 방식 (copy 외에는 실패 시 copy로 대체)
+LINK_MODES = ('copy', 'hardlink', 'symlink', 'reflink')
+
+# Linux FICLONE ioctl (btrfs, xfs 등에서 블록을 공유하는 복사)
+FICLONE = 0x40049409
+
+
+# 이미지 헤더만 읽어서 크기 확인 (픽셀 전체를 디코딩하지 않음)
+def read_image_size(img_path):
+    try:
+        with Image.open(img_path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        return False
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except FileNotFoundError:
+            pass
+        return False
+
+
+def materialize(src, dst, link_mode='copy'):
+    """
+    원본 이미지를 데이터셋 위치에 복사 또는 링크
+
+    Returns:
+        str: 실제로 사용된 방식 (지원되지 않으면 'copy')
+    """
+    # 증분 갱신 시 기존 파일을 먼저 제거
+    # (하드링크는 원본과 inode를 공유하므로 덮어쓰면 원본까지 바뀜)
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+
+    if link_mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:  # 다른 파일시스템/드라이브
+            pass
+    elif link_mode == 'symlink':
+        try:
+            os.symlink(os.path.abspath(src), dst)
+            return 'symlink'
+        except OSError:  # Windows 권한 부족 등
+            pass
+    elif link_mode == 'reflink':
+        if _reflink(src, dst):
+            return 'reflink'
+
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def output_name(rel_path):
+    """
+    원본 상대 경로로 데이터셋 파일 이름 생성
+    하위 폴더나 클래스가 달라도 파일 이름이 같으면 서로 덮어쓰던 문제 방지
+    (예: kimchi/a/img1.jpg -> img1_3f2a9c01.jpg)
+    """
+    rel_path = Path(rel_path)
+    digest = hashlib.md5(rel_path.as_posix().encode('utf-8')).hexdigest()[:8]
+    return f"{rel_path.stem}_{digest}{rel_path.suffix}"
+
+
+def process_image(img_path, output_dir, label_content, link_mode='copy', name=None):
+    """
+    이미지 한 장을 검증한 뒤 YOLO 데이터셋 폴더로 복사하고 레이블 파일을 작성
+    (프로세스 풀에서도 호출할 수 있도록 모듈 최상위 함수로 정의)
+
+    Args:
+        img_path (Path): 원본 이미지 경로
+        output_dir (Path): train 또는 val 디렉토리
+        label_content (str): YOLO 포맷 레이블 한 줄
+        link_mode (str): 'copy', 'hardlink', 'symlink', 'reflink' 중 하나
+        name (str): 데이터셋에 저장할 파일 이름 (기본값: 원본 이름)
+
+    Returns:
+        tuple: (이미지 경로, 성공 여부, 경고/에러 메시지, 매니페스트 레코드)
+    """
+    img_path = Path(img_path)
+    output_dir = Path(output_dir)
+    name = name or img_path.name
+    try:
+        # 헤더만 읽어서 손상된 이미지 걸러내기
+        if read_image_size(img_path) is None:
+            return img_path, False, f"Warning: Could not read image {img_path}", None
+
+        # 이미지 복사 또는 링크
+        used_mode = materialize(img_path, output_dir / 'images' / name, link_mode)
+
+        # 레이블 파일 저장
+        label_path = output_dir / 'labels' / (Path(name).stem + '.txt')
+        with open(label_path, 'w') as f:
+            f.write(label_content)
+
+        # 증분 준비를 위한 매니페스트 레코드
+        # (링크 방식은 원본을 읽지 않는 것이 목적이므로 해시를 계산하지 않음)
+        st = img_path.stat()
+        record = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': file_hash(img_path) if used_mode == 'copy' else None,
+            'name': name,
+            'link': used_mode,
+        }
+        return img_path, True, None, record
+    except Exception as e:
+        return img_path, False, f"Error processing {img_path}: {str(e)}", None
+
+
+def resize_image(src, dst, imgsz, quality=90):
+    """
+    학습 해상도(imgsz)에 맞춰 축소한 JPEG을 캐시에 저장
+    - JPEG은 draft 모드로 DCT 단계에서 1/2~1/8 축소 디코딩
+    - EXIF 회전을 미리 적용 (cv2.imread와 같은 방향)
+    - 긴 변을 imgsz로 맞추고 패딩은 넣지 않음 (전체 이미지 박스 레이블이 그대로 유효,
+      레터박스는 학습 시 ultralytics가 수행)
+    - 캐시 파일의 mtime을 원본과 같게 맞춰서 다음 실행 때 변경 여부 판단
+
+    Returns:
+        tuple: (원본 경로, 성공 여부, 경고/에러 메시지, 새로 만들었는지 여부)
+    """
+    try:
+        st = os.stat(src)
+        try:
+            if os.stat(dst).st_mtime_ns == st.st_mtime_ns:
+                return src, True, None, False
+        except FileNotFoundError:
+            pass
+
+        with Image.open(src) as img:
+            img.draft('RGB', (imgsz, imgsz))
+            img = ImageOps.exif_transpose(img).convert('RGB')
+            img.thumbnail((imgsz, imgsz), Image.BILINEAR)
+            img.save(dst, 'JPEG', quality=quality)
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+        return src, True, None, True
+    except Exception as e:
+        return src, False, f"Error resizing {src}: {str(e)}", False
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def assign_split(rel_path, train_ratio):
+    """
+    새로 추가된 이미지의 train/val 분할을 경로 해시로 결정
+    (같은 경로는 실행할 때마다 항상 같은 분할에 배정됨)
+    """
+    digest = hashlib.md5(rel_path.encode('utf-8')).hexdigest()
+    return 'train' if int(digest[:8], 16) / 0xFFFFFFFF < train_ratio else 'val'
+
+
+def load_manifest(manifest_path):
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read manifest {manifest_path}: {e}")
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(manifest_path, class_names, train_ratio, images, link_mode='copy', failed=None):
+    """
+    Args:
+        images (dict): 원본 상대 경로 -> 데이터셋에 들어간 이미지의 레코드
+        failed (dict): 원본 상대 경로 -> 처리에 실패한 이미지의 크기/수정시각/클래스 (바뀌기 전까지 다시 시도하지 않음)
+    """
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'class_names': list(class_names),
+        'train_ratio': train_ratio,
+        'link_mode': link_mode,
+        'images': images,
+        'failed': failed or {},
+    }
+    # 쓰는 도중 중단되어도 이전 매니페스트가 깨지지 않도록 임시 파일 후 교체
+    tmp_path = Path(manifest_path).with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def remove_outputs(output_dir, name):
+    """데이터셋에서 이미지와 레이블 파일 삭제"""
+    output_dir = Path(output_dir)
+    for path in (output_dir / 'images' / name, output_dir / 'labels' / (Path(name).stem + '.txt')):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# DCT 기반 perceptual hash (32x32 그레이스케일 -> 저주파 8x8 계수의 중앙값 비교)
+_DCT_SIZE = 32
+_DCT_MATRIX = np.cos(np.pi * np.outer(np.arange(_DCT_SIZE), 2 * np.arange(_DCT_SIZE) + 1) / (2 * _DCT_SIZE))
+
+
+def image_phash(img_path):
+    """
+    이미지의 64비트 perceptual hash 계산 (프로세스 풀에서 호출)
+
+    Returns:
+        tuple: (이미지 경로, 해시(int) 또는 None)
+    """
+    try:
+        with Image.open(img_path) as img:
+            img.draft('L', (_DCT_SIZE * 4, _DCT_SIZE * 4))
+            pixels = np.asarray(img.convert('L').resize((_DCT_SIZE, _DCT_SIZE), Image.BILINEAR),
+                                dtype=np.float64)
+    except Exception:
+        return img_path, None
+    coeffs = (_DCT_MATRIX @ pixels @ _DCT_MATRIX.T)[:8, :8].ravel()
+    bits = coeffs > np.median(coeffs[1:])  # DC 성분 제외한 중앙값 기준
+    return img_path, int(np.packbits(bits).view('>u8')[0])
+
+
+class BKTree:
+    """
+    해밍 거리용 BK-tree
+    거리 radius 이내의 해시를 전체 비교 없이 찾음 (삼각부등식으로 가지치기)
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = self.root
+        if node is None:
+            self.root = [value, item, {}]
+            return
+        while True:
+            dist = (value ^ node[0]).bit_count()
+            child = node[2].get(dist)
+            if child is None:
+                node[2][dist] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            dist = (value ^ node[0]).bit_count()
+            if dist <= radius:
+                results.append((dist, node[1]))
+            for d, child in node[2].items():
+                if dist - radius <= d <= dist + radius:
+                    stack.append(child)
+        return results
+
+
+def load_phash_cache(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_phash_cache(cache_path, cache):
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+INDEX_NAME = 'file_index.json'
+INDEX_VERSION = 1
+
+
+class ImageIndex:
+    """
+    os.scandir 기반 이미지 파일 인덱스
+    - 디렉토리 트리를 한 번만 순회하며 확장자는 대소문자 구분 없이 비교
+    - 디렉토리별 (mtime, 파일 목록, 하위 디렉토리)를 캐시해서
+      mtime이 그대로인 디렉토리는 다시 나열하지 않음 (stat 한 번으로 끝)
+    """
+
+    def __init__(self, cache_path=None, extensions=IMAGE_EXTENSIONS):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.dirs = self._load()
+        self.stats = {}
+
+    def _load(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get('version') != INDEX_VERSION or cache.get('extensions') != list(self.extensions):
+            return {}
+        return cache['dirs']
+
+    def save(self, cache_path=None):
+        cache_path = Path(cache_path) if cache_path else self.cache_path
+        if cache_path is None:
+            return
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'extensions': list(self.extensions),
+                       'dirs': self.dirs}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+
+    def scan(self, root):
+        """
+        root 아래의 이미지 파일을 재귀적으로 찾음
+
+        Returns:
+            list: 정렬된 이미지 경로(Path) 목록
+        """
+        start = time.perf_counter()
+        listed = reused = 0
+        images = []
+        visited = set()
+        stack = [os.fspath(root)]
+        while stack:
+            dir_path = stack.pop()
+            visited.add(dir_path)
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except FileNotFoundError:
+                self.dirs.pop(dir_path, None)
+                continue
+
+            entry = self.dirs.get(dir_path)
+            if entry is None or entry['mtime_ns'] != mtime_ns:
+                entry = self._list_dir(dir_path, mtime_ns)
+                self.dirs[dir_path] = entry
+                listed += 1
+            else:
+                reused += 1
+
+            images.extend(os.path.join(dir_path, name) for name in entry['files'])
+            stack.extend(os.path.join(dir_path, name) for name in entry['subdirs'])
+
+        # 삭제된 하위 디렉토리는 더 이상 방문하지 않으므로 캐시에서도 제거
+        prefix = os.fspath(root) + os.sep
+        for dir_path in [d for d in self.dirs if d.startswith(prefix) and d not in visited]:
+            del self.dirs[dir_path]
+
+        images.sort()
+        self.stats[os.fspath(root)] = {
+            'seconds': time.perf_counter() - start,
+            'files': len(images),
+            'dirs_listed': listed,
+            'dirs_cached': reused,
+        }
+        return [Path(p) for p in images]
+
+    def _list_dir(self, dir_path, mtime_ns):
+        files, subdirs = [], []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif os.path.splitext(entry.name)[1].lower() in self.extensions and entry.is_file():
+                    files.append(entry.name)
+        return {'mtime_ns': mtime_ns, 'files': files, 'subdirs': subdirs}
+
+    def prune(self, roots):
+        """더 이상 사용하지 않는 루트 아래의 캐시 항목 제거"""
+        roots = tuple(os.fspath(r) for r in roots)
+        self.dirs = {d: e for d, e in self.dirs.items()
+                     if any(d == r or d.startswith(r + os.sep) for r in roots)}
+
+
+def default_num_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
@@ -0,0 +1,249 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vegan_detections")
+
+_checksums = {}
+_checksums_lock = threading.Lock()
+
+
+def model_checksum(model_path):
+    """
+    모델 가중치 파일의 sha256 (경로/크기/수정시각이 같으면 다시 계산하지 않음)
+    """
+    path = Path(model_path)
+    if not path.exists():  # 'yolov8x.pt'처럼 ultralytics가 받아오는 이름
+        return str(model_path)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    with _checksums_lock:
+        if key in _checksums:
+            return _checksums[key]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    with _checksums_lock:
+        _checksums[key] = h.hexdigest()
+    return _checksums[key]
+
+
+def image_digest(image):
+    """
+    이미지 내용의 sha256
+    bytes/memoryview는 그대로, numpy 배열은 shape/dtype과 함께 버퍼를 복사 없이 해시
+    """
+    h = hashlib.sha256()
+    if isinstance(image, np.ndarray):
+        h.update(f"{image.shape}{image.dtype}".encode())
+        h.update(memoryview(np.ascontiguousarray(image)).cast('B'))
+    else:
+        h.update(image)
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """
+    탐지 결과 캐시 (키: 이미지 해시 + 모델 체크섬 + predict 파라미터)
+    - 1단계: 프로세스 메모리 LRU
+    - 2단계: 디스크 (용량 제한, 가장 오래 사용하지 않은 항목부터 삭제)
+    디스크 폴더는 여러 프로세스(serve.py 워커, Streamlit 세션 등)가 함께 쓸 수 있으므로
+    디스크 쪽은 폴더 내용을 기준으로 함: 조회는 파일을 바로 열고, 용량 제한은 폴더를 다시 훑어서
+    수정시각(조회할 때 갱신) 순으로 삭제, 제한을 넘으면 max_disk_bytes * evict_ratio까지 한 번에 줄임
+    (저장할 때마다 폴더 전체를 다시 훑지 않도록)
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_memory_items=512, max_disk_bytes=256 * 1024 * 1024,
+                 rescan_every=256, evict_ratio=0.9):
+        """
+        rescan_every: 이 프로세스에서 이만큼 저장할 때마다 폴더를 다시 훑어 용량 확인
+            (다른 프로세스가 쓴 파일까지 포함, 이 프로세스의 추정치가 제한을 넘으면 바로 확인)
+        evict_ratio: 제한을 넘었을 때 이 비율까지 삭제
+        """
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.evict_ratio = evict_ratio
+        self.rescan_every = max(1, rescan_every)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()  # {key: 파일 크기}, 마지막으로 폴더를 훑은 뒤의 추정치 (오래 사용하지 않은 순서)
+        self._disk_bytes = 0
+        self._puts_since_scan = 0
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._evict()
+
+    def _scan_disk(self):
+        """폴더의 현재 항목 [(수정시각, key, 크기)] (오래된 순)"""
+        entries = []
+        for sub in self.cache_dir.iterdir():
+            if not sub.is_dir():
+                continue
+            with os.scandir(sub) as it:
+                for entry in it:
+                    if entry.name.endswith('.json'):
+                        try:
+                            st = entry.stat()
+                        except FileNotFoundError:  # 다른 프로세스가 방금 삭제
+                            continue
+                        entries.append((st.st_mtime_ns, entry.name[:-5], st.st_size))
+        return sorted(entries)
+
+    def _evict(self):
+        """
+        폴더 전체(다른 프로세스가 쓴 항목 포함) 크기가 max_disk_bytes를 넘으면
+        max_disk_bytes * evict_ratio 이하가 될 때까지 오래된 항목 삭제
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return  # 다른 스레드가 이미 정리 중
+        try:
+            entries = self._scan_disk()
+            total = sum(size for _, _, size in entries)
+            keep_from = 0
+            target = self.max_disk_bytes * self.evict_ratio if total > self.max_disk_bytes else total
+            while total > target and len(entries) - keep_from > 1:
+                _, old_key, size = entries[keep_from]
+                try:
+                    self._path(old_key).unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                keep_from += 1
+            with self._lock:
+                self._disk = OrderedDict((key, size) for _, key, size in entries[keep_from:])
+                self._disk_bytes = total
+                self._puts_since_scan = 0
+        finally:
+            self._evict_lock.release()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    @staticmethod
+    def make_key(image, model_id, params=None):
+        params_json = json.dumps(params or {}, sort_keys=True, default=str)
+        h = hashlib.sha256()
+        h.update(image_digest(image).encode())
+        h.update(str(model_id).encode())
+        h.update(params_json.encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return self._memory[key]
+
+        if self.cache_dir is not None:
+            # 다른 프로세스가 저장한 항목일 수도 있으므로 목록 대신 파일을 바로 열어봄
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                value = json.loads(data)
+                os.utime(path)  # 디스크 LRU 순서 갱신 (모든 프로세스가 수정시각 기준으로 삭제)
+            except (OSError, ValueError):
+                value = None
+            with self._lock:
+                if value is not None:
+                    self._disk_bytes += len(data) - self._disk.pop(key, 0)
+                    self._disk[key] = len(data)
+                    self._remember(key, value)
+                    self.hits_disk += 1
+                    return value
+                self._disk_bytes -= self._disk.pop(key, 0)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        if self.cache_dir is None:
+            return
+
+        path = self._path(key)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        tmp_path = None
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # 임시 파일 이름은 프로세스/스레드마다 달라야 함 (fork한 워커는 스레드 id가 같을 수 있음)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{key}.", suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 디스크에 못 쓰면 메모리 캐시만 사용 (요청은 실패시키지 않음)
+            print(f"Warning: could not write detection cache entry {path}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._puts_since_scan += 1
+            # 다른 프로세스가 쓴 양은 추정치에 없으므로 일정 횟수마다 폴더를 다시 훑음
+            need_evict = self._disk_bytes > self.max_disk_bytes or self._puts_since_scan >= self.rescan_every
+        if need_evict:
+            self._evict()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_or_compute(self, image, model_id, params, compute):
+        """
+        캐시에 있으면 바로 반환하고, 없으면 compute()로 계산해서 저장
+        (compute 결과는 JSON으로 저장 가능한 값이어야 함)
+        """
+        key = self.make_key(image, model_id, params)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'hit_rate': (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+                'memory_items': len(self._memory),
+                'disk_items': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """프로세스 안에서 공유하는 기본 캐시 (DETECTION_CACHE_DIR 환경변수로 위치 변경)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DetectionCache(os.environ.get("DETECTION_CACHE_DIR", DEFAULT_CACHE_DIR))
+        return _default_cache
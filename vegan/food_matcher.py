@@ -0,0 +1,257 @@
+"""
+탐지 클래스 이름 <-> FDDB 식품명 유사 매칭
+
+한글을 자모로 분해한 뒤 3-gram 역색인을 만들어 두고, 클래스 이름과 n-gram이
+많이 겹치는 식품명을 Dice 계수로 찾음 (표 전체를 문자열 비교하지 않음)
+역색인은 디스크에 저장해 재사용하고, 한 번 정한 클래스 -> 식품명 대응(별칭)도
+JSON으로 저장해서 다음 실행부터는 그대로 사용
+(직접 고친 별칭은 유지됨: source가 'fuzzy'가 아닌 항목, 또는 "클래스": "식품명" 형식)
+"""
+import re
+import json
+import pickle
+import hashlib
+import argparse
+import unicodedata
+from pathlib import Path
+import numpy as np
+
+MATCHER_VERSION = 1
+NGRAM = 3
+
+_CHO = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+_JUNG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+_JONG = ['', *'ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ']
+_STRIP = re.compile(r'[\W_]+')
+
+
+def decompose(text):
+    """'김치' -> 'ㄱㅣㅁㅊㅣ' (공백/기호 제거, 영문은 소문자)"""
+    text = _STRIP.sub('', unicodedata.normalize('NFKC', str(text)).lower())
+    out = []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            out.append(_CHO[code // 588])
+            out.append(_JUNG[(code % 588) // 28])
+            out.append(_JONG[code % 28])
+        else:
+            out.append(ch)
+    return ''.join(out)
+
+
+def ngrams(text, n=NGRAM):
+    """자모 문자열의 n-gram 집합 (앞뒤에 경계 문자를 붙여 짧은 이름도 비교 가능)"""
+    jamo = f"^{decompose(text)}$"
+    if len(jamo) <= n:
+        return {jamo}
+    return {jamo[i:i + n] for i in range(len(jamo) - n + 1)}
+
+
+def names_signature(names):
+    h = hashlib.sha1()
+    for name in names:
+        h.update(str(name).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class FoodMatcher:
+    """
+    식품명 n-gram 역색인 (CSR 형태: n-gram id -> 식품 번호 목록)
+    """
+
+    def __init__(self, names):
+        self.names = [str(name) for name in names]
+        self.signature = names_signature(self.names)
+        self._exact = {name: i for i, name in enumerate(self.names)}
+
+        vocab = {}
+        postings = []
+        doc_lens = np.zeros(len(self.names), dtype=np.float32)
+        for i, name in enumerate(self.names):
+            grams = ngrams(name)
+            doc_lens[i] = len(grams)
+            for gram in grams:
+                gid = vocab.setdefault(gram, len(vocab))
+                if gid == len(postings):
+                    postings.append([])
+                postings[gid].append(i)
+
+        self.vocab = vocab
+        self.indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in postings], out=self.indptr[1:])
+        self.indices = np.fromiter((i for p in postings for i in p), dtype=np.int32, count=int(self.indptr[-1]))
+        self.doc_lens = doc_lens
+
+    def search(self, query, k=5):
+        """
+        Args:
+            query (str): 클래스 이름
+            k (int): 후보 수
+
+        Returns:
+            list: [(식품명, 점수)] 점수 내림차순 (1.0이면 n-gram이 모두 같음)
+        """
+        if query in self._exact:
+            return [(query, 1.0)]
+        grams = ngrams(query)
+        gids = [self.vocab[g] for g in grams if g in self.vocab]
+        if not gids or not self.names:
+            return []
+        hits = np.concatenate([self.indices[self.indptr[g]:self.indptr[g + 1]] for g in gids])
+        shared = np.bincount(hits, minlength=len(self.names))
+        scores = 2.0 * shared / (len(grams) + self.doc_lens)  # Dice 계수
+        k = min(k, len(self.names))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.names[i], float(scores[i])) for i in top if shared[i] > 0]
+
+    def save(self, path):
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            # 클래스 객체 대신 배열만 저장 (스크립트로 실행할 때와 import할 때 모듈 이름이 달라도 읽을 수 있게)
+            pickle.dump({'version': MATCHER_VERSION, 'state': self.__dict__}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load_or_build(cls, names, path=None):
+        """
+        저장된 역색인이 같은 식품명 목록으로 만든 것이면 불러오고, 아니면 새로 만들어 저장
+        """
+        names = [str(name) for name in names]
+        if path is not None and Path(path).exists():
+            try:
+                with open(path, 'rb') as f:
+                    data = pickle.load(f)
+                if data.get('version') == MATCHER_VERSION and data['state']['signature'] == names_signature(names):
+                    matcher = cls.__new__(cls)
+                    matcher.__dict__.update(data['state'])
+                    return matcher
+            except Exception as e:
+                print(f"Warning: food matcher cache unreadable, rebuilding: {e}")
+        matcher = cls(names)
+        if path is not None:
+            try:
+                matcher.save(path)
+            except OSError as e:
+                print(f"Warning: could not write food matcher cache {path}: {e}")
+        return matcher
+
+
+def matcher_paths(source_path):
+    """영양 데이터 파일 옆의 역색인/별칭 파일 경로 (예: FDDB.matcher.pkl, FDDB.aliases.json)"""
+    source_path = Path(source_path)
+    return (source_path.with_name(f"{source_path.stem}.matcher.pkl"),
+            source_path.with_name(f"{source_path.stem}.aliases.json"))
+
+
+def resolve_aliases(food_names, class_names, source_path=None, min_score=0.6):
+    """
+    클래스 이름마다 사용할 식품명을 정함
+    - 별칭 파일에 직접 고친 항목이 있으면 그대로 사용 (식품명과 정확히 같은 이름이 있어도 우선)
+    - 식품명과 정확히 같으면 그대로 (유사 매칭으로 기록했던 별칭은 파일에서 지움: 표에 이름이 새로 추가된 경우)
+    - 유사 매칭으로 기록한 별칭이 있으면 그대로 사용
+      (식품명이 표에서 사라졌거나, 매칭 실패로 기록된 뒤 표가 바뀐 경우만 다시 찾음)
+    - 아니면 역색인 1순위 후보가 min_score 이상일 때만 사용하고 별칭 파일에 기록
+
+    Args:
+        food_names (iterable): 영양 데이터의 식품명 (nutrition_df.index)
+        class_names (iterable): 탐지 클래스 이름
+        source_path (str): 영양 데이터 파일 경로 (역색인/별칭 파일 위치, None이면 저장하지 않음)
+        min_score (float): 유사 매칭으로 인정할 최소 Dice 점수
+
+    Returns:
+        dict: {클래스 이름: 식품명} (매칭되지 않은 클래스는 빠짐)
+    """
+    food_names = [str(name) for name in food_names]
+    food_set = set(food_names)
+    table_signature = names_signature(food_names)[:12]
+    matcher_path, alias_path = matcher_paths(source_path) if source_path else (None, None)
+
+    aliases = {}
+    if alias_path is not None and alias_path.exists():
+        try:
+            with open(alias_path, 'r', encoding='utf-8') as f:
+                aliases = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read alias map {alias_path}: {e}")
+
+    resolved = {}
+    matcher = None
+    changed = False
+    for class_name in class_names:
+        if class_name is None:
+            continue
+        class_name = str(class_name)
+        entry = aliases.get(class_name)
+        if isinstance(entry, str):
+            entry = {'food': entry, 'source': 'manual'}
+        manual = entry is not None and entry.get('source') != 'fuzzy'
+        if manual:
+            if entry.get('food') in food_set:
+                resolved[class_name] = entry['food']
+                continue
+            print(f"Warning: alias for class '{class_name}' points to unknown food {entry.get('food')!r}")
+        if class_name in food_set:
+            resolved[class_name] = class_name
+            if entry is not None and not manual:
+                del aliases[class_name]
+                changed = True
+            continue
+        if entry is not None and not manual:
+            if entry.get('food') in food_set:
+                resolved[class_name] = entry['food']
+                continue
+            if entry.get('food') is None and entry.get('table') == table_signature:
+                continue
+
+        if matcher is None:
+            matcher = FoodMatcher.load_or_build(food_names, matcher_path)
+        candidates = matcher.search(class_name, k=3)
+        if candidates and candidates[0][1] >= min_score:
+            food, score = candidates[0]
+            resolved[class_name] = food
+            print(f"Matched class '{class_name}' -> '{food}' (score {score:.2f})")
+        else:
+            food, score = None, candidates[0][1] if candidates else 0.0
+            print(f"No nutrition match for class '{class_name}' "
+                  f"(candidates: {', '.join(f'{n} {s:.2f}' for n, s in candidates) or 'none'})")
+        if manual:
+            continue  # 직접 고친 항목은 덮어쓰지 않음
+        aliases[class_name] = {'food': food, 'score': round(score, 4), 'source': 'fuzzy'}
+        if food is None:
+            aliases[class_name]['table'] = table_signature
+        changed = True
+
+    if changed and alias_path is not None:
+        try:
+            with open(alias_path, 'w', encoding='utf-8') as f:
+                json.dump(aliases, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"Warning: could not write alias map {alias_path}: {e}")
+    return resolved
+
+
+def main():
+    import time
+    from nutrition_table import load_nutrition_table
+
+    parser = argparse.ArgumentParser(description="클래스 이름으로 FDDB 식품명 후보 검색")
+    parser.add_argument("queries", nargs="+")
+    parser.add_argument("--nutrition", default="FDDB.xlsx")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    names = load_nutrition_table(args.nutrition).index
+    matcher = FoodMatcher.load_or_build(names, matcher_paths(args.nutrition)[0])
+    for query in args.queries:
+        start = time.perf_counter()
+        candidates = matcher.search(query, args.k)
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f"{query} ({elapsed:.0f} us): " + ", ".join(f"{n} {s:.2f}" for n, s in candidates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+업로드된 이미지 버퍼를 추론용 BGR 배열로 바로 디코딩
+
+- 버퍼는 np.frombuffer로 감싸기만 하고 복사하지 않음
+- 헤더만 읽어서 원본이 imgsz보다 충분히 크면 JPEG을 1/2, 1/4, 1/8 크기로 바로 디코딩
+  (IMREAD_REDUCED_*: DCT 단계에서 축소되므로 전체 해상도로 풀었다가 줄이는 것보다 빠르고 메모리도 적음)
+- EXIF 방향 정보 적용
+- .npy(uint8 BGR HxWx3) 페이로드는 디코딩 없이 버퍼 위의 배열로 사용
+"""
+import io
+import os
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+import cv2
+from PIL import Image
+
+NPY_MAGIC = b'\x93NUMPY'
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def _load_npy(buffer):
+    header = io.BytesIO(buffer)
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    if dtype != np.uint8 or len(shape) not in (2, 3) or (len(shape) == 3 and shape[2] not in (1, 3)):
+        raise ValueError(f"npy payload must be uint8 HxW or HxWx3 (BGR), got {dtype} {shape}")
+    array = np.frombuffer(buffer, dtype=np.uint8, count=int(np.prod(shape)), offset=header.tell())
+    array = array.reshape(shape, order='F' if fortran_order else 'C')
+    if array.ndim == 2 or array.shape[2] == 1:
+        array = cv2.cvtColor(array.reshape(shape[:2]), cv2.COLOR_GRAY2BGR)
+    return array
+
+
+def _apply_orientation(image, orientation):
+    # EXIF Orientation 태그 (PIL ImageOps.exif_transpose와 같은 변환)
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(image), -1)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def reduction_factor(width, height, imgsz):
+    """긴 변이 imgsz 아래로 내려가지 않는 가장 큰 JPEG 축소 배율 (1, 2, 4, 8)"""
+    if not imgsz:
+        return 1
+    factor = 1
+    while factor < 8 and max(width, height) / (factor * 2) >= imgsz:
+        factor *= 2
+    return factor
+
+
+def decode_image(buffer, imgsz=640):
+    """
+    업로드 버퍼 -> 추론용 BGR 배열
+
+    Args:
+        buffer (bytes | bytearray | memoryview): 이미지 파일 내용 또는 .npy 페이로드
+        imgsz (int): 모델 입력 크기 (None이면 축소 디코딩 안 함)
+
+    Returns:
+        tuple: (HxWx3 uint8 BGR 배열, (sx, sy))
+               (sx, sy)는 디코딩된 좌표 -> 원본(방향 보정 후) 좌표 배율 (bbox에 곱하면 원본 기준)
+    """
+    if bytes(buffer[:len(NPY_MAGIC)]) == NPY_MAGIC:
+        return _load_npy(buffer), (1.0, 1.0)
+
+    # 헤더만 읽음 (픽셀 디코딩 없음)
+    with Image.open(io.BytesIO(buffer)) as header:
+        width, height = header.size
+        is_jpeg = header.format == 'JPEG'
+        orientation = header.getexif().get(0x0112, 1)
+
+    factor = reduction_factor(width, height, imgsz) if is_jpeg else 1
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    image = cv2.imdecode(data, _REDUCED_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        raise ValueError("could not decode image")
+    image = _apply_orientation(image, orientation)
+
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+    return image, (width / image.shape[1], height / image.shape[0])
+
+
+def scale_bbox(bbox, scale):
+    sx, sy = scale
+    if sx == 1.0 and sy == 1.0:
+        return bbox
+    return [bbox[0] * sx, bbox[1] * sy, bbox[2] * sx, bbox[3] * sy]
+
+
+def _letterbox(image, imgsz):
+    # 모델 입력 크기로 줄이는 비용까지 포함해서 비교하기 위함
+    h, w = image.shape[:2]
+    scale = imgsz / max(h, w)
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_LINEAR)
+
+
+def legacy_decode(buffer, imgsz=640):
+    """기존 경로: PIL로 전체 해상도 디코딩 -> np.array -> RGB->BGR 복사 -> 축소"""
+    image = Image.open(io.BytesIO(buffer))
+    array = np.array(image.convert('RGB'))
+    bgr = np.ascontiguousarray(array[:, :, ::-1])
+    return _letterbox(bgr, imgsz)
+
+
+def _peak_rss_mb(fn, buffer, imgsz):
+    """
+    fork한 자식 프로세스에서 한 번 실행했을 때 최대 RSS 증가량 (MB)
+    cv2/numpy가 C에서 할당한 버퍼까지 포함 (tracemalloc은 파이썬 할당만 보므로 사용하지 않음)
+    자식의 최대 RSS는 fork 시점의 RSS에서 시작하므로 이 프로세스의 이전 측정과 섞이지 않음
+    """
+    if not hasattr(os, 'fork'):
+        return float('nan')
+    import resource
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.close(read_fd)
+            before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            fn(buffer, imgsz)
+            after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            os.write(write_fd, str(after - before).encode())  # Linux는 kB 단위
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as f:
+        output = f.read()
+    os.waitpid(pid, 0)
+    return int(output) / 1024 if output else float('nan')
+
+
+def _measure(fn, buffer, imgsz, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(buffer, imgsz)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000, _peak_rss_mb(fn, buffer, imgsz)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="업로드 이미지 디코딩 경로별 시간/메모리 비교")
+    parser.add_argument("images", nargs="+", help="JPEG/PNG 파일 (스마트폰 원본 사진 권장)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    new_path = lambda buffer, imgsz: _letterbox(decode_image(buffer, imgsz)[0], imgsz)
+    print(f"{'image':<28} {'size':>11} {'legacy ms':>10} {'legacy MB':>10} {'new ms':>8} {'new MB':>8}")
+    for path in args.images:
+        buffer = Path(path).read_bytes()
+        with Image.open(io.BytesIO(buffer)) as header:
+            size = f"{header.size[0]}x{header.size[1]}"
+        legacy_ms, legacy_mb = _measure(legacy_decode, buffer, args.imgsz, args.repeat)
+        new_ms, new_mb = _measure(new_path, buffer, args.imgsz, args.repeat)
+        print(f"{Path(path).name[:28]:<28} {size:>11} {legacy_ms:>10.1f} {legacy_mb:>10.1f} {new_ms:>8.1f} {new_mb:>8.1f}")
+    print("MB = peak RSS growth while decoding one upload in a forked process (native cv2/numpy buffers included)")
+
+
+if __name__ == "__main__":
+    main()
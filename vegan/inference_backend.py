@@ -0,0 +1,277 @@
+import os
+import json
+import time
+from pathlib import Path
+import numpy as np
+
+# 'torch'는 .pt를 그대로 사용, 나머지는 한 번 내보낸 뒤 CPU 런타임으로 추론
+BACKENDS = ('torch', 'onnx', 'openvino')
+# 내보낸 모델은 입력 shape이 고정 (batch 1, imgsz x imgsz): CPU 런타임에서 정적 shape이 더 빠름
+EXPORT_BATCH = 1
+
+
+def boxes_to_detections(boxes):
+    """
+    ultralytics Boxes를 탐지 결과 dict 리스트로 변환
+    박스마다 .tolist()/.item()을 부르지 않고 (N, 6) 텐서를 한 번에 CPU로 옮김
+    """
+    if len(boxes) == 0:
+        return []
+    data = boxes.data.cpu().numpy()  # [x1, y1, x2, y2, (track id), conf, cls]
+    return [
+        {'bbox': xyxy, 'class': c, 'confidence': conf}
+        for xyxy, conf, c in zip(data[:, :4].tolist(), data[:, -2].tolist(), data[:, -1].tolist())
+    ]
+
+
+def exported_path(model_path, backend):
+    # ultralytics export가 만드는 파일/폴더 이름
+    model_path = Path(model_path)
+    if backend == 'onnx':
+        return model_path.with_suffix('.onnx')
+    if backend == 'openvino':
+        return model_path.parent / f"{model_path.stem}_openvino_model"
+    raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
+
+
+def export_model(model_path, backend, imgsz=640):
+    """
+    학습된 .pt를 ONNX/OpenVINO로 한 번만 내보내고 결과를 캐시
+    .pt의 크기/수정시각과 imgsz가 같으면 기존 파일을 재사용
+
+    Returns:
+        str: 내보낸 모델 경로
+    """
+    model_path = Path(model_path)
+    target = exported_path(model_path, backend)
+    meta_path = target.parent / (target.name + '.export.json')
+    st = model_path.stat()
+    meta = {'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns, 'imgsz': imgsz}
+
+    if target.exists() and meta_path.exists():
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == meta:
+                return str(target)
+
+    from ultralytics import YOLO
+
+    print(f"Exporting {model_path} to {backend} (imgsz={imgsz})...")
+    start = time.perf_counter()
+    exported = YOLO(str(model_path)).export(format=backend, imgsz=imgsz, batch=EXPORT_BATCH, dynamic=False)
+    print(f"Export finished in {time.perf_counter() - start:.1f}s: {exported}")
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return str(exported)
+
+
+def configure_threads(num_threads):
+    # PyTorch CPU 연산 스레드 수 (torch 백엔드 및 전/후처리)
+    import torch
+    torch.set_num_threads(num_threads)
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+
+
+def _tune_runtime(model, backend, artifact, num_threads):
+    """
+    ultralytics는 런타임 세션을 기본 옵션으로 만들기 때문에
+    워밍업으로 세션이 생성된 뒤 intra-op 스레드 수를 지정한 세션으로 교체
+    """
+    autobackend = getattr(getattr(model, 'predictor', None), 'model', None)
+    if backend == 'onnx' and hasattr(autobackend, 'session'):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        autobackend.session = ort.InferenceSession(artifact, sess_options=options,
+                                                   providers=['CPUExecutionProvider'])
+    elif backend == 'openvino' and hasattr(autobackend, 'ov_compiled_model'):
+        import openvino as ov
+        core = ov.Core()
+        xml_path = next(Path(artifact).glob('*.xml'))
+        autobackend.ov_compiled_model = core.compile_model(
+            core.read_model(xml_path), 'CPU',
+            {'INFERENCE_NUM_THREADS': num_threads, 'PERFORMANCE_HINT': 'LATENCY'})
+    else:
+        print(f"Warning: could not set {backend} thread count on this ultralytics version")
+
+
+def set_num_threads(model, model_path, backend, num_threads):
+    """
+    이미 로드된 모델의 CPU 추론 스레드 수 변경 (Nuri/serve.py에서 fork한 워커마다 나눠 줄 때 사용)
+    onnx/openvino는 런타임 세션을 새로 만들기 때문에 그 프로세스에 가중치가 다시 올라감
+    """
+    configure_threads(num_threads)
+    if backend != 'torch':
+        _tune_runtime(model, backend, exported_path(model_path, backend), num_threads)
+
+
+def load_model(model_path, backend='torch', num_threads=None, imgsz=640):
+    """
+    백엔드에 맞는 YOLO 모델 로드
+
+    Args:
+        model_path (str): .pt 가중치 경로
+        backend (str): 'torch', 'onnx', 'openvino' 중 하나
+        num_threads (int): CPU 추론 스레드 수 (None이면 런타임 기본값)
+        imgsz (int): 내보내기/추론 입력 크기
+
+    Returns:
+        YOLO: detect_foods 등에서 그대로 쓸 수 있는 모델
+              model.max_batch: predict 한 번에 넣을 수 있는 이미지 수 (None이면 제한 없음)
+              model.infer_imgsz: 추론 입력 크기 (predict_images가 매번 전달)
+    """
+    # ultralytics는 모델을 로드할 때만 import (서비스 모듈은 ultralytics 없이도 import 가능)
+    from ultralytics import YOLO
+
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
+    if num_threads:
+        configure_threads(num_threads)
+    if backend == 'torch':
+        model = YOLO(model_path)
+        model.max_batch = None
+        model.infer_imgsz = imgsz
+        return model
+
+    artifact = export_model(model_path, backend, imgsz)
+    model = YOLO(artifact, task='detect')
+    model.max_batch = EXPORT_BATCH
+    model.infer_imgsz = imgsz
+    # 워밍업 (런타임 세션 생성)
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    if num_threads:
+        _tune_runtime(model, backend, artifact, num_threads)
+    return model
+
+
+def batch_capacity(model, batch_size=None):
+    """
+    model.predict 한 번에 넣을 이미지 수
+    batch_size(원하는 크기)를 백엔드가 받을 수 있는 크기로 제한 (내보낸 정적 모델은 1)
+    """
+    capacity = getattr(model, 'max_batch', None)
+    if capacity and (batch_size is None or batch_size > capacity):
+        return capacity
+    return batch_size
+
+
+def predict_images(model, images, batch_size=None, **predict_kwargs):
+    """
+    이미지 리스트를 백엔드가 받을 수 있는 크기로 나눠 추론하고 결과를 같은 순서로 반환
+    (load_model의 imgsz를 모든 predict 호출에 전달)
+
+    Args:
+        model (YOLO): load_model 결과
+        images (list): 이미지 경로 또는 BGR 배열 리스트
+        batch_size (int): 한 번에 넣을 최대 이미지 수 (None이면 전부, 백엔드 한도로 다시 제한)
+        **predict_kwargs: model.predict 인자 (conf 등)
+
+    Returns:
+        list: ultralytics Results 리스트
+    """
+    imgsz = getattr(model, 'infer_imgsz', None)
+    if imgsz:
+        predict_kwargs.setdefault('imgsz', imgsz)
+    size = batch_capacity(model, batch_size or len(images)) or 1
+    results = []
+    for start in range(0, len(images), size):
+        chunk = images[start:start + size]
+        results.extend(model.predict(chunk, batch=len(chunk), **predict_kwargs))
+    return results
+
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare_detections(reference, candidate, iou_threshold=0.5):
+    """
+    같은 클래스끼리 IoU가 가장 큰 박스를 짝지어 두 탐지 결과를 비교
+
+    Returns:
+        dict: 짝지어진 수, 빠진/추가된 수, 평균 IoU, 최대 신뢰도 차이
+    """
+    unmatched = list(candidate)
+    ious, conf_diffs = [], []
+    missing = 0
+    for ref in reference:
+        best, best_iou = None, iou_threshold
+        for cand in unmatched:
+            if int(cand['class']) != int(ref['class']):
+                continue
+            iou = _iou(ref['bbox'], cand['bbox'])
+            if iou >= best_iou:
+                best, best_iou = cand, iou
+        if best is None:
+            missing += 1
+            continue
+        unmatched.remove(best)
+        ious.append(best_iou)
+        conf_diffs.append(abs(best['confidence'] - ref['confidence']))
+    return {
+        'matched': len(ious),
+        'missing': missing,
+        'extra': len(unmatched),
+        'mean_iou': float(np.mean(ious)) if ious else 0.0,
+        'max_conf_diff': max(conf_diffs) if conf_diffs else 0.0,
+    }
+
+
+def check_parity(model_path, images, backend, imgsz=640, iou_threshold=0.5, conf=0.25):
+    """
+    PyTorch 모델과 내보낸 모델의 탐지 결과를 이미지별로 비교
+
+    Returns:
+        dict: 전체 합계와 두 백엔드의 이미지당 평균 추론 시간
+    """
+    torch_model = load_model(model_path, 'torch')
+    backend_model = load_model(model_path, backend, imgsz=imgsz)
+
+    totals = {'images': 0, 'matched': 0, 'missing': 0, 'extra': 0, 'mean_iou': 0.0, 'max_conf_diff': 0.0}
+    times = {'torch': 0.0, backend: 0.0}
+    for image in images:
+        detections = {}
+        for name, model in (('torch', torch_model), (backend, backend_model)):
+            start = time.perf_counter()
+            results = model.predict(image, imgsz=imgsz, conf=conf, verbose=False)
+            times[name] += time.perf_counter() - start
+            detections[name] = [d for r in results for d in boxes_to_detections(r.boxes)]
+
+        diff = compare_detections(detections['torch'], detections[backend], iou_threshold)
+        totals['images'] += 1
+        totals['mean_iou'] += diff['mean_iou'] * diff['matched']
+        for key in ('matched', 'missing', 'extra'):
+            totals[key] += diff[key]
+        totals['max_conf_diff'] = max(totals['max_conf_diff'], diff['max_conf_diff'])
+
+    if totals['matched']:
+        totals['mean_iou'] /= totals['matched']
+    n = max(totals['images'], 1)
+    totals['torch_ms'] = times['torch'] / n * 1000
+    totals[f'{backend}_ms'] = times[backend] / n * 1000
+    return totals
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="PyTorch와 ONNX/OpenVINO 추론 결과 비교")
+    parser.add_argument("model", help="학습된 .pt 경로 (예: runs/detect/train/weights/best.pt)")
+    parser.add_argument("images", help="비교할 이미지 디렉토리 (예: yolo_dataset/val/images)")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS[1:])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    images = sorted(str(p) for p in Path(args.images).iterdir() if p.is_file())[:args.limit]
+    result = check_parity(args.model, images, args.backend, imgsz=args.imgsz)
+    for key, value in result.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+비동기 서버(FastAPI)에서 무거운 추론을 이벤트 루프 밖에서 실행하기 위한 실행기
+
+- BoundedExecutor: 동시에 실행되는 추론 수(max_workers)와 대기열 길이(max_queue)를 제한
+- MicroBatcher: 동시에 들어온 요청을 잠깐(max_wait_ms) 모아 한 번의 배치 추론으로 실행
+둘 다 가득 차면 기다리게 하지 않고 바로 QueueFullError를 발생시켜
+호출 측에서 503 + Retry-After로 응답할 수 있게 함
+"""
+import os
+import time
+import queue
+import asyncio
+import weakref
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _reset_after_fork(instance):
+    # fork된 자식 프로세스(Nuri/serve.py 워커)에는 스레드가 복사되지 않고 락 상태만 복사되므로
+    # 자식에서 스레드/락/대기열을 새로 만듦 (약한 참조라 객체 수명에는 영향 없음)
+    if not hasattr(os, "register_at_fork"):
+        return
+    ref = weakref.ref(instance)
+
+    def after_in_child():
+        obj = ref()
+        if obj is not None:
+            obj._after_fork()
+
+    os.register_at_fork(after_in_child=after_in_child)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers=1, max_queue=8, thread_name_prefix="inference", on_wait=None):
+        """
+        Args:
+            max_workers (int): 동시에 실행할 작업 수 (ultralytics 모델 하나를 공유하면 1 권장)
+            max_queue (int): 실행을 기다릴 수 있는 작업 수
+            on_wait (callable): 작업이 실행되기 직전에 대기열에서 기다린 시간(초)으로 호출 (메트릭용)
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.on_wait = on_wait
+        self._thread_name_prefix = thread_name_prefix
+        self._after_fork()
+        _reset_after_fork(self)
+
+    def _after_fork(self):
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self._thread_name_prefix)
+        self._lock = threading.Lock()
+        self._waiters = []  # run(wait=...)에서 자리가 나기를 기다리는 (이벤트 루프, asyncio.Future)
+        self.pending = 0  # 실행 중 + 대기 중
+        self.running = 0
+        self.rejected = 0
+
+    @property
+    def queued(self):
+        with self._lock:
+            return max(0, self.pending - self.running)
+
+    def _reserve(self):
+        # self._lock을 잡은 상태에서 호출
+        if self.pending >= self.max_workers + self.max_queue:
+            return False
+        self.pending += 1
+        return True
+
+    def _wrap(self, submitted, fn, args, kwargs):
+        if self.on_wait is not None:
+            self.on_wait(time.perf_counter() - submitted)
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _done(self, _future):
+        # 클라이언트 연결이 끊겨 await가 취소되어도 스레드 작업이 끝날 때까지는 자리를 차지함
+        with self._lock:
+            self.pending -= 1
+            waiters, self._waiters = self._waiters, []
+        # 기다리던 코루틴을 모두 깨움 (먼저 자리를 잡은 쪽이 실행, 나머지는 다시 대기)
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:  # 이벤트 루프가 이미 닫힘
+                pass
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Returns:
+            concurrent.futures.Future
+
+        Raises:
+            QueueFullError: 실행 중 + 대기 중 작업이 max_workers + max_queue개에 도달한 경우
+        """
+        with self._lock:
+            if not self._reserve():
+                self.rejected += 1
+                raise QueueFullError(f"{self.pending} requests pending")
+        return self._start(fn, args, kwargs)
+
+    def _start(self, fn, args, kwargs):
+        # _reserve()로 자리를 잡은 뒤 호출
+        try:
+            future = self._executor.submit(self._wrap, time.perf_counter(), fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    async def run(self, fn, *args, wait=0.0, **kwargs):
+        """
+        이벤트 루프를 막지 않고 fn(*args, **kwargs) 결과를 기다림
+
+        Args:
+            wait (float): 가득 찼을 때 자리가 날 때까지 기다릴 최대 시간(초), 0이면 바로 QueueFullError
+                (기다리는 동안 취소되면 자리를 차지하지 않고 바로 빠짐)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            with self._lock:
+                if self._reserve():
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise QueueFullError(f"{self.pending} requests pending")
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await asyncio.wait({waiter}, timeout=remaining)
+            finally:
+                with self._lock:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+        return await asyncio.wrap_future(self._start(fn, args, kwargs))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': self.running,
+                'queued': max(0, self.pending - self.running),
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class MicroBatcher:
+    """
+    요청을 모아 batch_fn(items) 한 번으로 처리하는 스케줄러 (전용 스레드 1개)
+    첫 요청이 도착한 뒤 max_wait_ms 동안 또는 max_batch_size개가 모일 때까지 기다렸다가 실행
+    - max_wait_ms를 늘리면 배치가 커져 처리량이 늘고, 줄이면 p99 지연이 줄어듦
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5.0, max_queue=64, name="micro-batcher",
+                 on_wait=None):
+        """
+        Args:
+            batch_fn (callable): items 리스트 -> 같은 순서의 결과 리스트
+                (결과 자리에 예외 객체를 넣으면 그 요청만 실패 처리)
+            max_batch_size (int): 한 번에 처리할 최대 요청 수
+            max_wait_ms (float): 첫 요청 이후 배치를 채우기 위해 기다리는 최대 시간
+            max_queue (int): 처리 중인 배치 외에 대기할 수 있는 요청 수
+            on_wait (callable): 요청마다 배치 실행 직전에 기다린 시간(초)으로 호출 (메트릭용)
+        """
+        self.batch_fn = batch_fn
+        self.on_wait = on_wait
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue = max(0, max_queue)
+        self._name = name
+        self._after_fork()
+        _reset_after_fork(self)
+
+    def _after_fork(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.pending = 0  # 대기 중 + 처리 중
+        self.running = 0
+        self.rejected = 0
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+        self._thread = threading.Thread(target=self._loop, name=self._name, daemon=True)
+        self._thread.start()
+
+    @property
+    def queued(self):
+        with self._lock:
+            return max(0, self.pending - self.running)
+
+    def submit(self, item):
+        """
+        Returns:
+            concurrent.futures.Future: item에 대한 batch_fn 결과
+
+        Raises:
+            QueueFullError: 대기 중인 요청이 max_batch_size + max_queue개에 도달한 경우
+        """
+        with self._lock:
+            if self.pending >= self.max_batch_size + self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"{self.pending} requests pending")
+            self.pending += 1
+        future = Future()
+        future.add_done_callback(self._done)
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    async def run(self, item):
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _done(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # 종료 신호는 현재 배치를 처리한 뒤 반영
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            # 이미 취소된 요청(클라이언트 연결 끊김)은 제외
+            batch = [entry for entry in self._collect(first) if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            if self.on_wait is not None:
+                now = time.perf_counter()
+                for _, _, submitted in batch:
+                    self.on_wait(now - submitted)
+
+            with self._lock:
+                self.running += len(batch)
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_sizes[len(batch)] += 1
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if isinstance(result, BaseException):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self._lock:
+                    self.running -= len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'max_queue': self.max_queue,
+                'running': self.running,
+                'queued': max(0, self.pending - self.running),
+                'rejected': self.rejected,
+                'batches': self.batches,
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'batch_sizes': dict(sorted(self.batch_sizes.items())),
+            }
+
+    def shutdown(self, wait=True):
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
@@ -0,0 +1,246 @@
+"""
+로컬 공용 추론 워커
+
+YOLO 가중치를 프로세스 하나에만 올려두고, Streamlit 세션/uvicorn 워커 등
+여러 프론트엔드 프로세스가 Unix 소켓으로 추론을 요청함
+이미지 픽셀은 직렬화하지 않고 공유 메모리로 전달 (소켓에는 작은 JSON 헤더만 오감)
+
+실행:
+    python inference_worker.py --model best.pt --socket /tmp/vegan_inference.sock
+"""
+import os
+import json
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+from multiprocessing import shared_memory
+import numpy as np
+from inference_backend import BACKENDS, boxes_to_detections, load_model, predict_images
+from detection_cache import model_checksum
+
+DEFAULT_SOCKET = os.environ.get("INFERENCE_WORKER_SOCKET", "/tmp/vegan_inference.sock")
+_HEADER = struct.Struct('>I')
+
+
+def send_message(sock, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view, size)
+        if n == 0:
+            raise ConnectionError("socket closed")
+        view = view[n:]
+        size -= n
+    return buf
+
+
+def recv_message(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+def _attach_shared_memory(name):
+    # 워커는 클라이언트가 만든 공유 메모리를 빌려 쓰기만 하므로
+    # 종료 시 resource_tracker가 지우지 않도록 추적 해제
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        attached = {}  # 이 연결에서 열어둔 공유 메모리 (클라이언트가 버퍼를 재사용하므로 매번 열지 않음)
+        try:
+            while True:
+                try:
+                    request = recv_message(self.request)
+                except ConnectionError:
+                    return
+                try:
+                    response = self._dispatch(request, attached)
+                except Exception as e:
+                    response = {'error': f"{type(e).__name__}: {e}"}
+                send_message(self.request, response)
+        finally:
+            for shm in attached.values():
+                shm.close()
+
+    def _dispatch(self, request, attached):
+        server = self.server
+        op = request.get('op')
+        if op == 'info':
+            return {'names': server.names, 'model_id': server.model_id}
+        if op != 'predict':
+            raise ValueError(f"unknown op {op!r}")
+
+        name = request['shm']
+        if name not in attached:
+            for old in attached.values():
+                old.close()
+            attached.clear()
+            attached[name] = _attach_shared_memory(name)
+        # ultralytics predictor는 입력 배열 참조를 계속 들고 있으므로(predictor.batch, results[*].orig_img)
+        # 공유 메모리 뷰를 그대로 넘기면 클라이언트가 세그먼트를 바꿀 때 close()가 BufferError로 실패
+        # -> 뷰는 복사에만 쓰고 바로 해제 (추론 시간에 비하면 복사 비용은 작음)
+        view = np.ndarray(tuple(request['shape']), dtype=request['dtype'], buffer=attached[name].buf)
+        image = view.copy()
+        del view
+
+        with server.model_lock:  # ultralytics predictor는 스레드 안전하지 않음
+            params = dict(request.get('params', {}), verbose=False)
+            results = predict_images(server.model, [image], **params)
+            detections = [d for r in results for d in boxes_to_detections(r.boxes)]
+        return {'detections': detections}
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, model_path, socket_path=DEFAULT_SOCKET, backend='torch', num_threads=None, imgsz=640):
+        self.model = load_model(model_path, backend, num_threads, imgsz)
+        self.names = {int(k): v for k, v in self.model.names.items()}
+        self.model_id = f"{model_checksum(model_path)}:{backend}"
+        self.model_lock = threading.Lock()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _Handler)
+        self.socket_path = socket_path
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+class InferenceClient:
+    """
+    추론 워커 클라이언트 (프론트엔드 클래스의 얇은 클라이언트 모드에서 사용)
+    연결과 공유 메모리 버퍼를 유지하고, 더 큰 이미지가 오면 버퍼만 다시 만듦
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+        self._shm = None
+        self._lock = threading.Lock()
+        self._info = None
+
+    def _connect(self):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._sock = sock
+        return self._sock
+
+    def _request(self, obj):
+        try:
+            send_message(self._connect(), obj)
+            response = recv_message(self._sock)
+        except (OSError, ConnectionError):
+            self._close_socket()
+            raise
+        if 'error' in response:
+            raise RuntimeError(f"inference worker: {response['error']}")
+        return response
+
+    def _close_socket(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def info(self):
+        with self._lock:
+            if self._info is None:
+                self._info = self._request({'op': 'info'})
+                self._info['names'] = {int(k): v for k, v in self._info['names'].items()}
+            return self._info
+
+    @property
+    def names(self):
+        return self.info()['names']
+
+    @property
+    def model_id(self):
+        return self.info()['model_id']
+
+    def predict(self, image, **params):
+        """
+        Args:
+            image (np.ndarray): HxWx3 uint8 이미지
+            **params: model.predict 인자 (conf 등)
+
+        Returns:
+            list: boxes_to_detections 형식의 탐지 결과
+        """
+        image = np.asarray(image)
+        with self._lock:
+            if self._shm is None or self._shm.size < image.nbytes:
+                self._release_shm()
+                self._shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+            np.ndarray(image.shape, dtype=image.dtype, buffer=self._shm.buf)[...] = image
+            response = self._request({
+                'op': 'predict',
+                'shm': self._shm.name,
+                'shape': list(image.shape),
+                'dtype': str(image.dtype),
+                'params': params,
+            })
+        return response['detections']
+
+    def _release_shm(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        with self._lock:
+            self._close_socket()
+            self._release_shm()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="공용 YOLO 추론 워커")
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--backend", default="torch", choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    server = InferenceServer(args.model, args.socket, args.backend, args.threads, args.imgsz)
+    print(f"Inference worker ready on {args.socket} ({len(server.names)} classes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
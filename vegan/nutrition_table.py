@@ -0,0 +1,233 @@
+"""
+FDDB 영양 데이터 로더
+
+FDDB.xlsx를 매번 openpyxl로 읽으면 수 초가 걸리므로 한 번만 읽어서
+컬럼 이름 변환/중복 제거를 끝낸 표를 바이너리(Feather, pyarrow가 없으면 pickle)로 저장해두고
+이후에는 그 파일을 읽음. 원본 엑셀의 수정시각/크기/sha256이 바뀌면 자동으로 다시 만듦
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# 엑셀 컬럼 -> 코드에서 사용하는 이름
+COLUMN_MAP = {
+    '식품명': 'Food',
+    '에너지(kcal)': 'Calories',
+    '단백질(g)': 'Protein',
+    '탄수화물(g)': 'Carbs',
+    '지방(g)': 'Fat',
+    '칼슘(mg)': 'Calcium',
+    '철분(mg)': 'Iron',
+}
+NUTRIENT_COLUMNS = ['Calories', 'Protein', 'Carbs', 'Fat', 'Calcium', 'Iron']
+TABLE_VERSION = 1
+
+try:
+    import pyarrow  # noqa: F401
+    TABLE_FORMAT = 'feather'
+except ImportError:
+    TABLE_FORMAT = 'pickle'
+
+
+def cache_paths(source_path, cache_dir=None):
+    """변환된 표와 메타 파일 경로 (기본: 원본 옆, 예: FDDB.nutrition.feather)"""
+    source_path = Path(source_path)
+    cache_dir = Path(cache_dir) if cache_dir else source_path.parent
+    stem = f"{source_path.stem}.nutrition"
+    suffix = '.feather' if TABLE_FORMAT == 'feather' else '.pkl'
+    return cache_dir / f"{stem}{suffix}", cache_dir / f"{stem}.json"
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_table(source_path):
+    """
+    엑셀을 읽어 컬럼 이름 변환, 식품명 중복 제거, 영양소 숫자 변환까지 수행
+
+    Returns:
+        pd.DataFrame: 'Food' 인덱스의 영양 데이터
+    """
+    df = pd.read_excel(source_path)
+    df = df.rename(columns=COLUMN_MAP)
+    df = df.groupby('Food').first()
+    for col in NUTRIENT_COLUMNS:
+        if col in df.columns:
+            # 미측정 값('-', 빈칸 등)은 0으로 합산
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0).astype('float64')
+    for col in df.columns:
+        if df[col].dtype == object:
+            # Feather는 한 컬럼에 숫자/문자가 섞이면 저장할 수 없음
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _write_table(df, table_path):
+    tmp_path = table_path.with_name(table_path.name + '.tmp')
+    if TABLE_FORMAT == 'feather':
+        df.reset_index().to_feather(tmp_path)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, table_path)
+
+
+def _read_table(table_path):
+    if TABLE_FORMAT == 'feather':
+        return pd.read_feather(table_path).set_index('Food')
+    return pd.read_pickle(table_path)
+
+
+def _cache_is_valid(meta, source_path, meta_path, table_path, st):
+    if meta.get('version') != TABLE_VERSION or meta.get('format') != TABLE_FORMAT:
+        return False
+    if not table_path.exists():
+        return False
+    if meta.get('size') == st.st_size and meta.get('mtime_ns') == st.st_mtime_ns:
+        return True
+    # 복사/touch로 수정시각만 바뀐 경우는 내용 해시로 확인하고 메타만 갱신
+    if meta.get('size') == st.st_size and meta.get('sha256') == _sha256(source_path):
+        meta['mtime_ns'] = st.st_mtime_ns
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return True
+    return False
+
+
+def load_nutrition_table(source_path, cache_dir=None, rebuild=False):
+    """
+    변환된 영양 데이터 표 로드 (필요하면 엑셀에서 다시 만듦)
+
+    Args:
+        source_path (str): FDDB.xlsx 경로
+        cache_dir (str): 변환된 파일을 둘 폴더 (None이면 엑셀과 같은 폴더)
+        rebuild (bool): 캐시를 무시하고 다시 만들지 여부
+
+    Returns:
+        pd.DataFrame: 'Food' 인덱스, Calories/Protein/Carbs/Fat/Calcium/Iron 등의 컬럼
+    """
+    source_path = Path(source_path)
+    st = source_path.stat()  # 원본이 없으면 FileNotFoundError
+    table_path, meta_path = cache_paths(source_path, cache_dir)
+
+    if not rebuild and meta_path.exists():
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if _cache_is_valid(meta, source_path, meta_path, table_path, st):
+                return _read_table(table_path)
+        except Exception as e:
+            print(f"Warning: nutrition table cache unreadable, rebuilding: {e}")
+
+    df = build_table(source_path)
+    try:
+        table_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_table(df, table_path)
+        meta = {
+            'version': TABLE_VERSION,
+            'format': TABLE_FORMAT,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': _sha256(source_path),
+            'rows': len(df),
+        }
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    except OSError as e:
+        # 읽기 전용 위치 등: 이번 실행에서는 변환 결과만 사용
+        print(f"Warning: could not write nutrition table cache {table_path}: {e}")
+    return df
+
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+def names_by_id(class_names):
+    """model.names(dict)나 클래스 이름 리스트를 클래스 id 순서의 튜플로 변환"""
+    if isinstance(class_names, dict):
+        names = [None] * (max(class_names) + 1) if class_names else []
+        for class_id, name in class_names.items():
+            names[int(class_id)] = name
+        return tuple(names)
+    return tuple(class_names)
+
+
+def class_nutrient_matrix(nutrition_df, class_names, columns=NUTRIENT_COLUMNS, aliases=None):
+    """
+    클래스 id -> 영양소 벡터 표 (같은 표/클래스 목록에 대해서는 한 번만 만듦)
+    영양 데이터에 없는 클래스는 처음 만들 때 한 번만 출력
+
+    Args:
+        nutrition_df (pd.DataFrame): 'Food' 인덱스의 영양 데이터
+        class_names (list | dict): 클래스 id -> 음식 이름
+        columns (list): 벡터에 담을 영양소 컬럼 순서
+        aliases (dict): 클래스 이름 -> 식품명 (food_matcher.resolve_aliases 결과)
+
+    Returns:
+        tuple: ([n_classes + 1, n_nutrients] float64 행렬, 매칭 여부 bool 배열)
+               마지막 행은 0이라서 매칭되지 않은 음식은 -1로 인덱싱하면 됨
+    """
+    names = names_by_id(class_names)
+    aliases = aliases or {}
+    foods = [aliases.get(name, name) for name in names]
+    key = (id(nutrition_df), names, tuple(columns), tuple(foods))
+    with _matrices_lock:
+        cached = _matrices.get(key)
+        if cached is not None and cached[0] is nutrition_df:
+            return cached[1], cached[2]
+
+    table = nutrition_df.reindex(index=foods, columns=list(columns))
+    matched = table.index.isin(nutrition_df.index)
+    matrix = np.zeros((len(names) + 1, len(columns)), dtype=np.float64)
+    matrix[:-1] = table.apply(pd.to_numeric, errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+
+    unmatched = [name for name, ok in zip(names, matched) if not ok]
+    if unmatched:
+        print(f"Warning: {len(unmatched)}/{len(names)} classes have no nutrition data "
+              f"(counted as 0): {', '.join(map(str, unmatched))}")
+    with _matrices_lock:
+        if len(_matrices) >= 16:  # 파일이 바뀌어 다시 로드된 예전 표는 버림
+            _matrices.pop(next(iter(_matrices)))
+        _matrices[key] = (nutrition_df, matrix, matched)  # 표를 함께 보관해서 id가 재사용되지 않게 함
+    return matrix, matched
+
+
+def load_class_nutrients(source_path, nutrition_df, class_names, columns=NUTRIENT_COLUMNS):
+    """
+    클래스 이름을 식품명에 매칭(별칭 파일 재사용)한 뒤 클래스 id -> 영양소 벡터 표 생성
+
+    Returns:
+        tuple: class_nutrient_matrix와 같음
+    """
+    from food_matcher import resolve_aliases
+    aliases = resolve_aliases(nutrition_df.index, names_by_id(class_names), source_path)
+    return class_nutrient_matrix(nutrition_df, class_names, columns, aliases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FDDB.xlsx를 바이너리 표로 변환하고 로드 시간 비교")
+    parser.add_argument("source", nargs="?", default="FDDB.xlsx")
+    parser.add_argument("--cache-dir", default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_nutrition_table(args.source, args.cache_dir, rebuild=True)
+    print(f"Built from Excel: {time.perf_counter() - start:.3f}s ({len(df)} foods, {TABLE_FORMAT})")
+    start = time.perf_counter()
+    load_nutrition_table(args.source, args.cache_dir)
+    print(f"Loaded from cache: {time.perf_counter() - start:.3f}s -> {cache_paths(args.source, args.cache_dir)[0]}")
+
+
+if __name__ == "__main__":
+    main()
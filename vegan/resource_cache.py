@@ -0,0 +1,78 @@
+"""
+Streamlit 재실행/세션 간에 공유되는 리소스 캐시
+
+Streamlit은 위젯을 누를 때마다 스크립트를 처음부터 다시 실행하므로
+YOLO 가중치나 영양 데이터 파일을 매번 다시 읽지 않도록 st.cache_resource에 보관
+파일의 수정시각/크기(필요하면 sha256)가 바뀌면 새로 로드함
+"""
+import os
+import time
+import hashlib
+import threading
+import streamlit as st
+
+_cold_loads = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def file_signature(path, checksum=False):
+    """파일 변경 감지용 서명 (없는 파일이면 None, 예: ultralytics가 받아오는 'yolov8x.pt')"""
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if not checksum:
+        return (info.st_mtime_ns, info.st_size)
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _load(kind, path, signature, _loader):
+    # _loader는 밑줄로 시작하므로 캐시 키에서 제외 (kind로 구분)
+    start = time.perf_counter()
+    value = _loader(path)
+    seconds = time.perf_counter() - start
+    _cold_loads[(kind, path, signature)] = True
+    return value, seconds
+
+
+def load_cached(kind, path, loader, checksum=False):
+    """
+    리소스를 캐시에서 가져오거나 처음이면 loader(path)로 로드
+
+    Args:
+        kind (str): 리소스 종류 이름 (같은 파일을 다른 방식으로 읽을 때 구분용)
+        path (str): 파일 경로
+        loader (callable): path를 받아 리소스를 반환하는 함수
+        checksum (bool): 수정시각 대신 sha256으로 변경 여부 판단
+
+    Returns:
+        tuple: (리소스, 걸린 시간(초), cold 로드 여부)
+    """
+    path = os.path.abspath(path) if os.path.exists(path) else path
+    signature = file_signature(path, checksum)
+    start = time.perf_counter()
+    value, load_seconds = _load(kind, path, signature, loader)
+    cold = _cold_loads.pop((kind, path, signature), False)
+    return value, (load_seconds if cold else time.perf_counter() - start), cold
+
+
+def resource_lock(kind, path):
+    """
+    캐시된 리소스를 여러 세션이 함께 쓸 때 사용하는 락
+    (ultralytics predictor는 스레드 안전하지 않음, Streamlit 세션은 스레드로 실행됨)
+    """
+    key = (kind, os.path.abspath(path) if os.path.exists(path) else path)
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def format_timings(timings):
+    """{'모델': (초, cold 여부)} -> '모델 1.52s (cold) · 영양 데이터 0.00s (warm)'"""
+    return " · ".join(f"{name} {seconds:.2f}s ({'cold' if cold else 'warm'})"
+                      for name, (seconds, cold) in timings.items())
@@ -0,0 +1,142 @@
+"""
+추론 서버용 최소 메트릭 (Prometheus text exposition format 0.0.4)
+
+prometheus_client 없이 히스토그램/카운터/게이지만 지원
+- Histogram: 라벨 하나(예: stage)별 누적 버킷, 합계, 개수
+- Counter: 라벨 하나별 누적 값
+- Gauge: 조회할 때마다 함수를 호출해서 현재 값 계산 (대기열 길이 등)
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name, help_text, label="stage", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._series = {}  # 라벨 값 -> [버킷별 개수, 합계, 개수]
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += seconds
+            series[2] += 1
+
+    @contextmanager
+    def time(self, label_value):
+        """with 블록 실행 시간을 기록 (예외가 나도 기록)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_value, time.perf_counter() - start)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for label_value, (counts, total, count) in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label_value=None, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items(), key=lambda kv: str(kv[0])):
+            if self.label is None:
+                lines.append(f"{self.name} {_format_value(value)}")
+            else:
+                lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {_format_value(value)}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, fn, label=None):
+        """
+        Args:
+            fn (callable): 현재 값을 반환 (label을 지정하면 {라벨 값: 값} dict, None이면 출력 안 함)
+        """
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.label = label
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.fn()
+        if value is None:
+            return lines
+        if self.label is None:
+            lines.append(f"{self.name} {_format_value(value)}")
+        else:
+            for label_value, v in sorted(value.items()):
+                lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {_format_value(v)}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, label="stage", buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help_text, label, buckets))
+
+    def counter(self, name, help_text, label=None):
+        return self._add(Counter(self.prefix + name, help_text, label))
+
+    def gauge(self, name, help_text, fn, label=None):
+        return self._add(Gauge(self.prefix + name, help_text, fn, label))
+
+    def render(self):
+        """/metrics 응답 본문"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 스크립트들과 같은 방식으로 vegan 폴더와 Nuri 폴더의 모듈을 import
+VEGAN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, VEGAN_DIR)
+sys.path.insert(0, os.path.join(VEGAN_DIR, "Nuri"))
@@ -0,0 +1,83 @@
+"""
+CameraStream을 작은 동영상 파일로 실행해서 링 버퍼(최신 프레임만 유지) 동작 확인
+"""
+import time
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+import camera_stream
+from camera_stream import CameraStream
+
+
+def _video(path, n_frames=10, fps=30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("cv2 cannot write MJPG video here")
+    for i in range(n_frames):
+        writer.write(np.full((24, 32, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def _wait_finished(stream, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not stream.finished and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return stream.finished
+
+
+def test_ring_buffer_keeps_latest_frames(tmp_path):
+    with CameraStream(_video(tmp_path / "meal.avi"), buffer_size=3, realtime=False) as stream:
+        assert _wait_finished(stream)
+        seq, _, frame = stream.latest()
+        assert seq == stream.frames_read == 10
+        assert abs(float(frame.mean()) - 180) < 8  # 마지막 프레임 색
+        # 밀린 프레임은 버리고 버퍼에는 최근 3장만 남음
+        assert [item[0] for item in stream._frames] == [8, 9, 10]
+        # 처리가 늦은 소비자는 중간 프레임을 건너뛰고 최신 프레임만 받음
+        assert [item[0] for item in stream.frames(timeout=0.5)] == [10]
+        assert stream.wait_for_frame(after=10, timeout=0.1) is None
+        assert stream.snapshot().size == (32, 24)
+
+
+def test_loop_restarts_file(tmp_path):
+    with CameraStream(_video(tmp_path / "meal.avi", n_frames=3), realtime=False, loop=True) as stream:
+        assert stream.wait_for_frame(after=7, timeout=5.0) is not None
+        assert not stream.finished
+
+
+class _BrokenCapture:
+    """열리기는 하지만 프레임을 읽지 못하는 파일 (손상된 동영상)"""
+    reads = 0
+
+    def __init__(self, source):
+        pass
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        _BrokenCapture.reads += 1
+        return False, None
+
+    def get(self, prop):
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+
+def test_loop_gives_up_on_unreadable_file(monkeypatch):
+    monkeypatch.setattr(camera_stream.cv2, "VideoCapture", _BrokenCapture)
+    _BrokenCapture.reads = 0
+    stream = CameraStream("broken.mp4", loop=True).start()
+    try:
+        assert _wait_finished(stream, timeout=10.0)
+    finally:
+        stream.stop()
+    assert _BrokenCapture.reads == CameraStream.MAX_READ_FAILURES + 1
+    assert stream.latest() is None
@@ -0,0 +1,64 @@
+"""
+데이터셋 준비: 프로세스 풀 처리 결과가 순차 처리와 같은지, 손상된 이미지를 건너뛰는지 확인
+"""
+import os
+import json
+import pytest
+from PIL import Image
+
+for _module in ("torch", "tensorflow", "ultralytics", "matplotlib", "yaml"):
+    pytest.importorskip(_module)
+import vegan1
+from dataset_utils import MANIFEST_NAME, process_image
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    data_dir = tmp_path / "raw"
+    for class_name, color in (("kimchi", (200, 40, 40)), ("tofu", (240, 240, 200))):
+        (data_dir / class_name / "sub").mkdir(parents=True)
+        for i in range(5):
+            Image.new("RGB", (40 + i, 30), color).save(data_dir / class_name / f"img{i}.jpg", "JPEG")
+        # 하위 폴더에 같은 파일 이름이 있어도 덮어쓰지 않음
+        Image.new("RGB", (20, 20), color).save(data_dir / class_name / "sub" / "img0.jpg", "JPEG")
+    (data_dir / "tofu" / "broken.jpg").write_bytes(b"\xff\xd8 truncated")
+    return data_dir
+
+
+def _prepare(data_dir, output_dir, num_workers):
+    vegan1.DatasetPreparator(data_dir, output_dir, num_workers=num_workers).prepare_yolo_dataset(train_ratio=0.5)
+    with open(output_dir / MANIFEST_NAME, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _strip_split(images):
+    # 전체 생성 모드의 분할은 셔플 결과라 실행마다 다름
+    return {rel: {k: v for k, v in record.items() if k != "split"} for rel, record in images.items()}
+
+
+def test_pool_matches_sequential(raw_dir, tmp_path):
+    sequential = _prepare(raw_dir, tmp_path / "seq", num_workers=1)
+    parallel = _prepare(raw_dir, tmp_path / "pool", num_workers=2)
+
+    assert len(sequential["images"]) == 12
+    assert _strip_split(parallel["images"]) == _strip_split(sequential["images"])
+    assert "tofu/broken.jpg" in parallel["failed"]
+    for output_dir, manifest in ((tmp_path / "seq", sequential), (tmp_path / "pool", parallel)):
+        for record in manifest["images"].values():
+            split_dir = output_dir / record["split"]
+            assert (split_dir / "images" / record["name"]).exists()
+            label = (split_dir / "labels" / (os.path.splitext(record["name"])[0] + ".txt")).read_text()
+            assert label == f"{record['class_idx']} 0.5 0.5 1.0 1.0"
+
+
+def test_process_image_reports_unreadable_file(raw_dir, tmp_path):
+    for split in ("images", "labels"):
+        (tmp_path / "out" / split).mkdir(parents=True)
+    img_path, ok, message, record = process_image(raw_dir / "tofu" / "broken.jpg", tmp_path / "out", "1 0.5 0.5 1 1")
+    assert (ok, record) == (False, None)
+    assert "Could not read image" in message
+    assert os.listdir(tmp_path / "out" / "images") == []
+
+    _, ok, _, record = process_image(raw_dir / "tofu" / "img1.jpg", tmp_path / "out", "1 0.5 0.5 1 1", name="x.jpg")
+    assert ok and record["name"] == "x.jpg" and record["link"] == "copy"
+    assert record["hash"] is not None
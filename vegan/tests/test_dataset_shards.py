@@ -0,0 +1,69 @@
+"""
+tar 샤드: 다시 만들 때 남은 샤드 정리, 임의 접근, 로컬에 풀기
+"""
+import os
+import io
+import pytest
+from PIL import Image
+
+yaml = pytest.importorskip("yaml")
+from dataset_shards import SHARD_INDEX_NAME, ShardDataset, write_shards, resolve_data_yaml
+
+
+def _dataset(root, counts):
+    """counts: {split: 이미지 수} 크기의 YOLO 데이터셋"""
+    for split, count in counts.items():
+        (root / split / "images").mkdir(parents=True, exist_ok=True)
+        (root / split / "labels").mkdir(parents=True, exist_ok=True)
+        for i in range(count):
+            Image.new("RGB", (16, 16), (i * 10, 100, 50)).save(root / split / "images" / f"img{i}.jpg", "JPEG")
+            (root / split / "labels" / f"img{i}.txt").write_text(f"{i % 2} 0.5 0.5 1.0 1.0")
+    with open(root / "dataset.yaml", "w") as f:
+        yaml.dump({"names": {0: "kimchi", 1: "tofu"}}, f)
+    return root
+
+
+def _tar_files(shard_dir):
+    return sorted(name for name in os.listdir(shard_dir) if name.endswith(".tar"))
+
+
+def test_rewrite_removes_stale_shards(tmp_path):
+    shard_dir = tmp_path / "shards"
+    write_shards(_dataset(tmp_path / "big", {"train": 6, "val": 2}), shard_dir, max_shard_bytes=1)
+    assert len(_tar_files(shard_dir)) == 8
+
+    write_shards(_dataset(tmp_path / "small", {"train": 2, "val": 1}), shard_dir, max_shard_bytes=1)
+    assert _tar_files(shard_dir) == ["train-00000.tar", "train-00001.tar", "val-00000.tar"]
+    shards = ShardDataset(shard_dir)
+    assert len(shards) == 3
+    assert shards.validate()["errors"] == []
+    assert [name for name, _, _ in shards.iter_samples("train")] == ["train/images/img0.jpg",
+                                                                       "train/images/img1.jpg"]
+    shards.close()
+
+
+def test_read_view_survives_close(tmp_path):
+    shard_dir = tmp_path / "shards"
+    write_shards(_dataset(tmp_path / "data", {"train": 2}), shard_dir)
+    shards = ShardDataset(shard_dir)
+    view = shards.read("train/labels/img1.txt")
+    shards.close()  # 살아 있는 memoryview가 있어도 BufferError 없음
+    assert bytes(view) == b"1 0.5 0.5 1.0 1.0"
+    with Image.open(io.BytesIO(ShardDataset(shard_dir).read("train/images/img0.jpg"))) as img:
+        assert img.size == (16, 16)
+    view.release()
+
+
+def test_materialize_into_same_dir_drops_old_samples(tmp_path):
+    shard_dir = tmp_path / "shards"
+    local = tmp_path / "local"
+    write_shards(_dataset(tmp_path / "big", {"train": 4, "val": 2}), shard_dir)
+    resolve_data_yaml(shard_dir / SHARD_INDEX_NAME, local)
+    assert len(os.listdir(local / "train" / "images")) == 4
+
+    write_shards(_dataset(tmp_path / "small", {"train": 1, "val": 1}), shard_dir)
+    yaml_path = resolve_data_yaml(shard_dir, local)
+    assert os.listdir(local / "train" / "images") == ["img0.jpg"]
+    assert os.listdir(local / "val" / "labels") == ["img0.txt"]
+    with open(yaml_path) as f:
+        assert yaml.safe_load(f)["names"] == {0: "kimchi", 1: "tofu"}
@@ -0,0 +1,84 @@
+"""
+중복 사진 제거: DCT perceptual hash, 해밍 거리 BK-tree, 해시 캐시
+"""
+import random
+import numpy as np
+import pytest
+from PIL import Image
+
+from dataset_utils import BKTree, image_phash
+
+
+def _pattern(seed, size=(256, 192)):
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (3, 4, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize(size, Image.BICUBIC)
+
+
+def _save_copy(img, path):
+    # 크기를 줄여 JPEG로 다시 저장한 사본 (같은 사진을 다른 경로로 받은 경우)
+    img.resize((128, 96), Image.LANCZOS).save(path, quality=85)
+
+
+def _distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def test_phash_is_stable_for_resized_and_recompressed_copies(tmp_path):
+    original = _pattern(9)
+    original.save(tmp_path / "a.png")
+    _save_copy(original, tmp_path / "small.jpg")
+    _pattern(10).save(tmp_path / "other.png")
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+
+    _, a = image_phash(tmp_path / "a.png")
+    _, small = image_phash(tmp_path / "small.jpg")
+    _, other = image_phash(tmp_path / "other.png")
+    assert 0 <= a < 2 ** 64
+    assert _distance(a, small) <= 2
+    assert _distance(a, other) > 10
+    assert image_phash(tmp_path / "broken.jpg") == (tmp_path / "broken.jpg", None)
+
+
+def test_bktree_search_matches_brute_force():
+    rng = random.Random(0)
+    base = [rng.getrandbits(64) for _ in range(20)]
+    # 가까운 해시가 모이도록 몇 비트씩만 바꾼 값을 섞음
+    values = base + [b ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for b in base for _ in range(5)]
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, i)
+
+    assert BKTree().search(123, 5) == []
+    for query in values[:30] + [rng.getrandbits(64) for _ in range(10)]:
+        for radius in (0, 2, 6):
+            expected = sorted((_distance(query, v), i) for i, v in enumerate(values)
+                              if _distance(query, v) <= radius)
+            assert sorted(tree.search(query, radius)) == expected
+
+
+def test_deduplicate_keeps_first_copy_and_reuses_hashes(tmp_path, monkeypatch):
+    for module in ("torch", "tensorflow", "ultralytics", "matplotlib", "yaml"):
+        pytest.importorskip(module)
+    import vegan1
+
+    class_dir = tmp_path / "raw" / "kimchi"
+    class_dir.mkdir(parents=True)
+    _pattern(9).save(class_dir / "a.png")
+    _save_copy(_pattern(9), class_dir / "b.jpg")
+    _pattern(10).save(class_dir / "c.png")
+    (class_dir / "d.jpg").write_bytes(b"not an image")
+    images = sorted(class_dir.iterdir())
+
+    preparator = vegan1.DatasetPreparator(tmp_path / "raw", tmp_path / "yolo")
+    cache = {}
+    deduped = preparator.deduplicate({"kimchi": images}, max_distance=4, phash_cache=cache)
+    # 해시를 계산하지 못한 이미지는 남겨서 이후 처리 단계에서 경고
+    assert [p.name for p in deduped["kimchi"]] == ["a.png", "c.png", "d.jpg"]
+    assert set(cache) == {"kimchi/a.png", "kimchi/b.jpg", "kimchi/c.png", "kimchi/d.jpg"}
+
+    def no_hash(path):
+        raise AssertionError(f"hash recomputed for unchanged {path}")
+    monkeypatch.setattr(vegan1, "image_phash", no_hash)
+    again = preparator.deduplicate({"kimchi": images}, max_distance=4, phash_cache=cache)
+    assert again == deduped
@@ -0,0 +1,91 @@
+"""
+탐지 결과 캐시: 메모리/디스크 조회, 여러 프로세스가 같은 폴더를 쓸 때 용량 제한과 동시 저장
+"""
+import os
+import json
+import multiprocessing
+import numpy as np
+import pytest
+
+from detection_cache import DetectionCache
+
+BOUND = 64 * 1024
+SHARED_KEY = "ab" + "0" * 62
+
+
+def _cache_bytes(cache_dir):
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith(".json"))
+    return total
+
+
+def _writer(cache_dir, worker, errors):
+    try:
+        cache = DetectionCache(cache_dir, max_memory_items=0, max_disk_bytes=BOUND, rescan_every=8)
+        for i in range(300):
+            cache.put(f"{worker:02x}{i:062x}", [{"worker": worker, "pad": "x" * 400}])
+            # 두 프로세스가 같은 키를 계속 덮어씀
+            cache.put(SHARED_KEY, [{"worker": worker, "i": i}])
+    except Exception as e:
+        errors.put(f"{type(e).__name__}: {e}")
+
+
+def test_memory_and_disk_hits(tmp_path):
+    cache = DetectionCache(tmp_path, max_memory_items=1)
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    key = cache.make_key(image, "model", {"conf": 0.25})
+    assert key != cache.make_key(image, "model", {"conf": 0.5})
+    assert cache.get(key) is None
+
+    cache.put(key, [{"class": 1}])
+    assert cache.get(key) == [{"class": 1}]
+    cache.put(cache.make_key(image, "other"), [])  # 메모리에서 밀려남
+    assert cache.get(key) == [{"class": 1}]
+    # 다른 프로세스가 저장한 것처럼 새 인스턴스도 디스크에서 찾음
+    assert DetectionCache(tmp_path).get(key) == [{"class": 1}]
+    stats = cache.stats()
+    assert (stats["hits_memory"], stats["hits_disk"], stats["misses"]) == (1, 1, 1)
+
+
+def test_get_or_compute_only_computes_once(tmp_path):
+    cache = DetectionCache(tmp_path)
+    calls = []
+    compute = lambda: calls.append(1) or ["tofu"]
+    assert cache.get_or_compute(b"jpeg", "model", {}, compute) == ["tofu"]
+    assert cache.get_or_compute(b"jpeg", "model", {}, compute) == ["tofu"]
+    assert len(calls) == 1
+
+
+def test_eviction_goes_below_bound(tmp_path):
+    cache = DetectionCache(tmp_path, max_memory_items=0, max_disk_bytes=10_000, evict_ratio=0.5)
+    for i in range(100):
+        cache.put(f"{i:064x}", ["x" * 200])
+    assert _cache_bytes(tmp_path) <= 10_000
+    # 가장 최근 항목은 남음
+    assert cache.get(f"{99:064x}") is not None
+
+
+def test_put_survives_unwritable_dir(tmp_path):
+    cache = DetectionCache(tmp_path)
+    (tmp_path / "ab").write_text("not a directory")
+    cache.put(SHARED_KEY, ["tofu"])  # 디스크 저장 실패는 경고만
+    assert cache.get(SHARED_KEY) == ["tofu"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_two_processes_share_bound_and_key(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    errors = ctx.Queue()
+    procs = [ctx.Process(target=_writer, args=(str(tmp_path), worker, errors)) for worker in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+    assert [p.exitcode for p in procs] == [0, 0]
+    assert errors.empty(), errors.get()
+
+    assert _cache_bytes(tmp_path) <= BOUND
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.endswith(".tmp")]
+    with open(tmp_path / SHARED_KEY[:2] / f"{SHARED_KEY}.json") as f:
+        assert json.load(f)[0]["i"] == 299
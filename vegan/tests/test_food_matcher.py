@@ -0,0 +1,59 @@
+"""
+클래스 이름 -> 식품명 매칭: 자모 3-gram 역색인 검색과 별칭 파일
+"""
+import json
+import pytest
+
+from food_matcher import FoodMatcher, decompose, matcher_paths, resolve_aliases
+
+FOODS = ["김치찌개", "된장찌개", "두부조림", "비빔밥", "tofu salad"]
+
+
+def _aliases(source):
+    with open(matcher_paths(source)[1], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_decompose_splits_hangul_into_jamo():
+    assert decompose("김치") == "ㄱㅣㅁㅊㅣ"
+    assert decompose("Tofu Salad!") == "tofusalad"
+
+
+def test_search_ranks_closest_name_first():
+    matcher = FoodMatcher(FOODS)
+    assert matcher.search("김치찌게", k=2)[0][0] == "김치찌개"
+    assert matcher.search("된장 찌개")[0] == ("된장찌개", pytest.approx(1.0))
+    assert matcher.search("TOFU-salad")[0][0] == "tofu salad"
+    assert matcher.search("qqq") == []
+
+
+def test_matcher_cache_is_rebuilt_for_a_new_table(tmp_path):
+    path = tmp_path / "FDDB.matcher.pkl"
+    FoodMatcher.load_or_build(FOODS, path)
+    assert FoodMatcher.load_or_build(FOODS, path).search("비빔밥")[0][0] == "비빔밥"
+    assert FoodMatcher.load_or_build(["잡채"], path).search("잡채")[0][0] == "잡채"
+
+
+def test_fuzzy_alias_is_persisted_and_reused(tmp_path):
+    source = tmp_path / "FDDB.xlsx"
+    assert resolve_aliases(FOODS, ["김치찌게", "pizza"], source) == {"김치찌게": "김치찌개"}
+    aliases = _aliases(source)
+    assert aliases["김치찌게"]["source"] == "fuzzy"
+    assert aliases["pizza"]["food"] is None
+    assert resolve_aliases(FOODS, ["김치찌게"], source) == {"김치찌게": "김치찌개"}
+
+
+def test_exact_name_replaces_generated_alias(tmp_path):
+    source = tmp_path / "FDDB.xlsx"
+    resolve_aliases(FOODS, ["김치찌게"], source)
+    assert resolve_aliases(FOODS + ["김치찌게"], ["김치찌게"], source) == {"김치찌게": "김치찌게"}
+    assert "김치찌게" not in _aliases(source)
+
+
+def test_manual_alias_is_kept(tmp_path):
+    source = tmp_path / "FDDB.xlsx"
+    with open(matcher_paths(source)[1], "w", encoding="utf-8") as f:
+        json.dump({"두부조림": "tofu salad", "비빔밥": {"food": "두부조림", "source": "manual"}}, f)
+    resolved = resolve_aliases(FOODS, ["두부조림", "비빔밥"], source)
+    assert resolved == {"두부조림": "tofu salad", "비빔밥": "두부조림"}
+    assert _aliases(source)["두부조림"] == "tofu salad"
@@ -0,0 +1,76 @@
+"""
+scandir 이미지 인덱스: 확장자 비교, 디렉토리 mtime 캐시, 저장/불러오기
+"""
+import os
+
+from dataset_utils import ImageIndex
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x")
+
+
+def _bump(dir_path, seconds):
+    # 파일 추가 후 같은 시각으로 보이지 않도록 디렉토리 mtime을 명시적으로 바꿈
+    st = os.stat(dir_path)
+    os.utime(dir_path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10 ** 9))
+
+
+def test_scan_finds_images_recursively(tmp_path):
+    root = tmp_path / "kimchi"
+    for name in ("a.jpg", "b.JPEG", "c.Png", "notes.txt", "sub/d.jpg", "sub/deeper/e.jpeg"):
+        _touch(root / name)
+    (root / "folder.jpg").mkdir()  # 이미지 확장자를 가진 디렉토리는 파일로 치지 않음
+
+    images = ImageIndex().scan(root)
+    assert [p.relative_to(root).as_posix() for p in images] == [
+        "a.jpg", "b.JPEG", "c.Png", "sub/d.jpg", "sub/deeper/e.jpeg"]
+
+
+def test_unchanged_dirs_are_not_listed_again(tmp_path):
+    root = tmp_path / "tofu"
+    _touch(root / "a.jpg")
+    _touch(root / "sub" / "b.jpg")
+    cache_path = tmp_path / "file_index.json"
+
+    index = ImageIndex(cache_path)
+    index.scan(root)
+    assert index.stats[os.fspath(root)]["dirs_listed"] == 2
+    index.save()
+
+    index = ImageIndex(cache_path)
+    assert len(index.scan(root)) == 2
+    assert index.stats[os.fspath(root)]["dirs_listed"] == 0
+    assert index.stats[os.fspath(root)]["dirs_cached"] == 2
+
+    # 파일이 추가된 디렉토리만 다시 나열
+    _touch(root / "sub" / "c.jpg")
+    _bump(root / "sub", 5)
+    images = index.scan(root)
+    assert [p.name for p in images] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert index.stats[os.fspath(root)]["dirs_listed"] == 1
+
+
+def test_removed_dirs_and_other_extensions(tmp_path):
+    root = tmp_path / "bibimbap"
+    _touch(root / "sub" / "a.jpg")
+    _touch(root / "b.webp")
+    cache_path = tmp_path / "file_index.json"
+    index = ImageIndex(cache_path)
+    index.scan(root)
+    index.save()
+
+    # 확장자 목록이 다르면 캐시를 쓰지 않음
+    webp = ImageIndex(cache_path, extensions=(".webp",))
+    assert webp.dirs == {}
+    assert [p.name for p in webp.scan(root)] == ["b.webp"]
+
+    os.unlink(root / "sub" / "a.jpg")
+    os.rmdir(root / "sub")
+    _bump(root, 5)
+    assert index.scan(root) == []
+    assert os.fspath(root / "sub") not in index.dirs
+
+    index.prune([tmp_path / "other"])
+    assert index.dirs == {}
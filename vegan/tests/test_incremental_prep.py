@@ -0,0 +1,106 @@
+"""
+증분 데이터셋 준비: 추가/변경/삭제/처리 실패 이미지가 다음 실행에 어떻게 반영되는지 확인
+"""
+import os
+import json
+import pytest
+from PIL import Image
+
+for _module in ("torch", "tensorflow", "ultralytics", "matplotlib", "yaml"):
+    pytest.importorskip(_module)
+import vegan1
+from dataset_utils import MANIFEST_NAME
+
+
+def _jpeg(path, color, size=(32, 24)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", size, color).save(path, "JPEG")
+
+
+def _outputs(output_dir):
+    """분할별 데이터셋 이미지 이름"""
+    return {split: sorted(os.listdir(output_dir / split / "images")) for split in ("train", "val")}
+
+
+def _manifest(output_dir):
+    with open(output_dir / MANIFEST_NAME, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    data_dir = tmp_path / "raw"
+    for i in range(4):
+        _jpeg(data_dir / "kimchi" / f"k{i}.jpg", (200, 30 * i, 40))
+        _jpeg(data_dir / "tofu" / f"t{i}.jpg", (240, 240, 30 * i))
+    output_dir = tmp_path / "yolo"
+    vegan1.DatasetPreparator(data_dir, output_dir).prepare_yolo_dataset(train_ratio=0.5)
+    return data_dir, output_dir
+
+
+def _prepare(data_dir, output_dir):
+    vegan1.DatasetPreparator(data_dir, output_dir).prepare_yolo_dataset(train_ratio=0.5, incremental=True)
+    return _manifest(output_dir)
+
+
+def _assert_consistent(output_dir, manifest):
+    outputs = _outputs(output_dir)
+    assert not set(outputs["train"]) & set(outputs["val"])
+    expected = {split: sorted(r["name"] for r in manifest["images"].values() if r["split"] == split)
+                for split in ("train", "val")}
+    assert outputs == expected
+
+
+def test_add_change_delete(dataset):
+    data_dir, output_dir = dataset
+    before = _manifest(output_dir)["images"]
+
+    _jpeg(data_dir / "tofu" / "t_new.jpg", (1, 2, 3))
+    _jpeg(data_dir / "kimchi" / "k0.jpg", (9, 9, 9), size=(40, 30))
+    os.utime(data_dir / "kimchi" / "k0.jpg", ns=(1, 1))
+    (data_dir / "kimchi" / "k1.jpg").unlink()
+    manifest = _prepare(data_dir, output_dir)
+
+    images = manifest["images"]
+    assert "tofu/t_new.jpg" in images
+    assert "kimchi/k1.jpg" not in images
+    assert images["kimchi/k0.jpg"]["split"] == before["kimchi/k0.jpg"]["split"]
+    assert images["kimchi/k0.jpg"]["size"] != before["kimchi/k0.jpg"]["size"]
+    assert images["tofu/t1.jpg"] == before["tofu/t1.jpg"]
+    _assert_consistent(output_dir, manifest)
+
+
+def test_failed_change_removes_old_outputs(dataset):
+    data_dir, output_dir = dataset
+    old = _manifest(output_dir)["images"]["kimchi/k2.jpg"]
+    (data_dir / "kimchi" / "k2.jpg").write_bytes(b"not a jpeg anymore")
+    manifest = _prepare(data_dir, output_dir)
+
+    # 다시 처리하다 실패한 이미지는 이전 분할에도 남지 않음
+    assert "kimchi/k2.jpg" not in manifest["images"]
+    assert "kimchi/k2.jpg" in manifest["failed"]
+    assert old["name"] not in sum(_outputs(output_dir).values(), [])
+    _assert_consistent(output_dir, manifest)
+
+
+def test_failed_images_are_not_retried(dataset, monkeypatch):
+    data_dir, output_dir = dataset
+    (data_dir / "tofu" / "bad.jpg").write_bytes(b"corrupt")
+    manifest = _prepare(data_dir, output_dir)
+    assert manifest["failed"]["tofu/bad.jpg"]["class_idx"] == 1
+
+    attempts = []
+    process_image = vegan1.process_image
+    monkeypatch.setattr(vegan1, "process_image", lambda img_path, *args: attempts.append(img_path.name)
+                        or process_image(img_path, *args))
+    manifest = _prepare(data_dir, output_dir)
+    assert attempts == []
+    assert "tofu/bad.jpg" in manifest["failed"]
+
+    # 고쳐진 파일은 다시 처리됨
+    _jpeg(data_dir / "tofu" / "bad.jpg", (5, 5, 5))
+    manifest = _prepare(data_dir, output_dir)
+    assert attempts == ["bad.jpg"]
+    assert "tofu/bad.jpg" in manifest["images"]
+    assert "tofu/bad.jpg" not in manifest["failed"]
+    _assert_consistent(output_dir, manifest)
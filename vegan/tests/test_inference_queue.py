@@ -0,0 +1,173 @@
+"""
+추론 실행기: 대기열 제한, 자리가 날 때까지 기다리기, 마이크로 배치, fork 후 재설정
+"""
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+import pytest
+
+from inference_queue import BoundedExecutor, MicroBatcher, QueueFullError
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        executor.submit(release.wait)
+        executor.submit(release.wait)
+        with pytest.raises(QueueFullError):
+            executor.submit(release.wait)
+        assert executor.stats()["rejected"] == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_run_waits_for_a_free_slot():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+
+    async def scenario():
+        blocker = executor.submit(time.sleep, 0.2)
+        with pytest.raises(QueueFullError):
+            await executor.run(lambda: "late", wait=0.0)
+        start = time.perf_counter()
+        result = await executor.run(lambda: "ok", wait=5.0)
+        assert blocker.done()
+        return result, time.perf_counter() - start
+
+    try:
+        result, waited = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert result == "ok"
+    assert waited < 2.0  # 자리가 나면 바로 깨어남 (시간 초과까지 기다리지 않음)
+
+
+def test_run_gives_up_after_deadline():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        executor.submit(release.wait)
+        with pytest.raises(QueueFullError):
+            await executor.run(lambda: None, wait=0.1)
+        # 취소된 대기자는 목록에서 빠짐
+        task = asyncio.ensure_future(executor.run(lambda: None, wait=10.0))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert executor._waiters == []
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def _double_or_fail(items):
+    return [ValueError(f"bad item {x}") if x < 0 else x * 2 for x in items]
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    batcher = MicroBatcher(_double_or_fail, max_batch_size=4, max_wait_ms=200)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.run(x) for x in range(6)), return_exceptions=True)
+
+    try:
+        assert asyncio.run(scenario()) == [0, 2, 4, 6, 8, 10]
+        stats = batcher.stats()
+    finally:
+        batcher.shutdown()
+    # 먼저 들어온 4개가 한 배치, 나머지 2개가 다음 배치
+    assert stats["batch_sizes"] == {2: 1, 4: 1}
+    assert stats["queued"] == stats["running"] == 0
+
+
+def test_micro_batcher_fails_only_the_bad_item():
+    batcher = MicroBatcher(_double_or_fail, max_batch_size=3, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(x) for x in (1, -1, 3)]
+        assert futures[0].result(5) == 2
+        with pytest.raises(ValueError, match="bad item -1"):
+            futures[1].result(5)
+        assert futures[2].result(5) == 6
+    finally:
+        batcher.shutdown()
+
+    def wrong_length(items):
+        return items[:1]
+    batcher = MicroBatcher(wrong_length, max_batch_size=2, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(x) for x in (1, 2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="returned 1 results for 2 items"):
+                future.result(5)
+    finally:
+        batcher.shutdown()
+
+
+def test_micro_batcher_rejects_when_full_and_skips_cancelled():
+    release = threading.Event()
+    seen = []
+
+    def blocking(items):
+        release.wait()
+        seen.extend(items)
+        return items
+
+    batcher = MicroBatcher(blocking, max_batch_size=1, max_wait_ms=0, max_queue=1)
+    try:
+        running = batcher.submit("a")
+        waiting = batcher.submit("b")
+        with pytest.raises(QueueFullError):
+            batcher.submit("c")
+        assert batcher.stats()["rejected"] == 1
+        assert waiting.cancel()  # 클라이언트가 끊긴 요청은 실행하지 않음
+        release.set()
+        assert running.result(5) == "a"
+        assert batcher.submit("d").result(5) == "d"
+    finally:
+        release.set()
+        batcher.shutdown()
+    assert seen == ["a", "d"]
+
+
+def _use_after_fork(executor, batcher):
+    # 부모의 스레드는 자식에 없으므로 재설정되지 않았다면 결과를 받지 못하고 시간 초과
+    assert executor.stats()["rejected"] == 0
+    assert batcher.stats()["batches"] == 0
+    assert executor.submit(os.getpid).result(5) == os.getpid()
+    assert batcher.submit(21).result(5) == 42
+
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="needs fork")
+def test_executors_work_in_forked_child():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    batcher = MicroBatcher(_double_or_fail, max_batch_size=2, max_wait_ms=1)
+    release = threading.Event()
+    try:
+        # 부모에서 스레드를 띄우고 통계를 남긴 상태로 fork
+        blocker = executor.submit(release.wait)
+        with pytest.raises(QueueFullError):
+            executor.submit(release.wait)
+        assert batcher.submit(1).result(5) == 2
+
+        ctx = multiprocessing.get_context("fork")
+        proc = ctx.Process(target=_use_after_fork, args=(executor, batcher))
+        proc.start()
+        proc.join(30)
+        assert proc.exitcode == 0
+
+        # 부모 쪽 상태는 그대로
+        assert executor.stats()["rejected"] == 1
+        release.set()
+        blocker.result(5)
+    finally:
+        release.set()
+        executor.shutdown()
+        batcher.shutdown()
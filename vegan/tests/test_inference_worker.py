@@ -0,0 +1,77 @@
+"""
+추론 워커: 클라이언트가 더 큰 이미지 때문에 공유 메모리 세그먼트를 바꿔도 요청이 실패하지 않는지 확인
+"""
+import mmap
+import types
+import threading
+import numpy as np
+import pytest
+
+import inference_worker
+from inference_worker import InferenceClient, InferenceServer
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = types.SimpleNamespace(cpu=lambda: types.SimpleNamespace(numpy=lambda: data))
+        self._n = len(data)
+
+    def __len__(self):
+        return self._n
+
+
+def _backed_by_shared_memory(array):
+    base = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return isinstance(base, (memoryview, mmap.mmap))
+
+
+class RetainingModel:
+    """
+    ultralytics predictor처럼 마지막 입력 배열 참조를 계속 들고 있는 가짜 모델
+    공유 메모리 위의 뷰를 받으면 세그먼트가 닫힌 뒤 그 참조가 해제된 메모리를 가리키게 되므로 기록
+    """
+    names = {0: "kimchi", 1: "tofu"}
+    max_batch = None
+    infer_imgsz = 640
+
+    def __init__(self):
+        self.last_inputs = None
+        self.shared_inputs = 0
+
+    def predict(self, images, **kwargs):
+        self.last_inputs = images
+        self.shared_inputs += sum(_backed_by_shared_memory(im) for im in images)
+        return [types.SimpleNamespace(boxes=_Boxes(np.array([[0, 0, im.shape[1], im.shape[0], im.mean() / 255, 0]])))
+                for im in images]
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    model = RetainingModel()
+    monkeypatch.setattr(inference_worker, "load_model", lambda *args, **kwargs: model)
+    server = InferenceServer("missing.pt", str(tmp_path / "worker.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_predict_survives_segment_switch(worker):
+    client = InferenceClient(worker.socket_path, timeout=10)
+    try:
+        small = client.predict(np.full((8, 8, 3), 51, dtype=np.uint8))
+        first_segment = client._shm.name
+        # 버퍼보다 큰 이미지 -> 클라이언트가 새 세그먼트를 만들고 워커는 이전 세그먼트를 닫음
+        large = client.predict(np.full((64, 48, 3), 102, dtype=np.uint8))
+        assert client._shm.name != first_segment
+    finally:
+        client.close()
+
+    assert small[0]["bbox"] == [0.0, 0.0, 8.0, 8.0]
+    assert small[0]["confidence"] == pytest.approx(0.2)
+    assert large[0]["bbox"] == [0.0, 0.0, 48.0, 64.0]
+    assert large[0]["confidence"] == pytest.approx(0.4)
+    assert worker.model.shared_inputs == 0
@@ -0,0 +1,60 @@
+"""
+데이터셋 이미지 생성 방식(copy/hardlink/symlink/reflink)
+"""
+import os
+import pytest
+
+import dataset_utils
+from dataset_utils import materialize, process_image
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "src.jpg"
+    path.write_bytes(b"original image bytes")
+    return path
+
+
+def test_hardlink_shares_inode_and_replacing_keeps_source(src, tmp_path):
+    dst = tmp_path / "dst.jpg"
+    assert materialize(src, dst, "hardlink") == "hardlink"
+    assert os.stat(dst).st_ino == os.stat(src).st_ino
+
+    # 다시 만들 때는 링크를 끊고 새로 만들어서 원본을 덮어쓰지 않음
+    other = tmp_path / "other.jpg"
+    other.write_bytes(b"new bytes")
+    assert materialize(other, dst, "copy") == "copy"
+    assert src.read_bytes() == b"original image bytes"
+    assert dst.read_bytes() == b"new bytes"
+
+
+def test_symlink_points_to_absolute_source(src, tmp_path):
+    dst = tmp_path / "dst.jpg"
+    assert materialize(src, dst, "symlink") == "symlink"
+    assert os.path.islink(dst)
+    assert os.readlink(dst) == os.path.abspath(src)
+
+
+def test_unsupported_modes_fall_back_to_copy(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_utils, "_reflink", lambda a, b: False)
+    assert materialize(src, tmp_path / "reflink.jpg", "reflink") == "copy"
+
+    def no_link(*args):
+        raise OSError("cross-device link")
+    monkeypatch.setattr(dataset_utils.os, "link", no_link)
+    dst = tmp_path / "hard.jpg"
+    assert materialize(src, dst, "hardlink") == "copy"
+    assert not os.path.islink(dst) and dst.read_bytes() == src.read_bytes()
+
+
+def test_linked_records_skip_hashing(tmp_path):
+    from PIL import Image
+
+    img = tmp_path / "meal.jpg"
+    Image.new("RGB", (8, 8)).save(img, "JPEG")
+    for split in ("images", "labels"):
+        (tmp_path / "out" / split).mkdir(parents=True)
+    _, ok, _, record = process_image(img, tmp_path / "out", "0 0.5 0.5 1 1", "hardlink")
+    assert ok
+    assert record["link"] == "hardlink"
+    assert record["hash"] is None  # 링크 방식은 원본을 읽지 않음
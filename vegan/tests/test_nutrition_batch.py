@@ -0,0 +1,68 @@
+"""
+식사별 영양 분석: 여러 식사를 한 번에 계산하는 analyze_meals가 analyze_meal과 같은 결과인지 확인
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+for _module in ("torch", "tensorflow", "ultralytics", "matplotlib", "yaml"):
+    pytest.importorskip(_module)
+import vegan1
+
+CLASS_NAMES = {0: "김치찌개", 1: "두부조림", 2: "피자", 3: "비빔밥"}
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    table = pd.DataFrame({
+        "Food": ["김치찌개", "두부조림", "비빔밥"],
+        "Calories": [250.0, 180.0, 550.0],
+        "Protein": [15.0, 12.5, 18.0],
+        "Fat": [12.0, 9.0, 14.0],
+        "Carbs": [20.0, 8.0, 85.0],
+    }).set_index("Food")
+    monkeypatch.setattr(vegan1, "load_nutrition_table", lambda path: table)
+    return vegan1.NutritionAnalyzer(tmp_path / "FDDB.xlsx")
+
+
+def _meals():
+    return [
+        [{"class": 0, "confidence": 0.9}, {"class": 1, "confidence": 0.8}],
+        [],
+        [{"class": 2.0, "confidence": 0.7}],  # 영양 데이터에 없는 음식
+        [{"class": 3, "confidence": 0.6}, {"class": 3, "confidence": 0.5}, {"class": 0, "confidence": 0.4}],
+    ]
+
+
+def test_flatten_meals():
+    class_ids, offsets = vegan1.NutritionAnalyzer.flatten_meals(_meals())
+    assert class_ids.tolist() == [0, 1, 2, 3, 3, 0]
+    assert offsets.tolist() == [0, 2, 2, 3, 6]
+    class_ids, offsets = vegan1.NutritionAnalyzer.flatten_meals([])
+    assert class_ids.tolist() == [] and offsets.tolist() == [0]
+
+
+def test_analyze_meals_matches_analyze_meal(analyzer):
+    meals = _meals()
+    result = analyzer.analyze_meals(*analyzer.flatten_meals(meals), CLASS_NAMES)
+
+    assert result["dishes"].tolist() == [2, 0, 1, 3]
+    assert result["unmatched"].tolist() == [0, 0, 1, 0]
+    for i, meal in enumerate(meals):
+        totals = analyzer.analyze_meal(meal, CLASS_NAMES)["total_nutrition"]
+        for key in analyzer.TOTAL_COLUMNS:
+            assert result.loc[i, key] == pytest.approx(totals[key])
+    assert result.loc[0, "calories"] == pytest.approx(430.0)
+
+
+def test_analyze_meals_accepts_offset_slice(analyzer):
+    class_ids, offsets = analyzer.flatten_meals(_meals())
+    # 뒤쪽 식사만 (offsets가 0에서 시작하지 않음)
+    tail = analyzer.analyze_meals(class_ids, offsets[2:], CLASS_NAMES)
+    full = analyzer.analyze_meals(class_ids, offsets, CLASS_NAMES)
+    pd.testing.assert_frame_equal(tail, full.iloc[2:].reset_index(drop=True))
+
+    matrix, matched = analyzer.nutrient_matrix(CLASS_NAMES)
+    assert matrix.shape == (4, len(analyzer.TOTAL_COLUMNS))
+    assert matched.tolist() == [True, True, False, True]
+    np.testing.assert_array_equal(matrix[2], 0.0)
@@ -0,0 +1,125 @@
+"""
+/predict, /predict/batch 엔드포인트를 정적 batch(1)로 내보낸 백엔드처럼 동작하는 가짜 모델로 확인
+"""
+import io
+import sys
+import json
+import types
+import threading
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+import inference_backend
+from detection_cache import DetectionCache
+from inference_queue import BoundedExecutor
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = types.SimpleNamespace(cpu=lambda: types.SimpleNamespace(numpy=lambda: data))
+        self._n = len(data)
+
+    def __len__(self):
+        return self._n
+
+
+class StaticBatchModel:
+    """onnx/openvino 정적 export처럼 batch 1, 고정 imgsz가 아니면 실패"""
+    names = {0: "kimchi", 1: "tofu"}
+    max_batch = 1
+    infer_imgsz = 640
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, images, imgsz=None, batch=None, **kwargs):
+        if len(images) > self.max_batch or imgsz != self.infer_imgsz:
+            raise RuntimeError(f"static model got {len(images)} images at imgsz={imgsz}")
+        self.calls.append(len(images))
+        h, w = np.asarray(images[0]).shape[:2]
+        return [types.SimpleNamespace(boxes=_Boxes(np.array([[0, 0, w, h, 0.9, 1.0]])))]
+
+
+@pytest.fixture
+def testapi(monkeypatch):
+    monkeypatch.setenv("DETECTION_CACHE", "0")
+    monkeypatch.setenv("PREDICT_MAX_BATCH", "4")
+    monkeypatch.setenv("PREDICT_BATCH_SIZE", "8")
+    fake = StaticBatchModel()
+    monkeypatch.setattr(inference_backend, "load_model", lambda *args, **kwargs: fake)
+    sys.modules.pop("testapi", None)
+    import testapi
+    yield testapi
+    testapi.executor.shutdown(wait=False)
+    sys.modules.pop("testapi", None)
+
+
+def _jpeg(width, height):
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def test_batch_stream_on_static_batch_backend(testapi):
+    from fastapi.testclient import TestClient
+
+    files = [("files", (f"meal{i}.jpg", _jpeg(60 + i, 40), "image/jpeg")) for i in range(5)]
+    files.insert(2, ("files", ("broken.jpg", b"not an image", "image/jpeg")))
+
+    assert testapi.BATCH_SIZE == 1
+    assert testapi.batcher is None
+    with TestClient(testapi.app) as client:
+        response = client.post("/predict/batch", files=files)
+        metrics = client.get("/metrics").text
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == list(range(6))
+    by_name = {line["filename"]: line for line in lines}
+    assert by_name["broken.jpg"]["status"] == "error"
+    for i in range(5):
+        line = by_name[f"meal{i}.jpg"]
+        assert line["status"] == "success"
+        assert line["detections"][0]["bbox"] == [0.0, 0.0, 60.0 + i, 40.0]
+    # 워밍업 1번 + 정상 이미지 5장, 모두 한 장씩
+    assert testapi.model.model.calls == [1] * 6
+    # 워밍업은 warmup_seconds에만 기록되고 요청 단계 히스토그램에는 들어가지 않음
+    assert 'food_api_stage_seconds_count{stage="inference"} 5' in metrics
+    assert "food_api_warmup_seconds " in metrics
+
+
+def test_predict_rejects_corrupt_upload(testapi):
+    from fastapi.testclient import TestClient
+
+    with TestClient(testapi.app) as client:
+        response = client.post("/predict", files={"file": ("broken.jpg", b"not an image", "image/jpeg")})
+    assert response.status_code == 422
+    assert "decode" in response.json()["detail"]
+
+
+def test_cache_hit_skips_full_queue(testapi, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(testapi, "cache", DetectionCache(tmp_path))
+    monkeypatch.setattr(testapi, "executor", BoundedExecutor(max_workers=1, max_queue=0))
+    cached, fresh = _jpeg(30, 20), _jpeg(31, 20)
+    with TestClient(testapi.app) as client:
+        first = client.post("/predict", files={"file": ("meal.jpg", cached, "image/jpeg")})
+        assert first.status_code == 200
+
+        release = threading.Event()
+        testapi.executor.submit(release.wait)  # 실행기를 가득 채움
+        try:
+            hit = client.post("/predict", files={"file": ("meal.jpg", cached, "image/jpeg")})
+            miss = client.post("/predict", files={"file": ("other.jpg", fresh, "image/jpeg")})
+        finally:
+            release.set()
+        testapi.executor.shutdown()
+
+    assert hit.status_code == 200
+    assert hit.json()["detections"] == first.json()["detections"]
+    assert miss.status_code == 503
+    assert miss.headers["Retry-After"] == testapi.RETRY_AFTER
@@ -0,0 +1,72 @@
+"""
+학습 해상도 축소 캐시: 크기/레이블, 변경된 이미지만 다시 만들기, 데이터셋이 바뀌면 사용하지 않기
+"""
+import os
+import pytest
+from PIL import Image
+
+for _module in ("torch", "tensorflow", "ultralytics", "matplotlib", "yaml"):
+    pytest.importorskip(_module)
+import vegan1
+from vegan1 import DatasetPreparator, resized_cache_dir, resized_cache_yaml
+
+
+@pytest.fixture
+def prepared(tmp_path):
+    data_dir = tmp_path / "raw"
+    for class_name in ("kimchi", "tofu"):
+        (data_dir / class_name).mkdir(parents=True)
+        for i in range(3):
+            Image.new("RGB", (400, 200 + i), (i * 50, 90, 30)).save(data_dir / class_name / f"{i}.png")
+    output_dir = tmp_path / "yolo"
+    preparator = DatasetPreparator(data_dir, output_dir)
+    preparator.prepare_yolo_dataset(train_ratio=0.5)
+    return data_dir, output_dir, preparator
+
+
+def _cached_images(output_dir, imgsz):
+    cache_dir = resized_cache_dir(output_dir, imgsz)
+    return sorted(p for split in ("train", "val") for p in (cache_dir / split / "images").iterdir())
+
+
+def test_build_resizes_and_links_labels(prepared):
+    _, output_dir, preparator = prepared
+    assert resized_cache_yaml(output_dir, 64) is None  # 아직 없음
+
+    yaml_path = preparator.build_resized_cache(imgsz=64)
+    assert str(resized_cache_yaml(output_dir, 64)) == str(yaml_path)
+    images = _cached_images(output_dir, 64)
+    assert len(images) == 6
+    for path in images:
+        assert path.suffix == ".jpg"
+        with Image.open(path) as img:
+            assert max(img.size) == 64  # 긴 변 기준, 패딩 없음
+        split_dir = path.parent.parent
+        label = split_dir / "labels" / (path.stem + ".txt")
+        original = output_dir / split_dir.name / "labels" / label.name
+        assert label.read_text() == original.read_text()
+
+
+def test_rebuild_only_touches_changed_images(prepared):
+    data_dir, output_dir, preparator = prepared
+    preparator.build_resized_cache(imgsz=64)
+    mtimes = {p.name: os.stat(p).st_mtime_ns for p in _cached_images(output_dir, 64)}
+
+    os.unlink(data_dir / "tofu" / "0.png")
+    DatasetPreparator(data_dir, output_dir).prepare_yolo_dataset(train_ratio=0.5, incremental=True)
+    # 데이터셋이 바뀌었으므로 다시 만들기 전에는 사용하지 않음
+    assert resized_cache_yaml(output_dir, 64) is None
+
+    preparator.build_resized_cache(imgsz=64)
+    assert resized_cache_yaml(output_dir, 64) is not None
+    after = {p.name: os.stat(p).st_mtime_ns for p in _cached_images(output_dir, 64)}
+    assert len(after) == 5
+    assert all(after[name] == mtimes[name] for name in after)  # 남은 이미지는 그대로 재사용
+
+
+def test_cache_is_ignored_for_other_manifest_or_size(prepared):
+    _, output_dir, preparator = prepared
+    preparator.build_resized_cache(imgsz=64)
+    assert resized_cache_yaml(output_dir, 32) is None
+    (output_dir / vegan1.MANIFEST_NAME).write_text("{}")  # 캐시를 만든 뒤 데이터셋이 바뀐 상황
+    assert resized_cache_yaml(output_dir, 64) is None
@@ -0,0 +1,75 @@
+"""
+pre-fork 서버 마스터: 죽은 워커 재시작, 종료 신호를 받은 뒤에는 워커를 다시 띄우지 않음
+(모델 대신 가짜 testapi, uvicorn 대신 가짜 워커 사용)
+"""
+import os
+import sys
+import time
+import types
+import signal
+import threading
+import multiprocessing
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+
+
+def _fake_testapi():
+    done = threading.Event()
+    done.set()
+    return types.SimpleNamespace(warmup=lambda: None, warmup_done=done, warmup_info={})
+
+
+def _master(log_path, crash_after):
+    import serve
+
+    def fake_worker(testapi, sock, threads, log_level):
+        with open(log_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        if crash_after is None:
+            while True:
+                time.sleep(1)  # SIGTERM 기본 동작으로 종료
+        time.sleep(crash_after)
+        raise RuntimeError("boom")
+
+    sys.modules["testapi"] = _fake_testapi()
+    serve._run_worker = fake_worker
+    serve.serve(host="127.0.0.1", port=0, workers=2, threads=2)
+
+
+def _run_master(tmp_path, crash_after, run_for):
+    log_path = tmp_path / "workers.log"
+    proc = multiprocessing.get_context("fork").Process(target=_master, args=(str(log_path), crash_after))
+    proc.start()
+    time.sleep(run_for)
+    os.kill(proc.pid, signal.SIGTERM)
+    proc.join(20)
+    if proc.exitcode is None:
+        proc.kill()
+    pids = [int(line) for line in log_path.read_text().split()]
+    return proc.exitcode, pids
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def test_sigterm_stops_idle_workers(tmp_path):
+    exitcode, pids = _run_master(tmp_path, crash_after=None, run_for=0.5)
+    assert exitcode == 0
+    assert len(pids) == 2
+    assert not [pid for pid in pids if _alive(pid)]
+
+
+def test_crashing_workers_are_restarted_until_shutdown(tmp_path):
+    exitcode, pids = _run_master(tmp_path, crash_after=0.01, run_for=1.0)
+    assert exitcode == 0  # 종료 중에 끝난 워커를 계속 다시 띄우면 마스터가 끝나지 않음
+    assert len(pids) > 2
+    time.sleep(0.2)
+    assert not [pid for pid in pids if _alive(pid)]
+    with open(tmp_path / "workers.log") as f:
+        assert len(f.read().split()) == len(pids)  # 종료 후 새 워커 없음
@@ -0,0 +1,69 @@
+"""
+동영상 분석 트랙 관리: 잠깐 가려진 음식 되살리기, 나뉜 트랙 합치기
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+from video_analysis import VideoAnalyzer, _Track
+
+RICE = {"bbox": [10, 10, 50, 50], "class": 0, "confidence": 0.9}
+KIMCHI = {"bbox": [70, 10, 110, 50], "class": 1, "confidence": 0.6}
+
+
+def _scripted(script):
+    """프레임 순서대로 정해진 탐지 결과를 돌려주는 detect_fn"""
+    calls = iter(script)
+    return lambda frame: [dict(d) for d in next(calls)]
+
+
+def _frames(n):
+    return [np.zeros((72, 128, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def test_occluded_food_is_revived_instead_of_counted_twice():
+    # 김치가 3번 연속(max_misses 초과) 가려졌다가 같은 자리에 다시 나타남
+    script = [[RICE, KIMCHI]] * 2 + [[RICE]] * 3 + [[RICE, KIMCHI]] * 2
+    analyzer = VideoAnalyzer(_scripted(script), detect_every=1, max_misses=2)
+    result = analyzer.analyze(_frames(len(script)))
+
+    items = sorted(result["items"], key=lambda item: item["class"])
+    assert [item["class"] for item in items] == [0, 1]
+    assert [item["hits"] for item in items] == [7, 4]
+    assert (items[1]["first_frame"], items[1]["last_frame"]) == (0, 6)
+    assert items[1]["confidence"] == pytest.approx(0.6)
+    assert result["stats"]["tracks"] == 2
+    assert result["stats"]["detect_calls"] == 7
+
+
+def test_revive_only_matches_same_class():
+    analyzer = VideoAnalyzer(lambda frame: [], max_misses=0)
+    tracks = []
+    next_id = analyzer._associate(tracks, [RICE], 0, 0)
+    next_id = analyzer._associate(tracks, [], 1, next_id)
+    assert tracks[0].misses == 1  # 끊긴 트랙
+
+    # 같은 자리에 다른 음식이 나오면 새 트랙, 같은 음식이면 끊긴 트랙을 되살림
+    next_id = analyzer._associate(tracks, [dict(RICE, **{"class": 2})], 2, next_id)
+    assert len(tracks) == 2
+    analyzer._associate(tracks, [RICE], 3, next_id)
+    assert len(tracks) == 2
+    assert (tracks[0].hits, tracks[0].misses, tracks[0].last_frame) == (2, 0, 3)
+
+
+def test_split_tracks_are_merged():
+    analyzer = VideoAnalyzer(lambda frame: [], iou_match=0.3)
+    moved = dict(RICE, bbox=[12, 12, 52, 52])
+    first = _Track(0, RICE, 0)
+    first.hits, first.last_frame = 3, 4
+    second = _Track(1, moved, 8)
+    second.hits = 2
+    other = _Track(2, dict(moved, **{"class": 1}), 8)
+
+    merged = analyzer._merge_duplicates([second, first, other])
+    assert len(merged) == 2
+    rice = next(t for t in merged if t.cls == 0)
+    assert rice is first  # 많이 탐지된 트랙에 합침
+    assert rice.hits == 5
+    assert rice.conf_sum == pytest.approx(0.9 * 2)  # 각 트랙 생성 시 한 번씩
+    assert (rice.first_frame, rice.last_frame) == (0, 8)
@@ -7,6 +7,11 @@ import tensorflow as tf
 from pathlib import Path
 import yaml
 import shutil
+import time
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat, islice
 from datetime import datetime
 import matplotlib.pyplot as plt
 import torch
@@ -16,121 +21,443 @@ torch.cuda.empty_cache()
 import warnings
 warnings.filterwarnings('ignore', category=UserWarning)
 
+from dataset_utils import (
+    MANIFEST_NAME, INDEX_NAME, LINK_MODES, ImageIndex, process_image, resize_image, materialize,
+    default_num_workers, file_hash, assign_split, load_manifest, save_manifest, remove_outputs,
+    PHASH_CACHE_NAME, BKTree, image_phash, output_name, load_phash_cache, save_phash_cache,
+)
+from dataset_shards import write_shards, resolve_data_yaml
+from inference_backend import boxes_to_detections, load_model, predict_images, batch_capacity
+from detection_cache import model_checksum
+from inference_worker import InferenceClient
+from nutrition_table import load_nutrition_table, class_nutrient_matrix, names_by_id
+from food_matcher import resolve_aliases
+from video_analysis import VideoAnalyzer
+
+RESIZED_CACHE_SOURCE = 'source.json'  # 캐시를 만들 때의 원본 데이터셋 매니페스트 해시
+
+
+def resized_cache_dir(dataset_dir, imgsz):
+    return Path(dataset_dir) / f'cache_{imgsz}'
+
+
+def _manifest_signature(dataset_dir):
+    manifest_path = Path(dataset_dir) / MANIFEST_NAME
+    return file_hash(manifest_path) if manifest_path.exists() else None
+
+
+def resized_cache_yaml(dataset_dir, imgsz):
+    """
+    dataset_dir의 현재 내용으로 만든 축소 캐시가 있으면 그 dataset.yaml 경로, 없거나 오래됐으면 None
+    (prepare_yolo_dataset으로 이미지가 추가/삭제되면 매니페스트가 바뀌므로 캐시는 다시 만들어야 함)
+    """
+    cache_dir = resized_cache_dir(dataset_dir, imgsz)
+    cached_yaml = cache_dir / 'dataset.yaml'
+    source_path = cache_dir / RESIZED_CACHE_SOURCE
+    if not cached_yaml.exists():
+        return None
+    current = _manifest_signature(dataset_dir)
+    try:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            recorded = json.load(f).get('manifest')
+    except (OSError, ValueError):
+        recorded = None
+    if current is None or recorded != current:
+        print(f"Warning: resized cache {cache_dir} does not match the current dataset, "
+              f"using original images (run build_resized_cache to refresh it)")
+        return None
+    return cached_yaml
+
 class DatasetPreparator:
-    def __init__(self, data_dir, output_dir):
+    def __init__(self, data_dir, output_dir, num_workers=1, link_mode='copy'):
         self.data_dir = Path(data_dir)
         self.output_dir = Path(output_dir)
+        # 1이면 순차 처리, None이면 CPU 코어 수에 맞춰 프로세스 풀 사용
+        self.num_workers = default_num_workers() if num_workers is None else max(1, num_workers)
+        # 'copy', 'hardlink', 'symlink', 'reflink' (지원되지 않으면 copy로 대체)
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"link_mode must be one of {LINK_MODES}, got {link_mode!r}")
+        self.link_mode = link_mode
         self.class_names = self._get_class_names()
         
     def _get_class_names(self):
         return sorted([folder.name for folder in self.data_dir.iterdir() if folder.is_dir()])
     
-    def prepare_yolo_dataset(self, train_ratio=0.8):
+    def prepare_yolo_dataset(self, train_ratio=0.8, incremental=False, dedup=False, dedup_distance=4):
         # YOLO 데이터셋 구조 생성
         train_dir = self.output_dir / 'train'
         val_dir = self.output_dir / 'val'    # 'val'로 수정 (validation의 약자)
+        manifest_path = self.output_dir / MANIFEST_NAME
+
+        # 증분 모드: 이전 실행의 매니페스트가 현재 설정과 맞을 때만 재사용
+        old_manifest = load_manifest(manifest_path) if incremental else None
+        if old_manifest is not None and (old_manifest['class_names'] != self.class_names
+                                         or old_manifest['train_ratio'] != train_ratio
+                                         or old_manifest.get('link_mode', 'copy') != self.link_mode):
+            print("Class list, train ratio or link mode changed, rebuilding the whole dataset...")
+            old_manifest = None
+
+        # 이미지 목록 수집 (캐시가 output_dir에 있으므로 삭제 전에 수행)
+        file_index = self.index_images()
+        phash_cache = load_phash_cache(self.output_dir / PHASH_CACHE_NAME) if dedup else None
 
         # 기존 디렉토리 삭제 후 새로 생성
-        if self.output_dir.exists():
+        if old_manifest is None and self.output_dir.exists():
             shutil.rmtree(self.output_dir)
 
         for d in [train_dir / 'images', train_dir / 'labels',
                 val_dir / 'images', val_dir / 'labels']:
             d.mkdir(parents=True, exist_ok=True)
 
-            for d in [train_dir / 'images', train_dir / 'labels',
-                    val_dir / 'images', val_dir / 'labels']:
-                d.mkdir(parents=True, exist_ok=True)
+        # 클래스별 데이터 처리 (num_workers > 1이면 프로세스 풀 하나를 모든 클래스에 재사용)
+        old_entries = old_manifest['images'] if old_manifest is not None else None
+        old_failed = old_manifest.get('failed', {}) if old_manifest is not None else None
+        entries = {}
+        failed = {}
+        pool = ProcessPoolExecutor(max_workers=self.num_workers) if self.num_workers > 1 else nullcontext()
+        with pool as executor:
+            if dedup:
+                file_index = self.deduplicate(file_index, dedup_distance, executor, phash_cache)
+                save_phash_cache(self.output_dir / PHASH_CACHE_NAME, phash_cache)
+            for idx, class_name in enumerate(self.class_names):
+                class_entries, class_failed = self._prepare_class(idx, class_name, file_index[class_name],
+                                                                  train_dir, val_dir, train_ratio, executor,
+                                                                  old_entries, old_failed)
+                entries.update(class_entries)
+                failed.update(class_failed)
+
+        # 다음 실행을 위해 매니페스트와 파일 인덱스 저장 (전체 생성 시에도 저장)
+        # 처리에 실패한 이미지도 기록해서 파일이 바뀌기 전까지는 다시 시도하지 않음
+        save_manifest(manifest_path, self.class_names, train_ratio, entries, self.link_mode, failed)
+        self.image_index.save()
 
-            # 클래스별 데이터 처리
-        for idx, class_name in enumerate(self.class_names):
-            print(f"Processing {class_name}...")
-            class_dir = self.data_dir / class_name
+        # yaml 파일 생성
+        self._create_yaml_file()
+        
+        print("Dataset preparation completed!")
 
-            # 이미지 파일 찾기 (대소문자 구분 없이, 재귀적 탐색)
-            images = []
-            for ext in ['.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG']:
-                images.extend(list(class_dir.rglob(f'*{ext}')))  # rglob으로 변경하여 재귀적 탐색
+    def index_images(self, use_cache=True):
+        """
+        클래스별 이미지 파일 목록을 한 번의 scandir 순회로 수집
+        (디렉토리 mtime 기반 캐시는 output_dir/file_index.json에 저장)
 
-            if not images:
-                print(f"Warning: No images found in {class_dir}")
-                continue
-                
-            # 이미지 경로 확인
-            valid_images = []
+        Returns:
+            dict: {클래스명: [이미지 경로]}
+        """
+        self.image_index = ImageIndex(self.output_dir / INDEX_NAME if use_cache else None)
+        class_dirs = [self.data_dir / class_name for class_name in self.class_names]
+        self.image_index.prune(class_dirs)
+
+        file_index = {}
+        for class_name, class_dir in zip(self.class_names, class_dirs):
+            file_index[class_name] = self.image_index.scan(class_dir)
+            stats = self.image_index.stats[os.fspath(class_dir)]
+            print(f"Indexed {class_name}: {stats['files']} images in {stats['seconds'] * 1000:.1f}ms "
+                  f"({stats['dirs_listed']} dirs listed, {stats['dirs_cached']} from cache)")
+        return file_index
+
+    def deduplicate(self, file_index, max_distance=4, executor=None, phash_cache=None):
+        """
+        perceptual hash로 클래스 안의 거의 같은 사진을 제거
+        - 해시는 프로세스 풀에서 병렬 계산, (크기, mtime)이 같으면 캐시 재사용
+        - BK-tree로 해밍 거리 max_distance 이내인 이미지를 찾음 (전체 쌍 비교 없음)
+        - 정렬 순서상 먼저 나온 이미지를 남기고 나머지는 제외
+
+        Returns:
+            dict: 중복이 제거된 {클래스명: [이미지 경로]}
+        """
+        phash_cache = {} if phash_cache is None else phash_cache
+        deduped = {}
+        total_dropped = total_bytes = 0
+        start = time.perf_counter()
+
+        for class_name, images in file_index.items():
+            stats = {}
+            hashes = {}
+            todo = []
             for img_path in images:
-                if os.path.exists(img_path):
-                    valid_images.append(img_path)
+                rel = self._rel_path(img_path)
+                st = img_path.stat()
+                stats[img_path] = st.st_size
+                cached = phash_cache.get(rel)
+                if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                    hashes[img_path] = cached[2]
                 else:
-                    print(f"Warning: Image not found: {img_path}")
+                    todo.append((img_path, rel, st))
+
+            paths = [img_path for img_path, _, _ in todo]
+            results = executor.map(image_phash, paths, chunksize=64) if executor else map(image_phash, paths)
+            for (img_path, rel, st), (_, value) in zip(todo, results):
+                hashes[img_path] = value
+                phash_cache[rel] = [st.st_size, st.st_mtime_ns, value]
+
+            tree = BKTree()
+            kept = []
+            dropped = dropped_bytes = 0
+            for img_path in images:
+                value = hashes[img_path]
+                if value is None:  # 해시 계산 실패는 이후 처리 단계에서 경고
+                    kept.append(img_path)
+                    continue
+                if tree.search(value, max_distance):
+                    dropped += 1
+                    dropped_bytes += stats[img_path]
+                    continue
+                tree.add(value, img_path)
+                kept.append(img_path)
+
+            deduped[class_name] = kept
+            total_dropped += dropped
+            total_bytes += dropped_bytes
+            if dropped:
+                print(f"  {class_name}: dropped {dropped} near-duplicates ({dropped_bytes / 1e6:.1f} MB)")
+
+        print(f"Deduplication: dropped {total_dropped} images, saved {total_bytes / 1e6:.1f} MB "
+              f"in {time.perf_counter() - start:.2f}s")
+        return deduped
+
+    def _prepare_class(self, idx, class_name, valid_images, train_dir, val_dir, train_ratio,
+                       executor=None, old_entries=None, old_failed=None):
+        print(f"Processing {class_name}...")
+        class_dir = self.data_dir / class_name
+        split_dirs = {'train': train_dir, 'val': val_dir}
 
+        if not valid_images:
+            print(f"Warning: No images found in {class_dir}")
+
+        if old_entries is None:
             # 이미지 셔플
             np.random.shuffle(valid_images)
             split_idx = int(len(valid_images) * train_ratio)
 
             # 학습/검증 데이터 분할
-            train_images = valid_images[:split_idx]
-            val_images = valid_images[split_idx:]
+            todo = {'train': valid_images[:split_idx], 'val': valid_images[split_idx:]}
+            entries, failed = {}, {}
+        else:
+            todo, entries, failed = self._plan_incremental(idx, valid_images, split_dirs, train_ratio,
+                                                           old_entries, old_failed or {})
 
-            # 이미지 처리
-            self._process_image_set(train_images, train_dir, idx)
-            self._process_image_set(val_images, val_dir, idx)
+        # 이미지 처리 + 클래스별 처리 속도 출력
+        start = time.perf_counter()
+        processed = 0
+        for split, images in todo.items():
+            done, errors = self._process_image_set(images, split_dirs[split], idx, executor)
+            for img_path, record in done:
+                record.update(split=split, class_idx=idx)
+                entries[self._rel_path(img_path)] = record
+                processed += 1
+            for img_path in errors:
+                try:
+                    st = img_path.stat()
+                except OSError:
+                    continue
+                failed[self._rel_path(img_path)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'class_idx': idx}
+        elapsed = time.perf_counter() - start
+        total = sum(len(images) for images in todo.values())
+        print(f"  {class_name}: {processed}/{total} images in {elapsed:.2f}s "
+              f"({processed / max(elapsed, 1e-9):.1f} img/s), {len(entries)} in dataset")
+        return entries, failed
 
-        # yaml 파일 생성
-        self._create_yaml_file()
-        
-        print("Dataset preparation completed!")
-        
-    def _process_image_set(self, images, output_dir, class_idx):
+    def _rel_path(self, img_path):
+        return Path(img_path).relative_to(self.data_dir).as_posix()
+
+    def _plan_incremental(self, idx, images, split_dirs, train_ratio, old_entries, old_failed):
+        """
+        매니페스트와 비교해서 새로 처리할 이미지(todo)와 그대로 둘 이미지(entries)를 나눔
+        - 크기/수정시각이 같으면 변경 없음, 다르면 해시로 내용 변경 여부 확인
+        - 기존 이미지는 이전 분할(train/val)을 그대로 유지
+        - 다시 처리할 이미지는 처리 전에 이전 결과를 삭제 (처리에 실패해도 이전 분할에 남지 않도록)
+        - 원본에서 삭제된 이미지는 데이터셋에서도 삭제
+        - 이전에 처리에 실패한 이미지는 크기/수정시각이 바뀔 때까지 다시 시도하지 않음
+
+        Returns:
+            tuple: (분할별 처리할 이미지, 그대로 둘 매니페스트 레코드, 계속 실패로 기록할 이미지)
+        """
+        todo = {'train': [], 'val': []}
+        entries = {}
+        failed = {}
+        seen = set()
         for img_path in images:
-            try:
-                # 이미지 복사
-                shutil.copy2(img_path, output_dir / 'images' / img_path.name)
+            rel = self._rel_path(img_path)
+            seen.add(rel)
+            st = img_path.stat()
+            bad = old_failed.get(rel)
+            if (bad is not None and bad['class_idx'] == idx
+                    and bad['size'] == st.st_size and bad['mtime_ns'] == st.st_mtime_ns):
+                failed[rel] = bad
+                continue
+            old = old_entries.get(rel)
+            if old is None or old['class_idx'] != idx:
+                todo[assign_split(rel, train_ratio)].append(img_path)
+                continue
 
-                # 이미지 읽기
-                img = cv2.imread(str(img_path))
-                if img is None:
-                    print(f"Warning: Could not read image {img_path}")
-                    continue
-                    
-                h, w = img.shape[:2]
+            split_dir = split_dirs[old['split']]
+            unchanged = st.st_size == old['size'] and st.st_mtime_ns == old['mtime_ns']
+            if (not unchanged and old['hash'] is not None and st.st_size == old['size']
+                    and file_hash(img_path) == old['hash']):
+                # 내용은 같고 수정시각만 바뀐 경우
+                old = dict(old, mtime_ns=st.st_mtime_ns)
+                unchanged = True
+            if unchanged and (split_dir / 'images' / old['name']).exists():
+                entries[rel] = old
+            else:
+                remove_outputs(split_dir, old['name'])
+                todo[old['split']].append(img_path)
 
-                # YOLO 포맷의 바운딩 박스 생성 (전체 이미지)
-                label_content = f"{class_idx} 0.5 0.5 1.0 1.0"
+        removed = 0
+        for rel, old in old_entries.items():
+            if old['class_idx'] == idx and rel not in seen:
+                remove_outputs(split_dirs[old['split']], old['name'])
+                removed += 1
 
-                # 레이블 파일 저장
-                label_path = output_dir / 'labels' / (img_path.stem + '.txt')
-                with open(label_path, 'w') as f:
-                    f.write(label_content)
+        print(f"  unchanged: {len(entries)}, to process: {len(todo['train']) + len(todo['val'])}, "
+              f"removed: {removed}, skipped (failed before): {len(failed)}")
+        return todo, entries, failed
+        
+    def _process_image_set(self, images, output_dir, class_idx, executor=None):
+        # YOLO 포맷의 바운딩 박스 생성 (전체 이미지) - 클래스마다 한 번만 생성
+        label_content = f"{class_idx} 0.5 0.5 1.0 1.0"
 
-            except Exception as e:
-                print(f"Error processing {img_path}: {str(e)}")
-                continue
+        # 원본 상대 경로 기반 이름으로 저장 (같은 파일 이름끼리 덮어쓰지 않도록)
+        names = [output_name(self._rel_path(img_path)) for img_path in images]
+        if executor is None:
+            results = map(process_image, images, repeat(output_dir), repeat(label_content),
+                          repeat(self.link_mode), names)
+        else:
+            results = executor.map(process_image, images, repeat(output_dir), repeat(label_content),
+                                   repeat(self.link_mode), names, chunksize=64)
+
+        # 성공한 이미지의 (경로, 매니페스트 레코드) 목록과 실패한 이미지 경로 목록을 반환
+        processed = []
+        failed = []
+        fallbacks = 0
+        for img_path, ok, message, record in results:
+            if ok:
+                processed.append((img_path, record))
+                fallbacks += record['link'] != self.link_mode
+            else:
+                print(message)
+                failed.append(img_path)
+        if fallbacks:
+            print(f"Warning: {self.link_mode} not supported for {fallbacks} images in {output_dir}, copied instead")
+        return processed, failed
     
-    def _create_yaml_file(self):
+    def _create_yaml_file(self, dataset_dir=None):
+        dataset_dir = Path(dataset_dir) if dataset_dir else self.output_dir
         yaml_content = {
-            'path': str(self.output_dir.absolute()),  # 절대 경로 사용
-            'train': str(self.output_dir / 'train' / 'images'),  # 전체 경로 지정
-            'val': str(self.output_dir / 'val' / 'images'),      # 전체 경로 지정
+            'path': str(dataset_dir.absolute()),  # 절대 경로 사용
+            'train': str(dataset_dir / 'train' / 'images'),  # 전체 경로 지정
+            'val': str(dataset_dir / 'val' / 'images'),      # 전체 경로 지정
             'names': {i: name for i, name in enumerate(self.class_names)}
         }
 
-        yaml_path = self.output_dir / 'dataset.yaml'
+        yaml_path = dataset_dir / 'dataset.yaml'
         with open(yaml_path, 'w') as f:
             yaml.dump(yaml_content, f, default_flow_style=False)
 
         return str(yaml_path)  # yaml 파일의 경로 반환
 
+    def build_resized_cache(self, imgsz=320, quality=90):
+        """
+        학습 해상도로 미리 축소한 이미지 캐시 생성 (output_dir/cache_{imgsz})
+        매 epoch마다 원본 고해상도 사진을 디코딩하지 않도록 함
+        원본이 바뀐 이미지만 다시 만들고, 사라진 이미지는 캐시에서도 삭제
+
+        Returns:
+            str: 캐시용 dataset.yaml 경로
+        """
+        cache_dir = resized_cache_dir(self.output_dir, imgsz)
+        start = time.perf_counter()
+        created = skipped = 0
+        # 만들기 시작할 때의 매니페스트 기준 (도중에 데이터셋이 바뀌면 train에서 오래된 캐시로 판단)
+        source = {'manifest': _manifest_signature(self.output_dir), 'imgsz': imgsz}
+        (cache_dir / RESIZED_CACHE_SOURCE).unlink(missing_ok=True)
+
+        pool = ProcessPoolExecutor(max_workers=self.num_workers) if self.num_workers > 1 else nullcontext()
+        with pool as executor:
+            for split in ('train', 'val'):
+                src_images = self.output_dir / split / 'images'
+                src_labels = self.output_dir / split / 'labels'
+                dst_images = cache_dir / split / 'images'
+                dst_labels = cache_dir / split / 'labels'
+                dst_images.mkdir(parents=True, exist_ok=True)
+                dst_labels.mkdir(parents=True, exist_ok=True)
+
+                images = sorted(p for p in src_images.iterdir() if p.is_file())
+                targets = [dst_images / (p.stem + '.jpg') for p in images]
+                if executor is None:
+                    results = map(resize_image, images, targets, repeat(imgsz), repeat(quality))
+                else:
+                    results = executor.map(resize_image, images, targets, repeat(imgsz), repeat(quality),
+                                           chunksize=64)
+
+                keep = set()
+                for img_path, ok, message, was_created in results:
+                    if not ok:
+                        print(message)
+                        continue
+                    keep.add(img_path.stem)
+                    created += was_created
+                    skipped += not was_created
+                    label_path = src_labels / (img_path.stem + '.txt')
+                    if label_path.exists():
+                        materialize(label_path, dst_labels / label_path.name, 'hardlink')
+
+                # 원본 데이터셋에서 사라진 이미지는 캐시에서도 삭제
+                for stale in dst_images.iterdir():
+                    if stale.stem not in keep:
+                        remove_outputs(cache_dir / split, stale.name)
+
+        yaml_path = self._create_yaml_file(cache_dir)
+        with open(cache_dir / RESIZED_CACHE_SOURCE, 'w', encoding='utf-8') as f:
+            json.dump(source, f)
+        print(f"Resized cache ({imgsz}px): {created} created, {skipped} up to date "
+              f"in {time.perf_counter() - start:.2f}s")
+        return yaml_path
+
+    def write_shards(self, shard_dir=None, max_shard_bytes=1 << 30):
+        # 준비된 데이터셋을 큰 tar 샤드로 묶음 (FoodDetector.train에 샤드 경로를 그대로 넘길 수 있음)
+        shard_dir = Path(shard_dir) if shard_dir else self.output_dir.parent / (self.output_dir.name + '_shards')
+        return write_shards(self.output_dir, shard_dir, max_shard_bytes)
+
 class FoodDetector:
-    def __init__(self, model_path=None):
-        if model_path:
-            self.model = YOLO(model_path)
+    def __init__(self, model_path=None, backend='torch', num_threads=None, imgsz=640, cache=None,
+                 worker_socket=None):
+        # backend: 'torch' 또는 CPU 추론용 'onnx', 'openvino' (학습된 best.pt를 한 번 내보내서 캐시)
+        # ONNX/OpenVINO 모델은 추론 전용이므로 train()은 torch 백엔드에서만 사용
+        # worker_socket: 공용 추론 워커(inference_worker.py) 소켓. 지정하면 가중치를 직접 로드하지 않음
+        self.client = InferenceClient(worker_socket) if worker_socket else None
+        if self.client is not None:
+            self.model = None
+        elif model_path:
+            self.model = load_model(model_path, backend, num_threads, imgsz)
         else:
             self.model = YOLO('yolov8x.pt')
+        # cache: detection_cache.DetectionCache (같은 사진을 다시 분석하지 않도록)
+        self.cache = cache
+        if self.client is not None:
+            self.model_id = self.client.model_id
+        else:
+            self.model_id = f"{model_checksum(model_path or 'yolov8x.pt')}:{backend}"
+        # 캐시 키에 결과 형식을 넣음 (같은 model_id로 다른 형식을 저장하는 camera.py 등과 섞이지 않게)
+        self.cache_params = {'view': 'detections', 'imgsz': imgsz}
     
-    def train(self, data_yaml, epochs=100, batch_size=16, imgsz=320):
+    def train(self, data_yaml, epochs=100, batch_size=16, imgsz=320, shard_cache_dir=None,
+              use_resized_cache=True):
         print("Starting model training...")
+        if self.client is not None:
+            print("Training error: not available in inference worker client mode")
+            return None
         try:
+            # 샤드 디렉토리(shards.json)를 넘기면 로컬 디스크에 풀어서 사용
+            data_yaml = resolve_data_yaml(data_yaml, shard_cache_dir)
+
+            # 같은 imgsz로 미리 축소해 둔 캐시가 현재 데이터셋과 같을 때만 그걸로 학습
+            cached_yaml = resized_cache_yaml(Path(data_yaml).parent, imgsz) if use_resized_cache else None
+            if cached_yaml is not None:
+                print(f"Using resized image cache: {cached_yaml.parent}")
+                data_yaml = cached_yaml
+
             results = self.model.train(
                 data=str(Path(data_yaml).absolute()),  # 절대 경로 사용
                 epochs=epochs,
@@ -140,41 +467,200 @@ class FoodDetector:
                 device=0,
                 amp=True
             )
+            # 학습으로 가중치가 바뀌었으므로 캐시 키도 새 가중치 기준으로 변경
+            best = getattr(getattr(self.model, 'trainer', None), 'best', None)
+            if best and Path(best).exists():
+                self.model_id = f"{model_checksum(best)}:torch"
             return results
         except Exception as e:
             print(f"Training error: {e}")
             return None
         
     def detect_foods(self, image_path):
-        results = self.model.predict(image_path)
+        if self.cache is None:
+            return self._detect(image_path)
+
+        # 파일 경로면 파일 내용, 배열이면 픽셀 버퍼로 캐시 키 생성
+        if isinstance(image_path, (str, os.PathLike)):
+            image = Path(image_path).read_bytes()
+        else:
+            image = image_path
+        return self.cache.get_or_compute(image, self.model_id, self.cache_params, lambda: self._detect(image_path))
+
+    def _detect(self, image_path, **predict_kwargs):
+        if self.client is not None:
+            # 워커에는 픽셀 배열을 공유 메모리로 전달 (ultralytics와 같은 BGR)
+            if isinstance(image_path, (str, os.PathLike)):
+                image = cv2.imread(str(image_path))
+                if image is None:
+                    raise FileNotFoundError(f"Could not read image {image_path}")
+            else:
+                image = image_path
+            predict_kwargs.pop('verbose', None)
+            return self.client.predict(image, **predict_kwargs)
+
+        # load_model의 imgsz로 추론 (내보낸 모델은 입력 크기가 고정)
+        results = predict_images(self.model, [image_path], **predict_kwargs)
         
         detections = []
         for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                b = box.xyxy[0]  # 바운딩 박스 좌표
-                c = box.cls  # 클래스
-                conf = box.conf  # 신뢰도
-                detections.append({
-                    'bbox': b.tolist(),
-                    'class': c.item(),
-                    'confidence': conf.item()
-                })
+            detections.extend(boxes_to_detections(r.boxes))
         
         return detections
 
+    def detect_foods_batch(self, sources, batch_size=16, **predict_kwargs):
+        """
+        여러 이미지를 batch_size 단위로 묶어서 탐지하는 제너레이터
+
+        Args:
+            sources (iterable): 이미지 경로 또는 numpy 배열(BGR)의 리스트/이터레이터
+                (한 번의 호출에서는 한 종류만 사용)
+            batch_size (int): model.predict 한 번에 넣을 이미지 수
+                (정적 batch로 내보낸 onnx/openvino 모델은 그 한도로 줄어듦)
+            **predict_kwargs: model.predict에 그대로 전달 (conf, imgsz 등)
+
+        Yields:
+            tuple: (입력 source, detect_foods와 같은 형식의 탐지 결과 리스트)
+
+        Raises:
+            RuntimeError: 배치 추론이 실패한 경우 (몇 번째 이미지부터인지 포함, 빈 결과로 넘어가지 않음)
+        """
+        predict_kwargs.setdefault('verbose', False)
+        if self.client is not None:
+            # 워커 모드에서는 워커가 요청을 순서대로 처리하므로 한 장씩 전송
+            for source in sources:
+                yield source, self._detect(source, **predict_kwargs)
+            return
+
+        sources = iter(sources)
+        batch_size = batch_capacity(self.model, batch_size)
+        start = 0
+        while True:
+            batch = list(islice(sources, batch_size))
+            if not batch:
+                return
+            try:
+                results = predict_images(self.model, batch, **predict_kwargs)
+            except Exception as e:
+                raise RuntimeError(f"detection failed for images {start}-{start + len(batch) - 1}: {e}") from e
+            for source, r in zip(batch, results):
+                yield source, boxes_to_detections(r.boxes)
+            start += len(batch)
+
+    def detect_video(self, source, detect_every=10, max_frames=None, **predict_kwargs):
+        """
+        동영상 전체에서 식사 음식 목록 탐지
+        detect_every 프레임마다(또는 장면 전환 시)만 탐지하고 사이 프레임은 광류로 박스를 추적
+
+        Args:
+            source: 동영상 파일 경로, 카메라 번호, CameraStream 또는 BGR 프레임 이터러블
+            detect_every (int): 전체 탐지 간격 (프레임)
+            max_frames (int): 처리할 최대 프레임 수
+            **predict_kwargs: model.predict에 그대로 전달 (conf, imgsz 등)
+
+        Returns:
+            dict: {'items': 여러 번 확인된 음식 트랙 목록 (detect_foods 형식 + hits 등),
+                   'stats': 프레임 수, 탐지 호출/생략 수, 실제 FPS 등}
+        """
+        predict_kwargs.setdefault('verbose', False)
+        analyzer = VideoAnalyzer(lambda frame: self._detect(frame, **predict_kwargs), detect_every=detect_every)
+        return analyzer.analyze(source, max_frames)
+
 class NutritionAnalyzer:
+    # total_nutrition 키 -> 영양 데이터 표 컬럼
+    TOTAL_COLUMNS = {
+        'calories': 'Calories',
+        'protein': 'Protein',
+        'fat': 'Fat',
+        'carbs': 'Carbs'
+    }
+
     def __init__(self, nutrition_file):
-        self.nutrition_data = self._load_nutrition_data(nutrition_file)
+        self.nutrition_file = nutrition_file
+        self.nutrition_table = self._load_nutrition_data(nutrition_file)
+        self.nutrition_data = self.nutrition_table.to_dict('index')
+        self._aliases = {}  # {클래스 이름 튜플: {클래스 이름: 식품명}}
     
     def _load_nutrition_data(self, nutrition_file):
         try:
-            df = pd.read_excel(nutrition_file)
-            df = df.groupby('식품명').first().reset_index()
-            return df.set_index('식품명').to_dict('index')
+            # 컬럼 이름 변환/중복 제거는 변환된 표를 만들 때 한 번만 수행됨
+            return load_nutrition_table(nutrition_file)
         except Exception as e:
             print(f"Error loading nutrition data: {e}")
-            return {}
+            return pd.DataFrame(columns=list(self.TOTAL_COLUMNS.values()))
+
+    def food_aliases(self, class_names):
+        """
+        클래스 이름 -> 영양 데이터 식품명 (정확히 같지 않으면 유사 매칭, 결과는 별칭 파일에 저장되어 재사용됨)
+        """
+        names = names_by_id(class_names)
+        if names not in self._aliases:
+            self._aliases[names] = resolve_aliases(self.nutrition_table.index, names, self.nutrition_file)
+        return self._aliases[names]
+
+    def nutrient_matrix(self, class_names):
+        """
+        클래스 id 순서로 정렬된 영양소 행렬 (클래스 목록별로 한 번만 생성)
+
+        Args:
+            class_names (list | dict): 클래스 id -> 음식 이름
+
+        Returns:
+            tuple: ([n_classes, n_nutrients] float64 행렬 (열 순서는 TOTAL_COLUMNS),
+                    영양 데이터에 있는 클래스인지 나타내는 bool 배열)
+        """
+        matrix, matched = class_nutrient_matrix(self.nutrition_table, class_names,
+                                                list(self.TOTAL_COLUMNS.values()), self.food_aliases(class_names))
+        return matrix[:-1], matched
+
+    @staticmethod
+    def flatten_meals(meals):
+        """
+        식사별 탐지 결과 리스트를 analyze_meals 입력 형식으로 변환
+
+        Args:
+            meals (list): [[{'class': ..., ...}, ...], ...] 식사별 탐지 결과
+
+        Returns:
+            tuple: (모든 탐지의 클래스 id 배열, 식사 경계 offsets (길이 식사 수 + 1))
+        """
+        counts = np.fromiter((len(m) for m in meals), dtype=np.int64, count=len(meals))
+        offsets = np.zeros(len(meals) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        class_ids = np.fromiter((int(d['class']) for m in meals for d in m), dtype=np.int64,
+                                count=int(offsets[-1]))
+        return class_ids, offsets
+
+    def analyze_meals(self, class_ids, meal_offsets, class_names):
+        """
+        여러 식사의 영양소 합계를 한 번에 계산 (대량의 과거 탐지 기록 집계용)
+
+        Args:
+            class_ids (array-like): 모든 식사의 탐지 클래스 id를 이어 붙인 1차원 배열
+            meal_offsets (array-like): 식사 i의 탐지는 class_ids[meal_offsets[i]:meal_offsets[i + 1]]
+            class_names (list | dict): 클래스 id -> 음식 이름
+
+        Returns:
+            pd.DataFrame: 식사별 calories/protein/fat/carbs 합계, 음식 수(dishes),
+                          영양 데이터에 없는 음식 수(unmatched)
+        """
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        meal_offsets = np.asarray(meal_offsets, dtype=np.int64)
+        n_meals = len(meal_offsets) - 1
+        matrix, matched = self.nutrient_matrix(class_names)
+
+        # 탐지마다 속한 식사 번호
+        dishes = np.diff(meal_offsets)
+        meal_ids = np.repeat(np.arange(n_meals), dishes)
+        values = matrix[class_ids[meal_offsets[0]:meal_offsets[-1]]]  # [n_detections, n_nutrients]
+
+        result = pd.DataFrame({
+            key: np.bincount(meal_ids, weights=values[:, j], minlength=n_meals)
+            for j, key in enumerate(self.TOTAL_COLUMNS)
+        })
+        result['dishes'] = dishes
+        result['unmatched'] = np.bincount(meal_ids, weights=~matched[class_ids[meal_offsets[0]:meal_offsets[-1]]], minlength=n_meals).astype(np.int64)
+        return result
     
     def analyze_meal(self, detections, class_names):
         meal_analysis = {
@@ -187,9 +673,10 @@ class NutritionAnalyzer:
             }
         }
         
+        aliases = self.food_aliases(class_names)
         for det in detections:
             food_name = class_names[int(det['class'])]
-            nutrition = self.nutrition_data.get(food_name, {})
+            nutrition = self.nutrition_data.get(aliases.get(food_name, food_name), {})
             
             meal_analysis['dishes'].append({
                 'name': food_name,
@@ -198,8 +685,8 @@ class NutritionAnalyzer:
             })
             
             # 영양정보 합산
-            for key in meal_analysis['total_nutrition']:
-                meal_analysis['total_nutrition'][key] += nutrition.get(key, 0)
+            for key, column in self.TOTAL_COLUMNS.items():
+                meal_analysis['total_nutrition'][key] += nutrition.get(column, 0)
         
         return meal_analysis
 
@@ -254,11 +741,13 @@ def main():
     DATA_DIR = os.path.join(BASE_DIR, "Food")
     OUTPUT_DIR = os.path.join(BASE_DIR, "yolo_dataset")
     NUTRITION_FILE = os.path.join(BASE_DIR, "FDDB.xlsx")
+    IMG_SIZE = 320
     
     # 1. 데이터셋 준비
     print("=== Preparing Dataset ===")
     preparator = DatasetPreparator(DATA_DIR, OUTPUT_DIR)
     preparator.prepare_yolo_dataset()
+    preparator.build_resized_cache(imgsz=IMG_SIZE)  # 학습 해상도로 미리 축소
     
     # 2. 모델 학습
     print("\n=== Training Model ===")
@@ -267,7 +756,7 @@ def main():
         str(Path(OUTPUT_DIR) / 'dataset.yaml'),
         epochs=1,
         batch_size=8,
-        imgsz=320
+        imgsz=IMG_SIZE
     )
     
     # 3. 영양분석기 초기화
@@ -0,0 +1,285 @@
+"""
+동영상/실시간 스트림 식사 분석
+
+모든 프레임에 YOLO를 돌리는 대신
+- N 프레임마다 또는 장면이 크게 바뀌었을 때만 전체 탐지를 실행하고
+- 그 사이 프레임에서는 Lucas-Kanade 광류로 박스를 따라가며
+- 탐지 결과를 트랙 단위로 묶어 여러 번 확인된 음식만 최종 식사 목록으로 만듦
+"""
+import time
+import argparse
+import numpy as np
+import cv2
+
+
+def _iou_matrix(a, b):
+    """a: [N, 4], b: [M, 4] (x1, y1, x2, y2) -> [N, M] IoU"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class _Track:
+    __slots__ = ('track_id', 'cls', 'bbox', 'conf_sum', 'hits', 'misses', 'points', 'first_frame', 'last_frame')
+
+    def __init__(self, track_id, det, frame_idx):
+        self.track_id = track_id
+        self.cls = int(det['class'])
+        self.bbox = np.asarray(det['bbox'], dtype=np.float32)
+        self.conf_sum = float(det['confidence'])
+        self.hits = 1
+        self.misses = 0
+        self.points = None  # 광류 추적용 특징점 (축소된 회색 영상 좌표)
+        self.first_frame = self.last_frame = frame_idx
+
+
+class VideoAnalyzer:
+    def __init__(self, detect_fn, detect_every=10, scene_threshold=0.12, min_hits=2,
+                 iou_match=0.3, max_misses=2, track_width=640):
+        """
+        :param detect_fn: BGR 프레임 -> [{'bbox', 'class', 'confidence'}] (boxes_to_detections 형식)
+        :param detect_every: 전체 탐지 간격 (프레임)
+        :param scene_threshold: 마지막 탐지 프레임과의 평균 밝기 차이(0~1)가 이보다 크면 바로 탐지
+        :param min_hits: 최종 목록에 넣기 위해 필요한 탐지 횟수
+        :param iou_match: 탐지와 트랙을 같은 음식으로 볼 최소 IoU
+        :param max_misses: 연속으로 이만큼 탐지되지 않으면 트랙 종료
+        :param track_width: 광류 계산용으로 축소할 가로 크기
+        """
+        self.detect_fn = detect_fn
+        self.detect_every = max(1, detect_every)
+        self.scene_threshold = scene_threshold
+        self.min_hits = min_hits
+        self.iou_match = iou_match
+        self.max_misses = max_misses
+        self.track_width = track_width
+
+    @staticmethod
+    def _frames(source):
+        # 동영상 경로/카메라 번호, CameraStream, 프레임 이터러블 모두 지원
+        if isinstance(source, (str, int)):
+            cap = cv2.VideoCapture(source)
+            if not cap.isOpened():
+                raise RuntimeError(f"could not open video source {source!r}")
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        return
+                    yield frame
+            finally:
+                cap.release()
+        elif hasattr(source, 'frames'):
+            for _, _, frame in source.frames():
+                yield frame
+        else:
+            yield from source
+
+    def _seed_points(self, track, gray, scale):
+        h, w = gray.shape
+        x1, y1, x2, y2 = (track.bbox * scale).astype(int)
+        x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, w), min(y2, h)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            track.points = None
+            return
+        mask = np.zeros_like(gray)
+        mask[y1:y2, x1:x2] = 255
+        track.points = cv2.goodFeaturesToTrack(gray, maxCorners=20, qualityLevel=0.01, minDistance=5, mask=mask)
+
+    def _track_flow(self, tracks, prev_gray, gray, scale):
+        # 모든 트랙의 특징점을 한 번에 광류 계산
+        tracks = [t for t in tracks if t.points is not None and len(t.points)]
+        if not tracks:
+            return
+        p0 = np.concatenate([t.points for t in tracks]).astype(np.float32)
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, winSize=(15, 15), maxLevel=2)
+        start = 0
+        for track in tracks:
+            n = len(track.points)
+            good = status[start:start + n, 0] == 1
+            old, new = p0[start:start + n][good], p1[start:start + n][good]
+            start += n
+            if len(new) < 3:
+                track.points = None  # 다음 탐지 때까지 마지막 위치 유지
+                continue
+            dx, dy = np.median(new - old, axis=0).reshape(2) / scale
+            track.bbox += np.array([dx, dy, dx, dy], dtype=np.float32)
+            track.points = new.reshape(-1, 1, 2)
+
+    def _match(self, candidates, det_indices, det_boxes, det_cls, detections, frame_idx):
+        """
+        IoU가 큰 쌍부터 같은 클래스끼리 짝지어 트랙을 갱신
+        :return: (짝지어진 트랙 번호 set, 짝지어진 탐지 번호 set)
+        """
+        track_boxes = np.array([t.bbox for t in candidates], dtype=np.float32).reshape(-1, 4)
+        track_cls = np.array([t.cls for t in candidates], dtype=np.int64)
+        ious = _iou_matrix(track_boxes, det_boxes[det_indices])
+        ious[track_cls[:, None] != det_cls[det_indices][None, :]] = 0.0  # 같은 클래스끼리만
+
+        matched_tracks, matched_dets = set(), set()
+        for ti, j in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+            if ious[ti, j] < self.iou_match:
+                break
+            di = det_indices[j]
+            if ti in matched_tracks or di in matched_dets:
+                continue
+            matched_tracks.add(ti)
+            matched_dets.add(di)
+            track = candidates[ti]
+            track.bbox = det_boxes[di].copy()
+            track.conf_sum += float(detections[di]['confidence'])
+            track.hits += 1
+            track.misses = 0
+            track.last_frame = frame_idx
+        return matched_tracks, matched_dets
+
+    def _associate(self, tracks, detections, frame_idx, next_id):
+        active = [t for t in tracks if t.misses <= self.max_misses]
+        det_boxes = np.array([d['bbox'] for d in detections], dtype=np.float32).reshape(-1, 4)
+        det_cls = np.array([int(d['class']) for d in detections], dtype=np.int64)
+
+        matched_tracks, matched_dets = self._match(
+            active, list(range(len(detections))), det_boxes, det_cls, detections, frame_idx)
+        for ti, track in enumerate(active):
+            if ti not in matched_tracks:
+                track.misses += 1
+
+        # 남은 탐지는 끊긴 트랙(잠깐 가려졌거나 탐지를 놓친 음식)과 먼저 맞춰보고 되살림
+        # (새 트랙을 만들면 같은 음식이 두 번 집계됨)
+        remaining = [di for di in range(len(detections)) if di not in matched_dets]
+        ended = [t for t in tracks if t.misses > self.max_misses]
+        if remaining and ended:
+            _, revived = self._match(ended, remaining, det_boxes, det_cls, detections, frame_idx)
+            matched_dets |= revived
+
+        for di, det in enumerate(detections):
+            if di not in matched_dets:
+                tracks.append(_Track(next_id, det, frame_idx))
+                next_id += 1
+        return next_id
+
+    def _merge_duplicates(self, tracks):
+        """
+        같은 클래스이면서 마지막 위치가 겹치는 트랙을 하나로 합침
+        (되살리기 전에 박스가 많이 움직여서 같은 음식이 두 트랙으로 나뉜 경우)
+        """
+        merged = []
+        for track in sorted(tracks, key=lambda t: -t.hits):
+            for kept in merged:
+                if kept.cls == track.cls and _iou_matrix(kept.bbox[None], track.bbox[None])[0, 0] >= self.iou_match:
+                    kept.hits += track.hits
+                    kept.conf_sum += track.conf_sum
+                    kept.first_frame = min(kept.first_frame, track.first_frame)
+                    kept.last_frame = max(kept.last_frame, track.last_frame)
+                    break
+            else:
+                merged.append(track)
+        return merged
+
+    def analyze(self, source, max_frames=None):
+        """
+        :param source: 동영상 파일 경로, 카메라 번호, CameraStream 또는 BGR 프레임 이터러블
+        :param max_frames: 처리할 최대 프레임 수
+        :return: {'items': 최종 음식 목록, 'stats': 처리 통계}
+                 items: [{'class', 'confidence', 'hits', 'bbox', 'first_frame', 'last_frame'}]
+        """
+        tracks, next_id = [], 0
+        frame_idx = -1
+        detect_rounds = scene_cuts = 0
+        detect_seconds = track_seconds = 0.0
+        last_detect = None
+        key_small = prev_gray = None
+        start = time.perf_counter()
+
+        for frame_idx, frame in enumerate(self._frames(source)):
+            if max_frames is not None and frame_idx >= max_frames:
+                frame_idx -= 1
+                break
+            h, w = frame.shape[:2]
+            scale = min(1.0, self.track_width / w)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if scale < 1.0:
+                gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            small = cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA)
+
+            scene_change = (key_small is not None and
+                            cv2.absdiff(small, key_small).mean() / 255.0 > self.scene_threshold)
+            if last_detect is None or frame_idx - last_detect >= self.detect_every or scene_change:
+                t0 = time.perf_counter()
+                detections = self.detect_fn(frame)
+                detect_seconds += time.perf_counter() - t0
+                next_id = self._associate(tracks, detections, frame_idx, next_id)
+                active = [t for t in tracks if t.misses <= self.max_misses]
+                for track in active:
+                    self._seed_points(track, gray, scale)
+                detect_rounds += 1
+                scene_cuts += int(scene_change)
+                last_detect, key_small = frame_idx, small
+            else:
+                t0 = time.perf_counter()
+                self._track_flow([t for t in tracks if t.misses <= self.max_misses], prev_gray, gray, scale)
+                track_seconds += time.perf_counter() - t0
+            prev_gray = gray
+
+        elapsed = time.perf_counter() - start
+        frames = frame_idx + 1
+        tracks = self._merge_duplicates(tracks)
+        min_hits = min(self.min_hits, max(detect_rounds, 1))
+        items = [
+            {
+                'class': t.cls,
+                'confidence': t.conf_sum / t.hits,
+                'hits': t.hits,
+                'bbox': t.bbox.tolist(),
+                'first_frame': t.first_frame,
+                'last_frame': t.last_frame,
+            }
+            for t in tracks if t.hits >= min_hits
+        ]
+        stats = {
+            'frames': frames,
+            'detect_calls': detect_rounds,
+            'calls_saved': frames - detect_rounds,
+            'scene_cuts': scene_cuts,
+            'tracks': len(tracks),
+            'elapsed_s': elapsed,
+            'effective_fps': frames / elapsed if elapsed > 0 else 0.0,
+            'detect_s': detect_seconds,
+            'track_s': track_seconds,
+        }
+        return {'items': items, 'stats': stats}
+
+
+def main():
+    from inference_backend import BACKENDS, boxes_to_detections, load_model, predict_images
+
+    parser = argparse.ArgumentParser(description="동영상 식사 분석 (N 프레임마다 탐지 + 광류 추적)")
+    parser.add_argument("video")
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--backend", default="torch", choices=BACKENDS)
+    parser.add_argument("--detect-every", type=int, default=10)
+    parser.add_argument("--max-frames", type=int, default=None)
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.backend)
+
+    def detect(frame):
+        return [d for r in predict_images(model, [frame], verbose=False) for d in boxes_to_detections(r.boxes)]
+
+    result = VideoAnalyzer(detect, detect_every=args.detect_every).analyze(args.video, args.max_frames)
+    for item in result['items']:
+        print(f"{model.names[item['class']]}: {item['confidence']:.2f} ({item['hits']} detections)")
+    stats = result['stats']
+    print(f"{stats['frames']} frames in {stats['elapsed_s']:.1f}s ({stats['effective_fps']:.1f} FPS), "
+          f"{stats['detect_calls']} detect calls, {stats['calls_saved']} saved, {stats['scene_cuts']} scene cuts")
+
+
+if __name__ == "__main__":
+    main()